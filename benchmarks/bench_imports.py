@@ -0,0 +1,126 @@
+"""Check the CLI's import time on the non-interactive path against a budget.
+
+Runs ``src/cli.py analyze FILE --format tsv`` under ``python -X importtime``
+with stdout redirected, which is how build scripts call it, and adds up the
+time of every import made after the interpreter's own startup (``site``).
+The run fails when the total exceeds the budget, and lists the slowest
+imports so the culprit is easy to find.
+
+Usage::
+
+    python benchmarks/bench_imports.py
+    python benchmarks/bench_imports.py --budget 60 --repeat 10
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+# Add the repository root to the path so we can import from src
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+REPO_DIR = Path(__file__).parent.parent
+CLI_PATH = REPO_DIR / "src" / "cli.py"
+DEFAULT_SOURCE = REPO_DIR / "examples" / "x86-16-nasm" / "00-core" / "00-skeleton.asm"
+
+# Milliseconds of imports allowed on the non-interactive path; typer alone
+# takes about a third of it
+IMPORT_BUDGET_MS = 100.0
+
+# Modules that must not be imported on the non-interactive path
+FORBIDDEN_MODULES = ("pydantic", "rich")
+
+app = typer.Typer(name="bench-imports", help="Check the CLI's import time against a budget.")
+console = Console()
+
+
+class ImportTime(NamedTuple):
+    """Import time of one module, as reported by ``-X importtime``."""
+
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(report: str) -> list[ImportTime]:
+    """Parse the ``-X importtime`` lines of a process's stderr.
+
+    Args:
+        report: The stderr of the process
+
+    Returns:
+        One entry per imported module, in the order they finished importing
+    """
+    imports = []
+    for line in report.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        module = name.lstrip()
+        imports.append(ImportTime(module, (len(name) - len(module) - 1) // 2, int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure(source: Path = DEFAULT_SOURCE) -> tuple[float, list[ImportTime]]:
+    """Run the CLI once on the non-interactive path and time its imports.
+
+    Args:
+        source: Assembly file passed to ``analyze``
+
+    Returns:
+        The milliseconds spent importing after startup, and the imports made
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", str(CLI_PATH), "analyze", str(source), "--format", "tsv"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+    )
+    imports = parse_importtime(completed.stderr)
+    # Everything up to ``site`` is the interpreter starting, not the CLI
+    start = next((i + 1 for i, entry in enumerate(imports) if entry.module == "site" and entry.depth == 0), 0)
+    imports = imports[start:]
+    return sum(entry.cumulative_us for entry in imports if entry.depth == 0) / 1000, imports
+
+
+@app.command()
+def main(
+    budget: float = typer.Option(IMPORT_BUDGET_MS, "--budget", "-b", help="Allowed import time in milliseconds."),
+    repeat: int = typer.Option(5, "--repeat", "-r", help="Runs to measure; the fastest is kept."),
+    top: int = typer.Option(10, "--top", help="Number of slowest imports listed."),
+    source: Path = typer.Option(DEFAULT_SOURCE, "--source", help="Assembly file passed to analyze."),
+) -> None:
+    """Measure the CLI's imports and fail when they exceed the budget."""
+    total, imports = min((measure(source) for _ in range(repeat)), key=lambda run: run[0])
+
+    table = Table(title="Slowest Top-Level Imports")
+    table.add_column("Module", style="magenta")
+    table.add_column("Cumulative (ms)", justify="right", style="yellow")
+    top_level = sorted((entry for entry in imports if entry.depth == 0), key=lambda e: e.cumulative_us, reverse=True)
+    for entry in top_level[:top]:
+        table.add_row(entry.module, f"{entry.cumulative_us / 1000:.1f}")
+    console.print(table)
+
+    failed = False
+    forbidden = sorted({entry.module for entry in imports if entry.module.split(".")[0] in FORBIDDEN_MODULES})
+    if forbidden:
+        console.print(f"[bold red]✗ Imported on the non-interactive path: {', '.join(forbidden)}[/bold red]")
+        failed = True
+    if total > budget:
+        console.print(f"[bold red]✗ Imports took {total:.1f} ms, over the {budget:.0f} ms budget[/bold red]")
+        failed = True
+    if failed:
+        raise typer.Exit(code=1)
+    console.print(f"[bold green]Imports took {total:.1f} ms, within the {budget:.0f} ms budget.[/bold green]")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,261 @@
+"""Benchmark the lexer over the examples corpus and synthetic sources.
+
+Every case is timed phase by phase (decoding the bytes, tokenizing them
+into a ``TokenStream`` and building the ``Token`` list that
+``Lexer.analyze()`` returns) and its peak memory is measured in a separate
+pass under ``tracemalloc``. Results are compared with a stored baseline;
+the run fails when throughput drops or memory grows past the threshold.
+
+Usage::
+
+    python benchmarks/bench_lexer.py
+    python benchmarks/bench_lexer.py --sizes 1K,1M,100M --repeat 5
+    python benchmarks/bench_lexer.py --update-baseline
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import NamedTuple
+
+# Add the repository root to the path so we can import from src
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.generate import DEFAULT_SEED, format_size, generate_source, parse_size
+from src.core.lexer import Lexer
+
+BENCHMARKS_DIR = Path(__file__).parent
+EXAMPLES_DIR = BENCHMARKS_DIR.parent / "examples" / "x86-16-nasm"
+BASELINE_PATH = BENCHMARKS_DIR / "baseline.json"
+
+DEFAULT_SIZES = "1K,64K,1M,10M"
+
+# Building one pydantic Token per token dominates large runs, so the
+# analyze() phase is only measured up to this size
+DEFAULT_TOKENS_LIMIT = "1M"
+
+# Cases that tokenize faster than this are too noisy to compare throughput
+MIN_COMPARED_SECONDS = 0.01
+
+app = typer.Typer(name="bench-lexer", help="Benchmark the 8086 assembly lexer.")
+console = Console()
+
+
+class CaseResult(NamedTuple):
+    """Measurements of a single benchmark case."""
+
+    name: str
+    size: int
+    token_count: int
+    phases: dict[str, float]
+    peak_bytes: int
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Throughput of the tokenize phase."""
+        seconds = self.phases["tokenize"]
+        return self.token_count / seconds if seconds else 0.0
+
+    def to_json(self) -> dict:
+        """Return the result in the baseline file's format."""
+        return {
+            "size": self.size,
+            "tokens": self.token_count,
+            "tokens_per_second": round(self.tokens_per_second),
+            "phases": {phase: round(seconds, 6) for phase, seconds in self.phases.items()},
+            "peak_bytes": self.peak_bytes,
+        }
+
+
+def _run_phases(sources: list[bytes], with_tokens: bool) -> tuple[dict[str, float], int]:
+    """Run every phase once over the sources and time each of them."""
+    phases = {"decode": 0.0, "tokenize": 0.0}
+    if with_tokens:
+        phases["tokens"] = 0.0
+    token_count = 0
+
+    for data in sources:
+        start = time.perf_counter()
+        source = data.decode("utf-8", errors="replace")
+        decoded = time.perf_counter()
+        lexer = Lexer(source)
+        stream = lexer.analyze_stream()
+        tokenized = time.perf_counter()
+        phases["decode"] += decoded - start
+        phases["tokenize"] += tokenized - decoded
+        token_count += len(stream)
+
+        if with_tokens:
+            # The same work analyze() does on top of analyze_stream()
+            lexer.tokens = list(stream)
+            phases["tokens"] += time.perf_counter() - tokenized
+        del lexer, stream
+
+    return phases, token_count
+
+
+def _peak_memory(sources: list[bytes], with_tokens: bool) -> int:
+    """Return the peak traced allocation while lexing the sources."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        _run_phases(sources, with_tokens)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(name: str, sources: list[bytes], repeat: int, with_tokens: bool) -> CaseResult:
+    """Benchmark one case, keeping the fastest time of each phase.
+
+    Args:
+        name: Name of the case in the report and the baseline
+        sources: Raw bytes of the files lexed by the case
+        repeat: Number of timed runs
+        with_tokens: Whether to also time building the ``Token`` list
+
+    Returns:
+        The measurements of the case
+    """
+    best: dict[str, float] = {}
+    token_count = 0
+    for _ in range(repeat):
+        gc.collect()
+        phases, token_count = _run_phases(sources, with_tokens)
+        for phase, seconds in phases.items():
+            best[phase] = min(best.get(phase, seconds), seconds)
+
+    return CaseResult(name, sum(map(len, sources)), token_count, best, _peak_memory(sources, with_tokens))
+
+
+def compare(result: CaseResult, baseline: dict, threshold: float) -> list[str]:
+    """Compare a result with its baseline entry.
+
+    Args:
+        result: The new measurements
+        baseline: The baseline entry of the same case
+        threshold: Allowed relative slowdown or memory growth
+
+    Returns:
+        A description of every regression found
+    """
+    regressions = []
+    if result.token_count != baseline["tokens"]:
+        regressions.append(f"{result.name}: token count changed from {baseline['tokens']} to {result.token_count}")
+
+    old_speed = baseline["tokens_per_second"]
+    timed = result.phases["tokenize"] >= MIN_COMPARED_SECONDS
+    if timed and result.tokens_per_second < old_speed * (1 - threshold):
+        regressions.append(
+            f"{result.name}: {result.tokens_per_second:,.0f} tokens/s, "
+            f"{1 - result.tokens_per_second / old_speed:.0%} slower than the baseline"
+        )
+
+    old_peak = baseline["peak_bytes"]
+    if result.peak_bytes > old_peak * (1 + threshold):
+        regressions.append(
+            f"{result.name}: peak memory {result.peak_bytes / 1024 ** 2:.1f} MB, "
+            f"{result.peak_bytes / old_peak - 1:.0%} above the baseline"
+        )
+    return regressions
+
+
+def _report(results: list[CaseResult], baseline: dict) -> None:
+    """Print the results next to the baseline throughput."""
+    table = Table(title="Lexer Benchmarks (phase times in ms)")
+    table.add_column("Case", style="magenta", no_wrap=True)
+    table.add_column("KB", justify="right")
+    table.add_column("Tokens", justify="right", style="cyan")
+    table.add_column("Tokens/s", justify="right", style="green")
+    table.add_column("Baseline", justify="right")
+    table.add_column("Decode", justify="right", style="yellow")
+    table.add_column("Tokenize", justify="right", style="yellow")
+    table.add_column("Tokens", justify="right", style="yellow")
+    table.add_column("Peak MB", justify="right")
+
+    for result in results:
+        old = baseline.get(result.name)
+        tokens_ms = result.phases.get("tokens")
+        table.add_row(
+            result.name,
+            f"{result.size / 1024:,.0f}",
+            str(result.token_count),
+            f"{result.tokens_per_second:,.0f}",
+            f"{old['tokens_per_second']:,}" if old else "-",
+            f"{result.phases['decode'] * 1000:.1f}",
+            f"{result.phases['tokenize'] * 1000:.1f}",
+            f"{tokens_ms * 1000:.1f}" if tokens_ms is not None else "-",
+            f"{result.peak_bytes / 1024 ** 2:.1f}",
+        )
+    console.print(table)
+
+
+@app.command()
+def main(
+    sizes: str = typer.Option(DEFAULT_SIZES, "--sizes", "-s", help="Comma-separated sizes of the synthetic sources."),
+    repeat: int = typer.Option(3, "--repeat", "-r", help="Timed runs per case; the fastest is kept."),
+    seed: int = typer.Option(DEFAULT_SEED, "--seed", help="Seed of the synthetic source generator."),
+    tokens_limit: str = typer.Option(
+        DEFAULT_TOKENS_LIMIT, "--tokens-limit", help="Largest size for which Token objects are built."
+    ),
+    threshold: float = typer.Option(0.2, "--threshold", "-t", help="Allowed relative regression before failing."),
+    baseline_path: Path = typer.Option(BASELINE_PATH, "--baseline", help="Baseline file to compare against."),
+    update_baseline: bool = typer.Option(False, "--update-baseline", help="Store these results as the new baseline."),
+) -> None:
+    """Benchmark the lexer and compare the results with the baseline."""
+    limit = parse_size(tokens_limit)
+
+    cases: list[tuple[str, list[bytes]]] = [
+        ("corpus", [path.read_bytes() for path in sorted(EXAMPLES_DIR.rglob("*.asm"))])
+    ]
+    for size in map(parse_size, sizes.split(",")):
+        cases.append((f"synthetic-{format_size(size)}", [generate_source(size, seed).encode("utf-8")]))
+
+    results = []
+    for name, sources in cases:
+        with console.status(f"Running {name}..."):
+            results.append(run_case(name, sources, repeat, sum(map(len, sources)) <= limit))
+
+    stored = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else {}
+    baseline = stored.get("cases", {})
+    _report(results, baseline)
+
+    if update_baseline:
+        stored = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "seed": seed,
+            "cases": {**baseline, **{result.name: result.to_json() for result in results}},
+        }
+        baseline_path.write_text(json.dumps(stored, indent=2) + "\n", encoding="utf-8")
+        console.print(f"[bold]Baseline written to {baseline_path}[/bold]")
+        return
+
+    if stored and stored.get("seed") != seed:
+        console.print("[yellow]Seed differs from the baseline; synthetic cases are not compared.[/yellow]")
+        baseline = {"corpus": baseline["corpus"]} if "corpus" in baseline else {}
+
+    regressions = []
+    for result in results:
+        if result.name in baseline:
+            regressions.extend(compare(result, baseline[result.name], threshold))
+
+    if regressions:
+        for regression in regressions:
+            console.print(f"[bold red]✗ {regression}[/bold red]")
+        raise typer.Exit(code=1)
+    console.print(f"[bold green]No regressions above {threshold:.0%}.[/bold green]")
+
+
+if __name__ == "__main__":
+    app()
@@ -2,57 +2,552 @@
 
 from __future__ import annotations
 
+import io
+import os
 import sys
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 # Add the src directory to the path so we can import from core
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import typer
-from rich.console import Console
-from rich.table import Table
 
-from src.core.lexer import Lexer
+# Only the option defaults are imported up front; commands import the rest,
+# so short runs such as ``analyze FILE | ...`` stay cheap to start
+from src.core.defaults import DEFAULT_MAX_INSTRUCTIONS, DEFAULT_PATTERNS, WATCH_MAX_INSTRUCTIONS
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from rich.console import Console
+
+    from src.core.profiling import LexerStats
+    from src.core.tokens import TokenRow
+    from src.core.watch import WatchPass
+
+
+class _LazyConsole:
+    """Stand-in for a rich ``Console`` that imports rich on first use.
+
+    Messages without markup to a stream that is not a terminal are written
+    without rich, since it would print them unchanged; anything with markup
+    is rendered by rich itself.
+    """
+
+    def __init__(self, stderr: bool = False) -> None:
+        self._stderr = stderr
+        self._console: Console | None = None
+
+    def print(self, message: Any = "", **kwargs: Any) -> None:
+        stream = sys.stderr if self._stderr else sys.stdout
+        if (
+            self._console is None
+            and set(kwargs) <= {"style"}
+            and isinstance(message, str)
+            and "[" not in message
+            and not stream.isatty()
+        ):
+            stream.write(message + "\n")
+            return
+        self.__getattr__("print")(message, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console(stderr=self._stderr)
+        return getattr(self._console, name)
+
+
+def _escape(text: object) -> str:
+    """Escape text interpolated into a markup message so its brackets are printed."""
+    from rich.markup import escape
+    
+    return escape(str(text))
+
 
 app = typer.Typer(name="asm-lexer", help="CLI tool for 8086 assembly lexical analysis.")
-console = Console()
+console = _LazyConsole()
+err_console = _LazyConsole(stderr=True)
+
+# Buffer size for machine-readable output
+_WRITE_BUFFER_SIZE = 1 << 20
 
 
 @app.command()
 def analyze(
     file_path: str = typer.Argument(..., help="Path to the assembly file to analyze."),
+    stream: bool = typer.Option(
+        False, "--stream", help="Lex the file line by line and print tokens as they are found."
+    ),
+    output_format: str | None = typer.Option(
+        None, "--format", "-f",
+        help="Output format: table, jsonl, csv, tsv or binary. Defaults to table on a terminal and tsv otherwise.",
+    ),
+    output: Path | None = typer.Option(None, "--output", "-o", help="Write the tokens to a file instead of stdout."),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always lex the file, ignoring the token cache."),
+    profile: bool = typer.Option(False, "--profile", help="Print the time spent in each phase of the analysis."),
+    profile_output: Path | None = typer.Option(
+        None, "--profile-output",
+        help="Also profile the lexer into a file: cProfile stats (.prof) or a speedscope profile (.json).",
+    ),
+    resolve_includes: bool = typer.Option(
+        False, "--resolve-includes", help="Splice the tokens of %include'd files into the output."
+    ),
+    include_paths: list[Path] = typer.Option(
+        [], "--include-path", "-I", help="Directory searched for included files after the file's own."
+    ),
 ) -> None:
     """Analyze an assembly file and display the lexical tokens."""
+    fmt = _resolve_format(output_format, output, stream)
+    # Keep stdout clean for machine-readable output
+    out_console = console if fmt == "table" else err_console
+    
+    profiling = profile or profile_output is not None
+    if profiling and stream:
+        err_console.print("[bold red]Error: --profile cannot be combined with --stream.[/bold red]")
+        raise typer.Exit(code=2)
+    if profile_output is not None and profile_output.suffix not in (".prof", ".json"):
+        err_console.print("[bold red]Error: --profile-output must end in .prof or .json.[/bold red]")
+        raise typer.Exit(code=2)
+    if resolve_includes and (stream or profiling):
+        err_console.print("[bold red]Error: --resolve-includes cannot be combined with --stream or --profile.[/bold red]")
+        raise typer.Exit(code=2)
+    
+    from src.core.cache import TokenCache
+    from src.core.lexer import Lexer
+    
+    stats = None
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            source_code = f.read()
+        if stream:
+            rows = Lexer.iter_file_rows(file_path)
+        elif profiling:
+            # Profiled runs always lex, so the cache never hides the lexer's cost
+            stats, rows = _profile_analysis(file_path, profile_output)
+        elif resolve_includes:
+            rows = _expand_includes(file_path, include_paths, no_cache, out_console)
+        elif no_cache:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                source_code = f.read()
+            rows = Lexer(source_code).analyze_stream().rows()
+        else:
+            rows = TokenCache().lex_file(file_path)[0].rows()
+        
+        start = time.perf_counter()
+        if fmt == "table":
+            _print_table(rows, f"Lexical Analysis Results for {file_path}")
+        else:
+            count = _write_rows(rows, fmt, output)
+            err_console.print(f"Total tokens found: {count}", style="bold")
+    except typer.Exit:
+        raise
     except FileNotFoundError:
-        console.print(f"[bold red]Error: File '{file_path}' not found.[/bold red]")
+        out_console.print(f"[bold red]Error: File '{_escape(file_path)}' not found.[/bold red]")
         raise typer.Exit(code=1)
     except Exception as e:
-        console.print(f"[bold red]Error reading file: {e}[/bold red]")
+        out_console.print(f"[bold red]Error reading file: {_escape(e)}[/bold red]")
         raise typer.Exit(code=1)
     
-    lexer = Lexer(source_code)
-    tokens = lexer.analyze()
+    if stats is not None:
+        stats.add("output", time.perf_counter() - start)
+        _print_profile(stats, out_console)
+        if profile_output is not None:
+            out_console.print(f"[bold]Profile written to {_escape(profile_output)}[/bold]")
+
+
+def _expand_includes(
+    file_path: str, include_paths: list[Path], no_cache: bool, out_console: Console
+) -> Iterator[TokenRow]:
+    """Check the include graph of a file and return its expanded tokens."""
+    from src.core.cache import TokenCache
+    from src.core.includes import IncludeResolver
+    
+    resolver = IncludeResolver(include_paths, None if no_cache else TokenCache())
+    graph = resolver.graph([file_path])
+    
+    for path, targets in graph.missing.items():
+        for target in targets:
+            out_console.print(f"[yellow]Warning: '{_escape(target)}' included from {_escape(path)} was not found.[/yellow]")
+    if graph.cycles:
+        for cycle in graph.cycles:
+            out_console.print(f"[bold red]Error: Include cycle: {_escape(' -> '.join(str(p) for p in cycle))}[/bold red]")
+        raise typer.Exit(code=1)
+    
+    if len(graph.files) > 1:
+        out_console.print(f"[bold]Including {len(graph.files) - 1} files[/bold]")
+    return (token.row for token in resolver.expand(file_path))
+
+
+def _profile_analysis(file_path: str, profile_output: Path | None) -> tuple[LexerStats, Iterable[TokenRow]]:
+    """Lex a file with per-phase timings, optionally under a profiler."""
+    import cProfile
+    import json
+    
+    from src.core.lexer import Lexer
+    from src.core.profiling import trace_speedscope
+    
+    start = time.perf_counter()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        source_code = f.read()
+    lexer = Lexer(source_code, profile=True)
+    lexer.stats.add("read", time.perf_counter() - start)
+    
+    if profile_output is None:
+        tokens = lexer.analyze_stream()
+    elif profile_output.suffix == ".json":
+        tokens, document = trace_speedscope(lexer.analyze_stream, f"analyze {Path(file_path).name}")
+        profile_output.write_text(json.dumps(document), encoding="utf-8")
+    else:
+        profiler = cProfile.Profile()
+        tokens = profiler.runcall(lexer.analyze_stream)
+        profiler.dump_stats(profile_output)
+    return lexer.stats, tokens.rows()
+
+
+def _print_profile(stats: LexerStats, out_console: Console) -> None:
+    """Print the time spent in each phase, nested phases indented."""
+    from rich.table import Table
+    
+    total = stats.total_seconds
+    table = Table(title="Profile")
+    table.add_column("Phase", style="magenta")
+    table.add_column("Time (ms)", justify="right", style="yellow")
+    table.add_column("Self (ms)", justify="right", style="yellow")
+    table.add_column("% of total", justify="right", style="green")
+    table.add_column("Calls", justify="right", style="cyan")
+    
+    for name, seconds, self_seconds, calls in stats.rows():
+        depth = name.count("/")
+        table.add_row(
+            "  " * depth + name.rsplit("/", 1)[-1],
+            f"{seconds * 1000:.1f}",
+            f"{self_seconds * 1000:.1f}",
+            f"{seconds / total:.1%}" if total else "-",
+            str(calls),
+        )
+    out_console.print(table)
+    out_console.print(f"[bold]Total: {total * 1000:.1f} ms[/bold]")
+    for name, value in stats.counters.items():
+        out_console.print(f"{name}: [cyan]{value}[/cyan]")
+
+
+def _resolve_format(output_format: str | None, output: Path | None, stream: bool = False) -> str:
+    """Pick the output format, using the rich table only for interactive use."""
+    from src.core.formats import FORMATS
+    
+    if output_format is None:
+        interactive = output is None and not stream and sys.stdout.isatty()
+        return "table" if interactive else "tsv"
+    if output_format != "table" and output_format not in FORMATS:
+        err_console.print(
+            f"[bold red]Error: Unknown format '{output_format}'. "
+            f"Choose from: table, {', '.join(FORMATS)}.[/bold red]"
+        )
+        raise typer.Exit(code=2)
+    if output_format == "table" and output is not None:
+        err_console.print("[bold red]Error: The table format can only be printed to the terminal.[/bold red]")
+        raise typer.Exit(code=2)
+    return output_format
+
+
+def _write_rows(rows: Iterable[TokenRow], fmt: str, output: Path | None) -> int:
+    """Write tokens in a machine-readable format to a file or stdout."""
+    from src.core.formats import write_tokens
+    
+    if output is not None:
+        with open(output, "wb", buffering=_WRITE_BUFFER_SIZE) as out:
+            return write_tokens(rows, out, fmt)
     
-    # Create a rich table to display the tokens
-    table = Table(title=f"Lexical Analysis Results for {file_path}")
+    sys.stdout.flush()
+    out = io.BufferedWriter(io.FileIO(sys.stdout.fileno(), "wb", closefd=False), _WRITE_BUFFER_SIZE)
+    try:
+        return write_tokens(rows, out, fmt)
+    finally:
+        out.flush()
+
+
+def _print_table(rows: Iterable[TokenRow], title: str) -> None:
+    """Render tokens as a rich table followed by their total."""
+    from rich.table import Table
+    
+    table = Table(title=title)
     table.add_column("#", justify="right", style="cyan", no_wrap=True)
     table.add_column("Value", style="magenta")
     table.add_column("Type", style="green")
     table.add_column("Line", justify="right", style="yellow")
     
-    for i, token in enumerate(tokens, start=1):
-        table.add_row(str(i), token.value, token.type, str(token.line))
+    count = 0
+    for count, token in enumerate(rows, start=1):
+        table.add_row(str(count), token.value, token.type, str(token.line))
     
     console.print(table)
-    console.print(f"\n[bold]Total tokens found: {len(tokens)}[/bold]")
+    console.print(f"\n[bold]Total tokens found: {count}[/bold]")
+
+
+@app.command("analyze-batch")
+def analyze_batch(
+    targets: list[str] = typer.Argument(..., help="Files, directories or glob patterns to analyze."),
+    workers: int = typer.Option(
+        os.cpu_count() or 1, "--workers", "-j", min=1, help="Number of worker processes."
+    ),
+    patterns: list[str] = typer.Option(
+        list(DEFAULT_PATTERNS), "--pattern", "-p", help="File pattern searched for inside directories."
+    ),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always lex every file, ignoring the token cache."),
+    resolve_includes: bool = typer.Option(
+        False, "--resolve-includes", help="Count the tokens of %include'd files in every file that includes them."
+    ),
+    include_paths: list[Path] = typer.Option(
+        [], "--include-path", "-I", help="Directory searched for included files after each file's own."
+    ),
+) -> None:
+    """Analyze many assembly files in parallel and summarize the tokens found."""
+    from rich.table import Table
+    
+    from src.core.batch import collect_files, lex_files, summarize
+    from src.core.cache import TokenCache
+    
+    files = collect_files(targets, patterns)
+    if not files:
+        console.print("[bold red]Error: No assembly files found.[/bold red]")
+        raise typer.Exit(code=1)
+    
+    console.print(f"[bold]Analyzing {len(files)} files with {workers} workers...[/bold]")
+    start = time.perf_counter()
+    cache = None if no_cache else TokenCache()
+    cache_dir = None if cache is None else str(cache.directory)
+    
+    # Stream per-file results as the workers finish them
+    results = []
+    includes = tuple(str(path) for path in include_paths) if resolve_includes else None
+    for result in lex_files(files, workers, cache_dir, includes):
+        results.append(result)
+        if result.error is not None:
+            console.print(f"[red]✗[/red] {_escape(result.path)}: {_escape(result.error)}")
+        else:
+            console.print(
+                f"[green]✓[/green] {result.path} "
+                f"[cyan]{result.token_count}[/cyan] tokens in [yellow]{result.seconds * 1000:.1f} ms[/yellow]"
+                + (" [dim](cached)[/dim]" if result.cached else "")
+            )
+    
+    elapsed = time.perf_counter() - start
+    if cache is not None:
+        # Workers only see their own writes, so enforce the size cap once at the end
+        cache.prune()
+    totals, failures = summarize(results)
+    
+    # Aggregate token counts per type
+    type_table = Table(title="Tokens per Type")
+    type_table.add_column("Type", style="green")
+    type_table.add_column("Count", justify="right", style="cyan")
+    for token_type, count in totals.most_common():
+        type_table.add_row(token_type, str(count))
+    console.print(type_table)
+    
+    # Slowest files first
+    timing_table = Table(title="Slowest Files")
+    timing_table.add_column("File", style="magenta")
+    timing_table.add_column("Tokens", justify="right", style="cyan")
+    timing_table.add_column("Time (ms)", justify="right", style="yellow")
+    for result in sorted(results, key=lambda r: r.seconds, reverse=True)[:10]:
+        timing_table.add_row(result.path, str(result.token_count), f"{result.seconds * 1000:.1f}")
+    console.print(timing_table)
+    
+    total_tokens = sum(totals.values())
+    cached = sum(result.cached for result in results)
+    console.print(
+        f"\n[bold]Total: {len(results)} files ({cached} cached), {total_tokens} tokens in {elapsed:.2f} s "
+        f"({total_tokens / elapsed if elapsed else 0:.0f} tokens/s)[/bold]"
+    )
+    if failures:
+        console.print(f"[bold red]{failures} files failed.[/bold red]")
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def assemble(
+    file_path: str = typer.Argument(..., help="Path to the NASM-syntax assembly file."),
+    output: Path | None = typer.Option(
+        None, "--output", "-o", help="Binary to write. Defaults to the file's name with .com in the current directory."
+    ),
+    include_paths: list[Path] = typer.Option(
+        [], "--include-path", "-I", help="Directory searched for included files after the file's own."
+    ),
+) -> None:
+    """Assemble a program into a flat .com binary without calling nasm."""
+    from src.core.assembler import Assembler, AssemblerError
+    
+    output = output or Path(Path(file_path).stem + ".com")
+    start = time.perf_counter()
+    try:
+        program = Assembler(include_paths).assemble_file(file_path)
+    except FileNotFoundError:
+        console.print(f"[bold red]Error: File '{_escape(file_path)}' not found.[/bold red]")
+        raise typer.Exit(code=1)
+    except AssemblerError as e:
+        console.print(f"[bold red]Error: {_escape(e)}[/bold red]")
+        raise typer.Exit(code=1)
+    elapsed = time.perf_counter() - start
+    
+    output.write_bytes(program.image)
+    console.print(
+        f"[green]✓[/green] {file_path} ➜ [bold]{output}[/bold] "
+        f"[cyan]{len(program.image)}[/cyan] bytes in [yellow]{elapsed * 1000:.1f} ms[/yellow] "
+        f"({program.passes} passes)"
+    )
+
+
+@app.command()
+def run(
+    file_path: str = typer.Argument(..., help="Assembly file to assemble and run, or a .com binary."),
+    args: list[str] = typer.Argument(None, help="Arguments passed to the program's command tail."),
+    include_paths: list[Path] = typer.Option(
+        [], "--include-path", "-I", help="Directory searched for included files after the file's own."
+    ),
+    max_instructions: int = typer.Option(
+        DEFAULT_MAX_INSTRUCTIONS, "--max-instructions", "-n", help="Stop after this many instructions; 0 for no limit."
+    ),
+    stats: bool = typer.Option(False, "--stats", help="Report the exit status and instruction count on stderr."),
+) -> None:
+    """Run a DOS .com program in the built-in 8086 emulator instead of emu2."""
+    from src.core.assembler import Assembler, AssemblerError
+    from src.core.emulator import Emulator, EmulatorError
+    
+    try:
+        if file_path.lower().endswith(".com"):
+            image = Path(file_path).read_bytes()
+        else:
+            image = Assembler(include_paths).assemble_file(file_path).image
+    except FileNotFoundError:
+        err_console.print(f"[bold red]Error: File '{_escape(file_path)}' not found.[/bold red]")
+        raise typer.Exit(code=1)
+    except AssemblerError as e:
+        err_console.print(f"[bold red]Error: {_escape(e)}[/bold red]")
+        raise typer.Exit(code=1)
+    
+    # A terminal already echoes what is typed
+    emulator = Emulator(
+        image, " ".join(args or ()), sys.stdin.buffer, sys.stdout.buffer, echo=not sys.stdin.isatty()
+    )
+    start = time.perf_counter()
+    try:
+        result = emulator.run(max_instructions or None)
+    except EmulatorError as e:
+        sys.stdout.flush()
+        err_console.print(f"[bold red]Error: {_escape(e)}[/bold red]")
+        raise typer.Exit(code=1)
+    finally:
+        sys.stdout.buffer.flush()
+    elapsed = time.perf_counter() - start
+    
+    if stats or result.status == "budget":
+        err_console.print(
+            f"[dim]{result.status}[/dim] code [cyan]{result.exit_code}[/cyan] after "
+            f"[cyan]{result.instructions:,}[/cyan] instructions in [yellow]{elapsed * 1000:.1f} ms[/yellow]"
+        )
+    if result.status == "budget":
+        raise typer.Exit(code=1)
+    raise typer.Exit(code=result.exit_code or 0)
+
+
+@app.command()
+def watch(
+    directory: Path = typer.Argument(Path("."), help="Directory to watch, recursively."),
+    patterns: list[str] = typer.Option(
+        list(DEFAULT_PATTERNS), "--pattern", "-p", help="File pattern searched for inside the directory."
+    ),
+    run_programs: bool = typer.Option(False, "--run", "-r", help="Also assemble and run each changed program."),
+    include_paths: list[Path] = typer.Option(
+        [], "--include-path", "-I", help="Directory searched for included files after each file's own."
+    ),
+    max_instructions: int = typer.Option(
+        WATCH_MAX_INSTRUCTIONS, "--max-instructions", "-n", help="Instruction budget of each program run."
+    ),
+    polling: bool = typer.Option(False, "--poll", help="Poll for changes instead of using inotify."),
+    interval: float = typer.Option(0.5, "--interval", help="Seconds between scans when polling."),
+) -> None:
+    """Watch a directory and re-analyze only the files that change."""
+    from src.core.watch import PollingWatcher, WatchSession, create_watcher
+    
+    if not directory.is_dir():
+        console.print(f"[bold red]Error: Directory '{_escape(directory)}' not found.[/bold red]")
+        raise typer.Exit(code=1)
+    
+    watcher = create_watcher(directory, patterns, polling, interval)
+    session = WatchSession(include_paths, run_programs, max_instructions)
+    files = watcher.files()
+    method = "polling" if isinstance(watcher, PollingWatcher) else "inotify"
+    console.print(f"[bold]Watching {len(files)} files in {watcher.root} ({method}), Ctrl+C to stop[/bold]")
+    
+    first = session.update(files)
+    failures = sum(result.lex.error is not None for result in first.results)
+    console.print(
+        f"[dim]{len(first.results)} files analyzed in {first.seconds * 1000:.1f} ms"
+        + (f", {failures} failed" if failures else "") + "[/dim]"
+    )
+    try:
+        while True:
+            changed = watcher.changes()
+            if changed:
+                _print_watch_pass(session.update(changed), watcher.root)
+    except KeyboardInterrupt:
+        console.print("[dim]Stopped watching.[/dim]")
+    finally:
+        watcher.close()
+
+
+def _print_watch_pass(update: WatchPass, root: Path) -> None:
+    """Print the files of a watch pass and what running them printed."""
+    def name(path: str | Path) -> str:
+        return str(Path(path).relative_to(root)) if Path(path).is_relative_to(root) else str(path)
+    
+    console.rule(f"[dim]{time.strftime('%H:%M:%S')}[/dim]")
+    for path in update.removed:
+        console.print(f"[dim]- {_escape(name(path))} removed[/dim]")
+    for result in update.results:
+        if result.lex.error is not None:
+            console.print(f"[red]✗[/red] {_escape(name(result.lex.path))}: {_escape(result.lex.error)}")
+            continue
+        console.print(
+            f"[green]✓[/green] {name(result.lex.path)} [cyan]{result.lex.token_count}[/cyan] tokens "
+            f"in [yellow]{result.lex.seconds * 1000:.1f} ms[/yellow]"
+        )
+        if result.run is None:
+            continue
+        if result.run.error is not None:
+            console.print(f"  [red]✗ {_escape(result.run.error)}[/red]")
+            continue
+        output = result.run.output.decode("cp437").replace("\r\n", "\n").rstrip("\n")
+        if output:
+            console.print(output, markup=False, highlight=False)
+        console.print(
+            f"  [dim]{result.run.status} code {result.run.exit_code} "
+            f"after {result.run.instructions:,} instructions[/dim]"
+        )
+    console.print(f"[dim]{len(update.results)} files in {update.seconds * 1000:.1f} ms[/dim]")
 
 
 @app.command()
-def demo() -> None:
+def lsp() -> None:
+    """Start the language server, speaking LSP over stdin and stdout."""
+    from src.core.lsp import serve
+    
+    raise typer.Exit(code=serve())
+
+
+@app.command()
+def demo(
+    output_format: str | None = typer.Option(
+        None, "--format", "-f",
+        help="Output format: table, jsonl, csv, tsv or binary. Defaults to table on a terminal and tsv otherwise.",
+    ),
+) -> None:
     """Run a demonstration of the lexer with sample code."""
+    from src.core.lexer import Lexer
+    
     sample_code = """
     .DATA SEGMENT
         msg DB 'Hello, World!', 10, 13, '$'
@@ -74,21 +569,12 @@ def demo() -> None:
     END START
     """
     
-    lexer = Lexer(sample_code)
-    tokens = lexer.analyze()
-    
-    # Create a rich table to display the tokens
-    table = Table(title="Demo: Lexical Analysis Results")
-    table.add_column("#", justify="right", style="cyan", no_wrap=True)
-    table.add_column("Value", style="magenta")
-    table.add_column("Type", style="green")
-    table.add_column("Line", justify="right", style="yellow")
-    
-    for i, token in enumerate(tokens, start=1):
-        table.add_row(str(i), token.value, token.type, str(token.line))
-    
-    console.print(table)
-    console.print(f"\n[bold]Total tokens found: {len(tokens)}[/bold]")
+    rows = Lexer(sample_code).analyze_stream().rows()
+    fmt = _resolve_format(output_format, None)
+    if fmt == "table":
+        _print_table(rows, "Demo: Lexical Analysis Results")
+    else:
+        _write_rows(rows, fmt, None)
 
 
 if __name__ == "__main__":
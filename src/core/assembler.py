@@ -0,0 +1,1320 @@
+"""In-process assembler for the NASM subset used by the 8086 examples.
+
+``Assembler`` turns NASM-syntax sources into flat ``.com`` images in memory,
+the way ``nasm -f bin`` does, without spawning any process. It works on the
+lexer's token stream: statements, labels and operand boundaries come from
+the tokens of each line, and operands are parsed once and memoized, so
+assembling many small programs mostly costs the encoding itself.
+
+Supported are ``org``, ``section``/``segment``, labels (including ``.local``
+labels), ``equ``, ``times``, ``db``/``dw``/``dd``, ``resb``/``resw``/``resd``,
+``align``, ``%include``, parameterless and parameterized ``%macro``s, and the
+common 8086 instructions plus the few 186 forms NASM emits by default
+(``shl reg, imm``, ``push imm``). Instructions are encoded from the opcode
+tables below.
+
+Addresses are resolved in passes: the first pass lays out every statement
+with the symbols it knows, assuming short encodings for what it does not;
+the next passes re-encode with the addresses found by the previous one,
+widening jumps, displacements and immediates that turn out not to fit,
+until nothing moves. Small programs settle in two passes.
+
+As in NASM's ``bin`` format, ``.text`` comes first at the ``org`` address,
+other sections follow it aligned to 4 bytes in the order they were declared,
+and ``nobits`` sections such as ``.bss`` are laid out after them without
+being written to the image.
+"""
+
+from __future__ import annotations
+
+import operator
+import re
+from functools import lru_cache
+from itertools import groupby
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from .includes import IncludeCycleError, IncludeResolver
+from .lexer import Lexer
+from .tokens import TokenRow
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+    from .tokens import TokenStream
+
+
+# Maximum number of layout passes before giving up on unstable addresses
+MAX_PASSES = 32
+
+# Alignment of the sections that follow ``.text`` when none is given
+DEFAULT_SECTION_ALIGN = 4
+
+REGISTERS_8 = {"al": 0, "cl": 1, "dl": 2, "bl": 3, "ah": 4, "ch": 5, "dh": 6, "bh": 7}
+REGISTERS_16 = {"ax": 0, "cx": 1, "dx": 2, "bx": 3, "sp": 4, "bp": 5, "si": 6, "di": 7}
+SEGMENT_REGISTERS = {"es": 0, "cs": 1, "ss": 2, "ds": 3}
+
+# r/m field of each base/index combination of 16-bit addressing
+_ADDRESSING_MODES = {
+    frozenset({"bx", "si"}): 0, frozenset({"bx", "di"}): 1,
+    frozenset({"bp", "si"}): 2, frozenset({"bp", "di"}): 3,
+    frozenset({"si"}): 4, frozenset({"di"}): 5,
+    frozenset({"bp"}): 6, frozenset({"bx"}): 7,
+}
+_BP_ONLY = 6
+
+# Two-operand arithmetic: the /digit of the 80-83 group, and of the base opcode
+ARITHMETIC = {"add": 0, "or": 1, "adc": 2, "sbb": 3, "and": 4, "sub": 5, "xor": 6, "cmp": 7}
+# One-operand F6/F7 group
+UNARY = {"not": 2, "neg": 3, "mul": 4, "imul": 5, "div": 6, "idiv": 7}
+# Shifts and rotates of the D0-D3 and C0/C1 groups
+SHIFTS = {"rol": 0, "ror": 1, "rcl": 2, "rcr": 3, "shl": 4, "sal": 4, "shr": 5, "sar": 7}
+
+_CONDITION_CODES = {
+    "o": 0, "no": 1, "b": 2, "c": 2, "nae": 2, "ae": 3, "nb": 3, "nc": 3,
+    "e": 4, "z": 4, "ne": 5, "nz": 5, "be": 6, "na": 6, "a": 7, "nbe": 7,
+    "s": 8, "ns": 9, "p": 10, "pe": 10, "np": 11, "po": 11,
+    "l": 12, "nge": 12, "ge": 13, "nl": 13, "le": 14, "ng": 14, "g": 15, "nle": 15,
+}
+# Conditional jumps: short opcode; the near form is 0F followed by opcode + 10h
+CONDITIONAL_JUMPS = {"j" + condition: 0x70 + code for condition, code in _CONDITION_CODES.items()}
+# Jumps that only exist with an 8-bit displacement
+SHORT_JUMPS = {"loop": 0xE2, "loope": 0xE1, "loopz": 0xE1, "loopne": 0xE0, "loopnz": 0xE0, "jcxz": 0xE3}
+
+# Instructions without operands
+SIMPLE = {
+    "nop": b"\x90", "hlt": b"\xF4", "cbw": b"\x98", "cwd": b"\x99", "cmc": b"\xF5",
+    "clc": b"\xF8", "stc": b"\xF9", "cli": b"\xFA", "sti": b"\xFB", "cld": b"\xFC", "std": b"\xFD",
+    "pushf": b"\x9C", "popf": b"\x9D", "sahf": b"\x9E", "lahf": b"\x9F",
+    "pusha": b"\x60", "popa": b"\x61", "iret": b"\xCF", "into": b"\xCE", "int3": b"\xCC",
+    "aaa": b"\x37", "aas": b"\x3F", "daa": b"\x27", "das": b"\x2F", "xlat": b"\xD7", "xlatb": b"\xD7",
+    "movsb": b"\xA4", "movsw": b"\xA5", "cmpsb": b"\xA6", "cmpsw": b"\xA7", "stosb": b"\xAA",
+    "stosw": b"\xAB", "lodsb": b"\xAC", "lodsw": b"\xAD", "scasb": b"\xAE", "scasw": b"\xAF",
+    "wait": b"\x9B", "leave": b"\xC9",
+}
+PREFIXES = {"rep": 0xF3, "repe": 0xF3, "repz": 0xF3, "repne": 0xF2, "repnz": 0xF2, "lock": 0xF0}
+_SEGMENT_PREFIXES = {"es": 0x26, "cs": 0x2E, "ss": 0x36, "ds": 0x3E}
+
+# Data definitions and reservations, with their unit size
+DATA_DIRECTIVES = {"db": 1, "dw": 2, "dd": 4}
+RESERVE_DIRECTIVES = {"resb": 1, "resw": 2, "resd": 4}
+
+# Directives that are accepted and have no effect on a flat binary
+_IGNORED_DIRECTIVES = {"global", "extern", "bits", "cpu", "use16", "default"}
+
+_SIZE_KEYWORDS = {"byte": 1, "word": 2}
+_JUMP_KEYWORDS = {"short", "near"}
+
+_EXPRESSION_TOKEN = re.compile(
+    r"\s*(?:"
+    r"(?P<number>[0-9][0-9A-Za-z_]*)"
+    r"|(?P<string>'[^']*'|\"[^\"]*\")"
+    r"|(?P<here>\$\$|\$(?![0-9A-Za-z_.?@$]))"
+    r"|(?P<name>\$?[A-Za-z_.?@][0-9A-Za-z_.?@$#~]*)"
+    r"|(?P<operator><<|>>|//|%%|[-+*/%()~&|^:])"
+    r")"
+)
+
+# Binary operators by precedence, loosest first, as in NASM
+_BINARY_OPERATORS: list[dict[str, Callable[[int, int], int]]] = [
+    {"|": operator.or_},
+    {"^": operator.xor},
+    {"&": operator.and_},
+    {"<<": operator.lshift, ">>": operator.rshift},
+    {"+": operator.add, "-": operator.sub},
+    {
+        "*": operator.mul,
+        "/": lambda a, b: _divide(a, b, False),
+        "//": lambda a, b: _divide(a, b, False),
+        "%": lambda a, b: _divide(a, b, True),
+        "%%": lambda a, b: _divide(a, b, True),
+    },
+]
+_UNARY_OPERATORS: dict[str, Callable[[int], int]] = {"-": operator.neg, "+": operator.pos, "~": operator.invert}
+
+
+class AssemblerError(ValueError):
+    """Raised when a source cannot be assembled."""
+
+    def __init__(self, message: str, path: Path | None = None, line: int | None = None) -> None:
+        """Initialize the error.
+
+        Args:
+            message: What went wrong
+            path: File containing the offending line, if known
+            line: 1-based number of the offending line, if known
+        """
+        self.message = message
+        self.path = path
+        self.line = line
+        location = f"{path or '<source>'}:{line}: " if line is not None else ""
+        super().__init__(location + message)
+
+
+class Program(NamedTuple):
+    """A flat binary produced by the assembler."""
+
+    image: bytes
+    origin: int
+    symbols: dict[str, int]
+    passes: int
+
+
+class Register(NamedTuple):
+    """A register operand."""
+
+    name: str
+    size: int
+    code: int
+    segment: bool = False
+
+
+class Immediate(NamedTuple):
+    """An expression operand: a constant, an address or a jump target."""
+
+    expression: object
+    size: int | None = None
+    jump: str | None = None
+
+
+class Memory(NamedTuple):
+    """A memory operand, ``[base + index + displacement]``."""
+
+    # r/m field for the base/index registers, or None for a direct address
+    mode: int | None
+    displacement: object
+    size: int | None = None
+    segment: str | None = None
+
+
+Operand = Register | Immediate | Memory
+
+
+class Statement:
+    """One label, directive or instruction of the program being assembled."""
+
+    __slots__ = ("path", "line", "section", "scope", "kind", "name", "operands", "times", "prefixes", "wide")
+
+    def __init__(
+        self,
+        path: Path | None,
+        line: int,
+        section: str,
+        scope: str,
+        kind: str,
+        name: str,
+        operands: tuple = (),
+    ) -> None:
+        """Initialize a statement.
+
+        Args:
+            path: File the statement comes from
+            line: 1-based line of the statement
+            section: Section the statement is assembled into
+            scope: Last non-local label before the statement
+            kind: ``label``, ``equ``, ``instruction``, ``data``, ``reserve``
+                or ``align``
+            name: Label name, mnemonic or directive
+            operands: Parsed operands
+        """
+        self.path = path
+        self.line = line
+        self.section = section
+        self.scope = scope
+        self.kind = kind
+        self.name = name
+        self.operands = operands
+        # Repeat count expression of a ``times`` prefix
+        self.times: object = None
+        self.prefixes = b""
+        # Fields that proved too large for their short encoding; they only grow
+        self.wide: set[str] = set()
+
+
+class Assembler:
+    """Assembles NASM-syntax 8086 sources into flat ``.com`` images.
+
+    An assembler can be reused for any number of programs; included files
+    are lexed once through its ``IncludeResolver``.
+    """
+
+    def __init__(self, search_paths: Iterable[str | Path] = (), resolver: IncludeResolver | None = None) -> None:
+        """Initialize the assembler.
+
+        Args:
+            search_paths: Directories searched for ``%include`` targets after
+                the directory of the including file
+            resolver: Resolver used for ``%include``; one is created from
+                ``search_paths`` if not given
+        """
+        self.resolver = resolver or IncludeResolver(search_paths)
+
+    def assemble(self, source: str, path: str | Path | None = None) -> Program:
+        """Assemble a source into a flat binary.
+
+        Args:
+            source: The program's source code
+            path: File the source comes from; relative includes are resolved
+                from its directory, or from the working directory without it
+
+        Returns:
+            The assembled program
+
+        Raises:
+            AssemblerError: If the source uses unsupported syntax, refers to
+                undefined symbols or cannot be encoded
+        """
+        path = Path(path).resolve() if path is not None else None
+        return _Program(self.resolver).assemble(Lexer(source).analyze_stream(), path)
+
+    def assemble_file(self, path: str | Path) -> Program:
+        """Assemble a file into a flat binary.
+
+        Args:
+            path: Path to the source file
+
+        Returns:
+            The assembled program
+
+        Raises:
+            AssemblerError: If the file cannot be assembled
+            OSError: If the file cannot be read
+        """
+        try:
+            lexed = self.resolver.load(path)
+        except UnicodeDecodeError as error:
+            raise AssemblerError(f"not valid UTF-8: {error}", Path(path)) from None
+        return _Program(self.resolver).assemble(lexed.stream, lexed.path)
+
+
+def assemble(source: str, path: str | Path | None = None) -> bytes:
+    """Assemble a source into the bytes of a ``.com`` file.
+
+    Args:
+        source: The program's source code
+        path: File the source comes from, used to resolve includes
+
+    Returns:
+        The flat binary image
+
+    Raises:
+        AssemblerError: If the source cannot be assembled
+    """
+    return Assembler().assemble(source, path).image
+
+
+class _Macro(NamedTuple):
+    """A ``%macro`` definition."""
+
+    parameters: int
+    body: list[list[TokenRow]]
+    path: Path | None
+
+
+class _Program:
+    """Reads the statements of one program and lays them out."""
+
+    def __init__(self, resolver: IncludeResolver) -> None:
+        self.resolver = resolver
+        self.statements: list[Statement] = []
+        self.origin: int | None = None
+        # Section name -> (alignment, nobits), in declaration order
+        self.sections: dict[str, tuple[int, bool]] = {".text": (DEFAULT_SECTION_ALIGN, False)}
+        self.section = ".text"
+        self.scope = ""
+        self.defined: set[str] = set()
+        self.macros: dict[str, _Macro] = {}
+        # Macro being defined: name, definition and the line it started on
+        self.recording: tuple[str, _Macro, int] | None = None
+        self.expansions = 0
+        self.chain: list[Path] = []
+
+    def assemble(self, stream: TokenStream, path: Path | None) -> Program:
+        """Read a lexed source and assemble it."""
+        self._read(stream, path)
+        if self.recording is not None:
+            name, macro, line = self.recording
+            raise AssemblerError(f"macro '{name}' has no %endmacro", macro.path, line)
+
+        symbols: dict[str, int] = {}
+        bases: dict[str, int] = {}
+        for passes in range(1, MAX_PASSES + 1):
+            layout = _Pass(self, symbols, bases)
+            layout.run()
+            stable = layout.symbols == symbols and layout.bases == bases and not layout.widened
+            if stable and layout.unresolved is not None:
+                name, statement = layout.unresolved
+                raise AssemblerError(f"symbol '{name}' is not defined", statement.path, statement.line)
+            if stable and layout.deferred is not None:
+                message, statement = layout.deferred
+                raise AssemblerError(message, statement.path, statement.line)
+            if stable:
+                return Program(layout.image(), layout.origin, layout.symbols, passes)
+            symbols, bases = layout.symbols, layout.bases
+        raise AssemblerError(f"addresses did not settle after {MAX_PASSES} passes")
+
+    # -- Reading ---------------------------------------------------------
+
+    def _read(self, stream: TokenStream, path: Path | None) -> None:
+        """Turn every line of a lexed file into statements."""
+        if path is not None:
+            if path in self.chain:
+                raise AssemblerError(str(IncludeCycleError([*self.chain[self.chain.index(path):], path])))
+            self.chain.append(path)
+        for rows in statement_lines(stream):
+            try:
+                self._read_line(rows, path)
+            except AssemblerError as error:
+                if error.line is not None:
+                    raise
+                raise AssemblerError(error.message, path, rows[0].line) from None
+        if path is not None:
+            self.chain.pop()
+
+    def _read_line(self, rows: list[TokenRow], path: Path | None) -> None:
+        """Read the statements of one line."""
+        first = rows[0].value.lower()
+        if self.recording is not None:
+            if first == "%endmacro":
+                name, macro, _ = self.recording
+                self.macros[name] = macro
+                self.recording = None
+            else:
+                self.recording[1].body.append(rows)
+            return
+
+        if first.startswith("%"):
+            self._preprocessor(first, rows, path)
+            return
+        if rows[0].value in self.macros:
+            self._expand(rows, path)
+            return
+        if first == "[" and rows[-1].value == "]":
+            rows = rows[1:-1]
+            if not rows:
+                return
+            first = rows[0].value.lower()
+
+        # A label is a word followed by a colon, or a word that is not a
+        # known mnemonic followed by a data directive, ``equ`` or nothing
+        label = None
+        if len(rows) > 1 and rows[1].value == ":" and rows[1].type == "SEPARADOR":
+            label, rows = rows[0].value, rows[2:]
+        elif first not in MNEMONICS and (len(rows) == 1 or rows[1].value.lower() in LABELLED_DIRECTIVES):
+            label, rows = rows[0].value, rows[1:]
+
+        if rows and rows[0].value.lower() == "equ":
+            if label is None:
+                raise AssemblerError("'equ' needs a label")
+            self._define(label, path, rows[0].line, "equ", (_expression(_text(rows[1:])),))
+            return
+        if label is not None:
+            self._define(label, path, rows[0].line if rows else 0, "label")
+        if rows:
+            self._read_statement(rows, path)
+
+    def _preprocessor(self, directive: str, rows: list[TokenRow], path: Path | None) -> None:
+        """Handle a ``%`` directive."""
+        if directive == "%include":
+            if len(rows) != 2 or rows[1].type != "CONSTANTE_STR":
+                raise AssemblerError("expected %include \"file\"")
+            including = path or Path.cwd() / "<source>"
+            target = self.resolver.resolve(rows[1].value[1:-1], including)
+            if target is None:
+                raise AssemblerError(f"cannot find included file {rows[1].value}")
+            try:
+                lexed = self.resolver.load(target)
+            except UnicodeDecodeError as error:
+                raise AssemblerError(f"{target} is not valid UTF-8: {error}") from None
+            self._read(lexed.stream, lexed.path)
+        elif directive == "%macro":
+            if len(rows) < 2:
+                raise AssemblerError("expected %macro name [parameters]")
+            parameters = int(rows[2].value) if len(rows) > 2 and rows[2].value.isdigit() else 0
+            self.recording = (rows[1].value, _Macro(parameters, [], path), rows[0].line)
+        elif directive == "%endmacro":
+            raise AssemblerError("%endmacro without %macro")
+        else:
+            raise AssemblerError(f"unsupported preprocessor directive '{rows[0].value}'")
+
+    def _expand(self, rows: list[TokenRow], path: Path | None) -> None:
+        """Read the lines of a macro invocation."""
+        macro = self.macros[rows[0].value]
+        arguments = [_text(group) for group in _split_operands(rows[1:])]
+        if len(arguments) != macro.parameters:
+            raise AssemblerError(
+                f"macro '{rows[0].value}' takes {macro.parameters} parameters, got {len(arguments)}"
+            )
+        self.expansions += 1
+        unique = f"..@{self.expansions}."
+
+        def substitute(value: str) -> str:
+            if "%" not in value:
+                return value
+            value = value.replace("%%", unique)
+            for index in range(len(arguments), 0, -1):
+                value = value.replace(f"%{index}", arguments[index - 1])
+            return value
+
+        for line in macro.body:
+            expanded = [row._replace(value=substitute(row.value)) for row in line]
+            try:
+                self._read_line(expanded, macro.path)
+            except AssemblerError as error:
+                if error.line is not None:
+                    raise
+                raise AssemblerError(error.message, macro.path, line[0].line) from None
+
+    def _define(self, name: str, path: Path | None, line: int, kind: str, operands: tuple = ()) -> None:
+        """Add a label or ``equ`` statement, updating the local label scope."""
+        if name.startswith("."):
+            if not name.startswith("..@"):
+                name = self.scope + name
+        else:
+            self.scope = name
+        if name in self.defined:
+            raise AssemblerError(f"symbol '{name}' is already defined")
+        self.defined.add(name)
+        self.statements.append(Statement(path, line, self.section, self.scope, kind, name, operands))
+
+    def _read_statement(self, rows: list[TokenRow], path: Path | None) -> None:
+        """Read a directive or an instruction, with its ``times`` and prefixes."""
+        line = rows[0].line
+        mnemonic = rows[0].value.lower()
+
+        if mnemonic in ("section", "segment"):
+            self._section(rows[1:])
+            return
+        if mnemonic == "org":
+            value = _expression(_text(rows[1:]))
+            if not isinstance(value, int):
+                raise AssemblerError("org needs a constant address")
+            self.origin = value
+            return
+        if mnemonic in _IGNORED_DIRECTIVES:
+            return
+
+        times = None
+        if mnemonic == "times":
+            end = next((i for i, row in enumerate(rows) if i > 1 and row.value.lower() in MNEMONICS), None)
+            if end is None:
+                raise AssemblerError("'times' needs an instruction or data definition to repeat")
+            times = _expression(_text(rows[1:end]))
+            rows = rows[end:]
+            mnemonic = rows[0].value.lower()
+
+        prefixes = bytearray()
+        while mnemonic in PREFIXES and len(rows) > 1:
+            prefixes.append(PREFIXES[mnemonic])
+            rows = rows[1:]
+            mnemonic = rows[0].value.lower()
+
+        groups = _split_operands(rows[1:])
+        if mnemonic in DATA_DIRECTIVES:
+            kind = "data"
+            operands = tuple(_data_item(_text(group), group) for group in groups)
+        elif mnemonic in RESERVE_DIRECTIVES or mnemonic == "align":
+            kind = "reserve" if mnemonic != "align" else "align"
+            if len(groups) != 1:
+                raise AssemblerError(f"'{mnemonic}' takes one operand")
+            operands = (_expression(_text(groups[0])),)
+        elif mnemonic in _ENCODERS:
+            kind = "instruction"
+            operands = tuple(_operand(_text(group)) for group in groups)
+        else:
+            raise AssemblerError(f"unknown instruction '{rows[0].value}'")
+
+        statement = Statement(path, line, self.section, self.scope, kind, mnemonic, operands)
+        statement.times = times
+        statement.prefixes = bytes(prefixes)
+        self.statements.append(statement)
+
+    def _section(self, rows: list[TokenRow]) -> None:
+        """Switch to a section, declaring it on first use."""
+        words = _text(rows).split()
+        if not words:
+            raise AssemblerError("expected a section name")
+        name = words[0]
+        align, nobits = self.sections.get(name, (DEFAULT_SECTION_ALIGN, name.startswith(".bss")))
+        for attribute in words[1:]:
+            key, _, value = attribute.lower().partition("=")
+            if key == "align" and value.isdigit():
+                align = int(value)
+            elif key in ("nobits", "progbits"):
+                nobits = key == "nobits"
+        self.sections[name] = (align, nobits)
+        self.section = name
+
+
+class _Pass:
+    """One layout pass over the statements of a program."""
+
+    def __init__(self, program: _Program, symbols: dict[str, int], bases: dict[str, int]) -> None:
+        """Initialize the pass.
+
+        Args:
+            program: The statements and sections to lay out
+            symbols: Symbol values found by the previous pass
+            bases: Section addresses found by the previous pass
+        """
+        self.program = program
+        self.previous = symbols
+        self.previous_bases = bases
+        self.origin = program.origin or 0
+        self.contents = {name: bytearray() for name in program.sections}
+        # Labels as (section, offset) and equ values, resolved after the pass
+        self.labels: dict[str, tuple[str, int]] = {}
+        self.values: dict[str, int | None] = {}
+        self.symbols: dict[str, int] = {}
+        self.bases: dict[str, int] = {}
+        self.widened = False
+        # First symbol that could not be resolved, with the statement using it
+        self.unresolved: tuple[str, Statement] | None = None
+        # First error that only counts once addresses have settled
+        self.deferred: tuple[str, Statement] | None = None
+        self.statement: Statement | None = None
+        self.here: int | None = None
+        self.start: int | None = None
+
+    def run(self) -> None:
+        """Encode every statement and compute the resulting addresses."""
+        for statement in self.program.statements:
+            self.statement = statement
+            content = self.contents[statement.section]
+            base = self.origin if statement.section == ".text" else self.previous_bases.get(statement.section)
+            self.start = base
+            self.here = None if base is None else base + len(content)
+            try:
+                if statement.kind == "label":
+                    self.labels[statement.name] = (statement.section, len(content))
+                elif statement.kind == "equ":
+                    self.values[statement.name] = self.value(statement.operands[0])
+                elif statement.times is None:
+                    content += self.encode(statement)
+                else:
+                    count = self.value(statement.times)
+                    if count is not None and count < 0:
+                        raise AssemblerError("'times' count is negative")
+                    for _ in range(count or 0):
+                        content += self.encode(statement)
+                        if self.here is not None:
+                            self.here = base + len(content)
+            except AssemblerError as error:
+                if error.line is not None:
+                    raise
+                raise AssemblerError(error.message, statement.path, statement.line) from None
+
+        self._place_sections()
+        for name, (section, offset) in self.labels.items():
+            self.symbols[name] = self.bases[section] + offset
+        for name, value in self.values.items():
+            if value is not None:
+                self.symbols[name] = value
+
+    def _place_sections(self) -> None:
+        """Give every section its address, ``.text`` first and nobits last."""
+        sections = self.program.sections
+        order = [name for name, (_, nobits) in sections.items() if not nobits]
+        order += [name for name, (_, nobits) in sections.items() if nobits]
+        address = self.origin
+        for name in order:
+            align = sections[name][0] if name != ".text" else 1
+            address = -(-address // align) * align
+            self.bases[name] = address
+            address += len(self.contents[name])
+
+    def image(self) -> bytes:
+        """Return the flat binary of the laid out program."""
+        image = bytearray()
+        for name, (_, nobits) in self.program.sections.items():
+            content = self.contents[name]
+            if nobits or not content:
+                continue
+            offset = self.bases[name] - self.origin
+            if len(image) < offset:
+                image += bytes(offset - len(image))
+            image[offset:offset + len(content)] = content
+        return bytes(image)
+
+    # -- Expressions -----------------------------------------------------
+
+    def value(self, expression: object) -> int | None:
+        """Evaluate an expression; None if it uses a symbol not known yet."""
+        if type(expression) is int:
+            return expression
+        return _evaluate(expression, self._lookup)
+
+    def _lookup(self, name: str) -> int | None:
+        """Return the value of a symbol, ``$`` or ``$$`` as of this pass."""
+        if name == "$":
+            value = self.here
+        elif name == "$$":
+            value = self.start
+        else:
+            statement = self.statement
+            if name.startswith(".") and not name.startswith("..@"):
+                name = statement.scope + name
+            value = self.values.get(name) if name in self.values else self.previous.get(name)
+        if value is None and self.unresolved is None:
+            self.unresolved = (name, self.statement)
+        return value
+
+    def fits(self, field: str, value: int | None, low: int = -128, high: int = 127) -> bool:
+        """Decide whether a field of the statement gets its short encoding.
+
+        Values not known yet are assumed to fit; once a value does not, the
+        field stays wide in every later pass, so the layout always settles.
+        """
+        statement = self.statement
+        if field in statement.wide:
+            return False
+        if value is None or low <= value <= high:
+            return True
+        statement.wide.add(field)
+        self.widened = True
+        return False
+
+    def defer(self, message: str) -> None:
+        """Record an error that depends on addresses that may still move."""
+        if self.deferred is None:
+            self.deferred = (message, self.statement)
+
+    # -- Encoding --------------------------------------------------------
+
+    def encode(self, statement: Statement) -> bytes:
+        """Encode one directive or instruction at the current address."""
+        kind = statement.kind
+        if kind == "data":
+            unit = DATA_DIRECTIVES[statement.name]
+            data = bytearray()
+            for item in statement.operands:
+                if isinstance(item, bytes):
+                    data += item + bytes(-len(item) % unit)
+                else:
+                    data += _pack(self.value(item) or 0, unit)
+            return bytes(data)
+        if kind == "reserve":
+            count = self.value(statement.operands[0])
+            if count is not None and count < 0:
+                raise AssemblerError("reservation size is negative")
+            return bytes((count or 0) * RESERVE_DIRECTIVES[statement.name])
+        if kind == "align":
+            boundary = self.value(statement.operands[0])
+            if not boundary or self.here is None:
+                return b""
+            return b"\x90" * (-self.here % boundary)
+
+        operands = statement.operands
+        segments = bytes(
+            _SEGMENT_PREFIXES[operand.segment]
+            for operand in operands
+            if isinstance(operand, Memory) and operand.segment is not None
+        )
+        return statement.prefixes + segments + _ENCODERS[statement.name](self, statement.name, operands)
+
+    def modrm(self, reg: int, operand: Register | Memory) -> bytes:
+        """Encode the ModRM byte and displacement of an r/m operand."""
+        if isinstance(operand, Register):
+            return bytes((0xC0 | reg << 3 | operand.code,))
+        displacement = 0 if operand.displacement is None else self.value(operand.displacement)
+        if operand.mode is None:
+            return bytes((0x06 | reg << 3,)) + _pack(displacement or 0, 2)
+        signed = None if displacement is None else _signed16(displacement)
+        if signed == 0 and operand.mode != _BP_ONLY and "disp" not in self.statement.wide:
+            return bytes((operand.mode | reg << 3,))
+        if self.fits("disp", signed):
+            return bytes((0x40 | operand.mode | reg << 3, (signed or 0) & 0xFF))
+        return bytes((0x80 | operand.mode | reg << 3,)) + _pack(displacement, 2)
+
+    def immediate(self, operand: Immediate, size: int) -> bytes:
+        """Encode an immediate operand of the given size."""
+        return _pack(self.value(operand.expression) or 0, size)
+
+    def relative(self, operand: Immediate, length: int) -> int | None:
+        """Return a jump displacement, for an instruction of ``length`` bytes."""
+        target = self.value(operand.expression)
+        if target is None or self.here is None:
+            return None
+        return target - (self.here + length)
+
+
+def statement_lines(stream: TokenStream) -> Iterator[list[TokenRow]]:
+    """Group the tokens of a stream by line, gluing back split words.
+
+    The lexer cuts words around embedded pseudoinstructions (``ADDR`` lexes
+    as ``A``, ``DD``, ``R``); adjacent word tokens are merged again so the
+    assembler sees the words as written.
+    """
+    for _, line in groupby(stream.rows(), key=operator.attrgetter("line")):
+        rows: list[TokenRow] = []
+        for row in line:
+            if rows and _is_word(row) and _is_word(rows[-1]):
+                last = rows[-1]
+                if last.column + len(last.value) == row.column:
+                    rows[-1] = TokenRow(last.value + row.value, "SÍMBOLO", last.line, last.column)
+                    continue
+            rows.append(row)
+        yield rows
+
+
+def _is_word(row: TokenRow) -> bool:
+    """Whether a token is part of a word, as opposed to punctuation or a string."""
+    return row.type not in ("SEPARADOR", "CONSTANTE_STR")
+
+
+def _text(rows: list[TokenRow]) -> str:
+    """Rebuild the source text of a run of tokens on one line."""
+    parts = []
+    end = None
+    for row in rows:
+        if end is not None and row.column > end:
+            parts.append(" ")
+        parts.append(row.value)
+        end = row.column + len(row.value)
+    return "".join(parts)
+
+
+def _split_operands(rows: list[TokenRow]) -> list[list[TokenRow]]:
+    """Split the tokens after a mnemonic at the commas between operands."""
+    if not rows:
+        return []
+    groups: list[list[TokenRow]] = [[]]
+    for row in rows:
+        if row.value == "," and row.type == "SEPARADOR":
+            groups.append([])
+        else:
+            groups[-1].append(row)
+    if any(not group for group in groups):
+        raise AssemblerError("empty operand")
+    return groups
+
+
+def _data_item(text: str, rows: list[TokenRow]) -> object:
+    """Parse one item of a data definition: a string or an expression."""
+    if len(rows) == 1 and rows[0].type == "CONSTANTE_STR":
+        return rows[0].value[1:-1].encode("utf-8")
+    return _expression(text)
+
+
+@lru_cache(maxsize=4096)
+def _operand(text: str) -> Operand:
+    """Parse an instruction operand.
+
+    Operands do not depend on where they appear (local labels are resolved
+    when evaluated), so each distinct operand text is parsed once.
+    """
+    size = None
+    jump = None
+    while True:
+        keyword, _, rest = text.partition(" ")
+        lowered = keyword.lower()
+        if lowered in _SIZE_KEYWORDS and rest:
+            size = _SIZE_KEYWORDS[lowered]
+        elif lowered in _JUMP_KEYWORDS and rest:
+            jump = lowered
+        else:
+            break
+        text = rest.lstrip()
+
+    lowered = text.lower()
+    if lowered in REGISTERS_8:
+        return Register(lowered, 1, REGISTERS_8[lowered])
+    if lowered in REGISTERS_16:
+        return Register(lowered, 2, REGISTERS_16[lowered])
+    if lowered in SEGMENT_REGISTERS:
+        return Register(lowered, 2, SEGMENT_REGISTERS[lowered], segment=True)
+    if text.startswith("[") and text.endswith("]"):
+        return _memory(text[1:-1], size)
+    if "[" in text or "]" in text:
+        raise AssemblerError(f"invalid operand '{text}'")
+    return Immediate(_expression(text), size, jump)
+
+
+def _memory(text: str, size: int | None) -> Memory:
+    """Parse the inside of a memory operand's brackets."""
+    tokens = _tokenize(text)
+    segment = None
+    if len(tokens) > 2 and tokens[1] == ":" and tokens[0].lower() in SEGMENT_REGISTERS:
+        segment = tokens[0].lower()
+        tokens = tokens[2:]
+
+    # Split the top-level sum into terms, pulling out the address registers
+    registers: list[str] = []
+    displacement: list[str] = []
+    term: list[str] = []
+    depth = 0
+    for token in [*tokens, "+"]:
+        if depth == 0 and token in ("+", "-") and term:
+            sign, body = (term[0], term[1:]) if term[0] in ("+", "-") else ("+", term)
+            if len(body) == 1 and body[0].lower() in ("bx", "bp", "si", "di"):
+                if sign == "-":
+                    raise AssemblerError(f"cannot subtract register '{body[0]}'")
+                registers.append(body[0].lower())
+            else:
+                displacement += [sign, *body]
+            term = []
+        depth += (token == "(") - (token == ")")
+        term.append(token)
+
+    mode = None
+    if registers:
+        mode = _ADDRESSING_MODES.get(frozenset(registers))
+        if mode is None or len(set(registers)) != len(registers):
+            raise AssemblerError(f"invalid effective address '[{text}]'")
+    expression = _parse(displacement, text) if displacement else None
+    if mode is None and expression is None:
+        raise AssemblerError(f"invalid effective address '[{text}]'")
+    return Memory(mode, expression, size, segment)
+
+
+@lru_cache(maxsize=4096)
+def _expression(text: str) -> object:
+    """Parse an expression; constant expressions are folded to an int."""
+    return _parse(_tokenize(text), text)
+
+
+def _tokenize(text: str) -> list[str]:
+    """Split an expression into tokens."""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _EXPRESSION_TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise AssemblerError(f"invalid expression '{text}'")
+        tokens.append(match.group().strip())
+        position = match.end()
+    return tokens
+
+
+def _parse(tokens: list[str], text: str) -> object:
+    """Parse expression tokens into an int or a tree of nested tuples.
+
+    Trees are ``("sym", name)`` for symbols, ``$`` and ``$$``,
+    ``("unary", op, operand)`` and ``("binary", op, left, right)``.
+    """
+    position = 0
+
+    def binary(level: int) -> object:
+        nonlocal position
+        if level == len(_BINARY_OPERATORS):
+            return unary()
+        operators = _BINARY_OPERATORS[level]
+        left = binary(level + 1)
+        while position < len(tokens) and tokens[position] in operators:
+            function = operators[tokens[position]]
+            position += 1
+            right = binary(level + 1)
+            if type(left) is int and type(right) is int:
+                left = function(left, right)
+            else:
+                left = ("binary", function, left, right)
+        return left
+
+    def unary() -> object:
+        nonlocal position
+        if position >= len(tokens):
+            raise AssemblerError(f"invalid expression '{text}'")
+        token = tokens[position]
+        position += 1
+        if token in _UNARY_OPERATORS:
+            operand = unary()
+            function = _UNARY_OPERATORS[token]
+            return function(operand) if type(operand) is int else ("unary", function, operand)
+        if token == "(":
+            inner = binary(0)
+            if position >= len(tokens) or tokens[position] != ")":
+                raise AssemblerError(f"missing ')' in '{text}'")
+            position += 1
+            return inner
+        if token[0].isdigit():
+            return _number(token)
+        if token[0] in "'\"":
+            return int.from_bytes(token[1:-1].encode("utf-8"), "little")
+        if token in ("$", "$$"):
+            return ("sym", token)
+        if token[0].isalpha() or token[0] in "_.?@$":
+            if token.lower() in REGISTERS_8 or token.lower() in REGISTERS_16 or token.lower() in SEGMENT_REGISTERS:
+                raise AssemblerError(f"register '{token}' cannot be used in an expression")
+            return ("sym", token.removeprefix("$"))
+        raise AssemblerError(f"invalid expression '{text}'")
+
+    result = binary(0)
+    if position != len(tokens):
+        raise AssemblerError(f"invalid expression '{text}'")
+    return result
+
+
+def _evaluate(node: object, lookup: Callable[[str], int | None]) -> int | None:
+    """Evaluate an expression tree; None if any symbol is unknown."""
+    if type(node) is int:
+        return node
+    kind = node[0]
+    if kind == "sym":
+        return lookup(node[1])
+    if kind == "unary":
+        operand = _evaluate(node[2], lookup)
+        return None if operand is None else node[1](operand)
+    left = _evaluate(node[2], lookup)
+    right = _evaluate(node[3], lookup)
+    if left is None or right is None:
+        return None
+    return node[1](left, right)
+
+
+def _number(token: str) -> int:
+    """Parse a numeric constant in any of NASM's notations."""
+    text = token.lower().replace("_", "")
+    try:
+        if text.startswith(("0x", "0h")):
+            return int(text[2:], 16)
+        if text.endswith("h"):
+            return int(text[:-1], 16)
+        if text.startswith(("0b", "0y")):
+            return int(text[2:], 2)
+        if text.endswith(("b", "y")):
+            return int(text[:-1], 2)
+        if text.startswith(("0o", "0q")):
+            return int(text[2:], 8)
+        if text.endswith(("o", "q")):
+            return int(text[:-1], 8)
+        if text.startswith(("0d", "0t")):
+            return int(text[2:])
+        if text.endswith(("d", "t")):
+            return int(text[:-1])
+        return int(text)
+    except ValueError:
+        raise AssemblerError(f"invalid number '{token}'") from None
+
+
+def _divide(left: int, right: int, remainder: bool) -> int:
+    """Divide like NASM, truncating toward zero."""
+    if right == 0:
+        raise AssemblerError("division by zero")
+    quotient = abs(left) // abs(right) * (1 if (left < 0) == (right < 0) else -1)
+    return left - quotient * right if remainder else quotient
+
+
+def _pack(value: int, size: int) -> bytes:
+    """Encode a value little-endian in ``size`` bytes, wrapping like NASM."""
+    return (value & ((1 << size * 8) - 1)).to_bytes(size, "little")
+
+
+def _signed16(value: int) -> int:
+    """Interpret a value as a signed 16-bit word."""
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+# -- Instruction encoders -------------------------------------------------
+#
+# Every encoder receives the pass, the mnemonic and the parsed operands, and
+# returns the bytes of the instruction without prefixes.
+
+
+def _operand_size(operands: tuple[Operand, ...], default: int | None = None) -> int:
+    """Return the common size of some operands, checking they agree."""
+    sizes = {operand.size for operand in operands if operand.size is not None}
+    if len(sizes) > 1:
+        raise AssemblerError("mismatch in operand sizes")
+    if sizes:
+        return sizes.pop()
+    if default is None:
+        raise AssemblerError("operation size not specified")
+    return default
+
+
+def _expect(operands: tuple[Operand, ...], count: int, mnemonic: str) -> None:
+    """Check the number of operands of an instruction."""
+    if len(operands) != count:
+        raise AssemblerError(f"'{mnemonic}' takes {count} operand{'s' if count != 1 else ''}")
+
+
+def _invalid(mnemonic: str) -> AssemblerError:
+    """Return the error for an unsupported combination of operands."""
+    return AssemblerError(f"invalid combination of operands for '{mnemonic}'")
+
+
+def _encode_mov(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 2, mnemonic)
+    target, source = operands
+    if isinstance(target, Register) and target.segment:
+        if isinstance(source, Immediate) or (isinstance(source, Register) and (source.segment or source.size != 2)):
+            raise _invalid(mnemonic)
+        return b"\x8E" + layout.modrm(target.code, source)
+    if isinstance(source, Register) and source.segment:
+        if isinstance(target, Immediate) or target.size == 1:
+            raise _invalid(mnemonic)
+        return b"\x8C" + layout.modrm(source.code, target)
+
+    size = _operand_size(operands)
+    wide = size - 1
+    if isinstance(target, Register):
+        if isinstance(source, Immediate):
+            return bytes((0xB0 + wide * 8 + target.code,)) + layout.immediate(source, size)
+        if isinstance(source, Memory) and source.mode is None and target.code == 0:
+            return bytes((0xA0 | wide,)) + _pack(layout.value(source.displacement) or 0, 2)
+        if isinstance(source, Register):
+            return bytes((0x88 | wide,)) + layout.modrm(source.code, target)
+        return bytes((0x8A | wide,)) + layout.modrm(target.code, source)
+    if isinstance(target, Memory):
+        if isinstance(source, Register):
+            if target.mode is None and source.code == 0:
+                return bytes((0xA2 | wide,)) + _pack(layout.value(target.displacement) or 0, 2)
+            return bytes((0x88 | wide,)) + layout.modrm(source.code, target)
+        if isinstance(source, Immediate):
+            return bytes((0xC6 | wide,)) + layout.modrm(0, target) + layout.immediate(source, size)
+    raise _invalid(mnemonic)
+
+
+def _encode_arithmetic(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 2, mnemonic)
+    target, source = operands
+    digit = ARITHMETIC[mnemonic]
+    size = _operand_size(operands)
+    wide = size - 1
+    if isinstance(target, Immediate) or any(isinstance(op, Register) and op.segment for op in operands):
+        raise _invalid(mnemonic)
+    if isinstance(source, Register):
+        return bytes((digit * 8 | wide,)) + layout.modrm(source.code, target)
+    if isinstance(source, Memory):
+        if isinstance(target, Memory):
+            raise _invalid(mnemonic)
+        return bytes((digit * 8 | 2 | wide,)) + layout.modrm(target.code, source)
+
+    accumulator = isinstance(target, Register) and target.code == 0
+    if size == 1:
+        if accumulator:
+            return bytes((digit * 8 | 4,)) + layout.immediate(source, 1)
+        return b"\x80" + layout.modrm(digit, target) + layout.immediate(source, 1)
+    value = layout.value(source.expression)
+    if layout.fits("imm", None if value is None else _signed16(value)):
+        return b"\x83" + layout.modrm(digit, target) + layout.immediate(source, 1)
+    if accumulator:
+        return bytes((digit * 8 | 5,)) + layout.immediate(source, 2)
+    return b"\x81" + layout.modrm(digit, target) + layout.immediate(source, 2)
+
+
+def _encode_unary(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 1, mnemonic)
+    (target,) = operands
+    if isinstance(target, Immediate) or (isinstance(target, Register) and target.segment):
+        raise _invalid(mnemonic)
+    return bytes((0xF6 | (_operand_size(operands) - 1),)) + layout.modrm(UNARY[mnemonic], target)
+
+
+def _encode_step(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 1, mnemonic)
+    (target,) = operands
+    digit = 0 if mnemonic == "inc" else 1
+    if isinstance(target, Immediate) or (isinstance(target, Register) and target.segment):
+        raise _invalid(mnemonic)
+    if isinstance(target, Register) and target.size == 2:
+        return bytes((0x40 + digit * 8 + target.code,))
+    return bytes((0xFE | (_operand_size(operands) - 1),)) + layout.modrm(digit, target)
+
+
+def _encode_stack(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 1, mnemonic)
+    (target,) = operands
+    push = mnemonic == "push"
+    if isinstance(target, Register):
+        if target.segment:
+            if not push and target.name == "cs":
+                raise _invalid(mnemonic)
+            return bytes((0x06 + target.code * 8 + (not push),))
+        if target.size != 2:
+            raise _invalid(mnemonic)
+        return bytes(((0x50 if push else 0x58) + target.code,))
+    if isinstance(target, Memory):
+        if _operand_size(operands, 2) != 2:
+            raise _invalid(mnemonic)
+        return (b"\xFF" + layout.modrm(6, target)) if push else (b"\x8F" + layout.modrm(0, target))
+    if not push:
+        raise _invalid(mnemonic)
+    value = layout.value(target.expression)
+    if target.size != 2 and layout.fits("imm", None if value is None else _signed16(value)):
+        return b"\x6A" + layout.immediate(target, 1)
+    return b"\x68" + layout.immediate(target, 2)
+
+
+def _encode_shift(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 2, mnemonic)
+    target, count = operands
+    if isinstance(target, Immediate) or (isinstance(target, Register) and target.segment):
+        raise _invalid(mnemonic)
+    wide = _operand_size((target,)) - 1
+    digit = SHIFTS[mnemonic]
+    if isinstance(count, Register):
+        if count.name != "cl":
+            raise _invalid(mnemonic)
+        return bytes((0xD2 | wide,)) + layout.modrm(digit, target)
+    if not isinstance(count, Immediate):
+        raise _invalid(mnemonic)
+    if count.expression == 1:
+        return bytes((0xD0 | wide,)) + layout.modrm(digit, target)
+    return bytes((0xC0 | wide,)) + layout.modrm(digit, target) + layout.immediate(count, 1)
+
+
+def _encode_test(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 2, mnemonic)
+    target, source = operands
+    wide = _operand_size(operands) - 1
+    if isinstance(source, Memory):
+        target, source = source, target
+    if isinstance(source, Register) and not source.segment and not isinstance(target, Immediate):
+        return bytes((0x84 | wide,)) + layout.modrm(source.code, target)
+    if not isinstance(source, Immediate) or isinstance(target, Immediate):
+        raise _invalid(mnemonic)
+    if isinstance(target, Register) and target.code == 0:
+        return bytes((0xA8 | wide,)) + layout.immediate(source, wide + 1)
+    return bytes((0xF6 | wide,)) + layout.modrm(0, target) + layout.immediate(source, wide + 1)
+
+
+def _encode_xchg(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 2, mnemonic)
+    target, source = operands
+    wide = _operand_size(operands) - 1
+    if isinstance(source, Memory):
+        target, source = source, target
+    if not isinstance(source, Register) or source.segment or isinstance(target, Immediate):
+        raise _invalid(mnemonic)
+    if isinstance(target, Register) and wide and 0 in (target.code, source.code):
+        return bytes((0x90 + target.code + source.code,))
+    return bytes((0x86 | wide,)) + layout.modrm(source.code, target)
+
+
+def _encode_load_address(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 2, mnemonic)
+    target, source = operands
+    if not isinstance(target, Register) or target.size != 2 or target.segment or not isinstance(source, Memory):
+        raise _invalid(mnemonic)
+    opcode = {"lea": 0x8D, "les": 0xC4, "lds": 0xC5}[mnemonic]
+    return bytes((opcode,)) + layout.modrm(target.code, source)
+
+
+def _encode_interrupt(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 1, mnemonic)
+    (number,) = operands
+    if not isinstance(number, Immediate):
+        raise _invalid(mnemonic)
+    return b"\xCD" + layout.immediate(number, 1)
+
+
+def _encode_jump(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 1, mnemonic)
+    (target,) = operands
+    call = mnemonic == "call"
+    if not isinstance(target, Immediate):
+        if isinstance(target, Register) and (target.segment or target.size != 2):
+            raise _invalid(mnemonic)
+        return b"\xFF" + layout.modrm(2 if call else 4, target)
+    if not call and target.jump != "near":
+        offset = layout.relative(target, 2)
+        if target.jump == "short":
+            _check_short(offset, layout)
+            return b"\xEB" + _pack(offset or 0, 1)
+        if layout.fits("rel", offset):
+            return b"\xEB" + _pack(offset or 0, 1)
+    return (b"\xE8" if call else b"\xE9") + _pack(layout.relative(target, 3) or 0, 2)
+
+
+def _encode_conditional(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 1, mnemonic)
+    (target,) = operands
+    if not isinstance(target, Immediate):
+        raise _invalid(mnemonic)
+    opcode = CONDITIONAL_JUMPS[mnemonic]
+    if target.jump != "near":
+        offset = layout.relative(target, 2)
+        if target.jump == "short":
+            _check_short(offset, layout)
+            return bytes((opcode,)) + _pack(offset or 0, 1)
+        if layout.fits("rel", offset):
+            return bytes((opcode,)) + _pack(offset or 0, 1)
+    # Near conditional jumps need a 386; NASM emits them all the same
+    return bytes((0x0F, opcode + 0x10)) + _pack(layout.relative(target, 4) or 0, 2)
+
+
+def _encode_short_jump(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 1, mnemonic)
+    (target,) = operands
+    if not isinstance(target, Immediate):
+        raise _invalid(mnemonic)
+    offset = layout.relative(target, 2)
+    _check_short(offset, layout)
+    return bytes((SHORT_JUMPS[mnemonic],)) + _pack(offset or 0, 1)
+
+
+def _check_short(offset: int | None, layout: _Pass) -> None:
+    """Report a jump that only has a short form and is out of range."""
+    if offset is not None and not -128 <= offset <= 127:
+        layout.defer(f"short jump out of range ({offset} bytes)")
+
+
+def _encode_return(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    far = mnemonic == "retf"
+    if not operands:
+        return b"\xCB" if far else b"\xC3"
+    _expect(operands, 1, mnemonic)
+    if not isinstance(operands[0], Immediate):
+        raise _invalid(mnemonic)
+    return (b"\xCA" if far else b"\xC2") + layout.immediate(operands[0], 2)
+
+
+def _encode_port(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 2, mnemonic)
+    accumulator, port = operands if mnemonic == "in" else operands[::-1]
+    if not isinstance(accumulator, Register) or accumulator.code != 0 or accumulator.segment:
+        raise _invalid(mnemonic)
+    wide = accumulator.size - 1
+    out = 2 if mnemonic == "out" else 0
+    if isinstance(port, Register) and port.name == "dx":
+        return bytes((0xEC | out | wide,))
+    if not isinstance(port, Immediate):
+        raise _invalid(mnemonic)
+    return bytes((0xE4 | out | wide,)) + layout.immediate(port, 1)
+
+
+def _encode_ascii_adjust(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    opcode = b"\xD4" if mnemonic == "aam" else b"\xD5"
+    if not operands:
+        return opcode + b"\x0A"
+    _expect(operands, 1, mnemonic)
+    if not isinstance(operands[0], Immediate):
+        raise _invalid(mnemonic)
+    return opcode + layout.immediate(operands[0], 1)
+
+
+def _encode_simple(layout: _Pass, mnemonic: str, operands: tuple[Operand, ...]) -> bytes:
+    _expect(operands, 0, mnemonic)
+    return SIMPLE[mnemonic]
+
+
+_ENCODERS: dict[str, Callable[[_Pass, str, tuple[Operand, ...]], bytes]] = {
+    "mov": _encode_mov,
+    **dict.fromkeys(ARITHMETIC, _encode_arithmetic),
+    **dict.fromkeys(UNARY, _encode_unary),
+    **dict.fromkeys(SHIFTS, _encode_shift),
+    **dict.fromkeys(CONDITIONAL_JUMPS, _encode_conditional),
+    **dict.fromkeys(SHORT_JUMPS, _encode_short_jump),
+    **dict.fromkeys(SIMPLE, _encode_simple),
+    "inc": _encode_step, "dec": _encode_step,
+    "push": _encode_stack, "pop": _encode_stack,
+    "test": _encode_test,
+    "xchg": _encode_xchg,
+    "lea": _encode_load_address, "les": _encode_load_address, "lds": _encode_load_address,
+    "int": _encode_interrupt,
+    "jmp": _encode_jump, "call": _encode_jump,
+    "ret": _encode_return, "retn": _encode_return, "retf": _encode_return,
+    "in": _encode_port, "out": _encode_port,
+    "aam": _encode_ascii_adjust, "aad": _encode_ascii_adjust,
+}
+
+# Words that start a statement rather than name a label
+MNEMONICS = {
+    *_ENCODERS, *PREFIXES, *DATA_DIRECTIVES, *RESERVE_DIRECTIVES, *_IGNORED_DIRECTIVES,
+    "times", "equ", "align", "org", "section", "segment",
+}
+# Directives that may follow a label written without a colon
+LABELLED_DIRECTIVES = {*DATA_DIRECTIVES, *RESERVE_DIRECTIVES, "equ", "times"}
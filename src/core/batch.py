@@ -0,0 +1,168 @@
+"""Batch lexical analysis of many 8086 assembly files."""
+
+from __future__ import annotations
+
+import glob
+import time
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from .cache import TokenCache
+from .defaults import DEFAULT_PATTERNS
+from .includes import IncludeCycleError, IncludeResolver
+from .lexer import Lexer
+from .tokens import TOKEN_TYPES
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+
+class FileResult(NamedTuple):
+    """Outcome of lexing a single file."""
+
+    path: str
+    token_count: int
+    type_counts: dict[str, int]
+    seconds: float
+    error: str | None = None
+    cached: bool = False
+
+
+def collect_files(targets: Iterable[str], patterns: Iterable[str] = DEFAULT_PATTERNS) -> list[Path]:
+    """Expand files, directories and glob patterns into a list of files.
+
+    Args:
+        targets: Paths to files or directories, or glob patterns
+        patterns: File patterns searched recursively inside directories
+
+    Returns:
+        The matching files, sorted and without duplicates
+    """
+    patterns = tuple(patterns)
+    files: set[Path] = set()
+    for target in targets:
+        path = Path(target)
+        if path.is_dir():
+            for pattern in patterns:
+                files.update(p for p in path.rglob(pattern) if p.is_file())
+        elif glob.has_magic(target):
+            files.update(Path(p) for p in glob.glob(target, recursive=True) if Path(p).is_file())
+        else:
+            # Missing files are kept so they are reported as failures
+            files.add(path)
+    return sorted(files)
+
+
+# Token caches and include resolvers of the current process
+_caches: dict[str, TokenCache] = {}
+_resolvers: dict[tuple[str | None, tuple[str, ...]], IncludeResolver] = {}
+
+
+def _resolver(cache_dir: str | None, include_paths: tuple[str, ...]) -> IncludeResolver:
+    """Return the include resolver of this process for a configuration."""
+    key = (cache_dir, include_paths)
+    resolver = _resolvers.get(key)
+    if resolver is None:
+        cache = TokenCache(cache_dir) if cache_dir is not None else None
+        resolver = _resolvers[key] = IncludeResolver(include_paths, cache)
+    return resolver
+
+
+def lex_file(
+    path: str | Path,
+    cache_dir: str | None = None,
+    include_paths: tuple[str, ...] | None = None,
+) -> FileResult:
+    """Lex one file and count its tokens per type.
+
+    Args:
+        path: Path to the assembly file
+        cache_dir: Directory of the token cache to use; None always lexes
+        include_paths: Resolve ``%include`` directives, searching these
+            directories after the file's own; None leaves them unresolved
+
+    Returns:
+        The token counts and timing, or the error that stopped the analysis
+    """
+    start = time.perf_counter()
+    cached = False
+    try:
+        if include_paths is not None:
+            # Libraries are lexed once per process and shared by every program
+            types = Counter(token.row.type for token in _resolver(cache_dir, include_paths).expand(path))
+            return FileResult(str(path), sum(types.values()), dict(types), time.perf_counter() - start)
+        if cache_dir is not None:
+            cache = _caches.get(cache_dir)
+            if cache is None:
+                cache = _caches[cache_dir] = TokenCache(cache_dir)
+            stream, cached = cache.lex_file(path)
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                source_code = f.read()
+            stream = Lexer(source_code).analyze_stream()
+    except (OSError, UnicodeDecodeError, IncludeCycleError) as e:
+        return FileResult(str(path), 0, {}, time.perf_counter() - start, str(e))
+    except Exception as e:
+        # Any other failure is still the file's own, not the batch's
+        return FileResult(str(path), 0, {}, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+
+    type_counts = {TOKEN_TYPES[type_id]: count for type_id, count in Counter(stream.type_ids).items()}
+    return FileResult(str(path), len(stream), type_counts, time.perf_counter() - start, cached=cached)
+
+
+def lex_files(
+    paths: Iterable[str | Path],
+    workers: int | None = None,
+    cache_dir: str | None = None,
+    include_paths: tuple[str, ...] | None = None,
+) -> Iterator[FileResult]:
+    """Lex many files on a process pool, yielding results as they finish.
+
+    Args:
+        paths: Files to lex
+        workers: Number of worker processes; 1 lexes in the current process
+            and None uses one worker per CPU
+        cache_dir: Directory of the token cache shared by the workers; None
+            always lexes
+        include_paths: Resolve ``%include`` directives, searching these
+            directories after each file's own; None leaves them unresolved
+
+    Yields:
+        FileResult: The result of each file, in completion order
+    """
+    if workers == 1:
+        for path in paths:
+            yield lex_file(path, cache_dir, include_paths)
+        return
+
+    # Imported here, as a single-process run does not need multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(lex_file, str(path), cache_dir, include_paths): str(path) for path in paths}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself failed, e.g. it was killed
+                result = FileResult(futures[future], 0, {}, 0.0, f"{type(e).__name__}: {e}")
+            yield result
+
+
+def summarize(results: Iterable[FileResult]) -> tuple[Counter[str], int]:
+    """Aggregate the token counts of many files.
+
+    Args:
+        results: Results of the lexed files
+
+    Returns:
+        The token counts per type and the number of failed files
+    """
+    totals: Counter[str] = Counter()
+    failures = 0
+    for result in results:
+        if result.error is not None:
+            failures += 1
+        totals.update(result.type_counts)
+    return totals, failures
@@ -0,0 +1,309 @@
+"""Content-addressed on-disk cache of lexed token streams.
+
+Entries are keyed by a hash of the file content and of everything that
+affects tokenization (the lexer version, its keyword tables and the token
+type names), so an unchanged file is never lexed twice and a lexer change
+silently invalidates every entry.
+
+Each entry stores the columns of a ``TokenStream`` back to back after a
+16-byte header::
+
+    magic      8 bytes
+    count      u64
+    starts     count x u64
+    ends       count x u64
+    lines      count x u32
+    columns    count x u32
+    type_ids   count x u8
+
+Entries are read back through a memory map; the columns are memoryviews
+over the mapping, so loading an entry costs no parsing and no copies. The
+values are sliced from the source, which the caller already has in hand.
+"""
+
+from __future__ import annotations
+
+import codecs
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+
+from . import lexer as _lexer
+from .lexer import Lexer
+from .tokens import TOKEN_TYPES, TokenStream
+
+# Default size cap of the cache directory
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_MAGIC = b"ASMTKC01"
+_HEADER = struct.Struct("<8sQ")
+_SUFFIX = ".tok"
+
+# Column layout of an entry; wide columns first keeps every column aligned
+_COLUMNS = (("starts", "Q"), ("ends", "Q"), ("lines", "I"), ("columns", "I"), ("type_ids", "B"))
+_ROW_BYTES = sum(array(typecode).itemsize for _, typecode in _COLUMNS)
+
+
+def _fingerprint() -> bytes:
+    """Hash everything besides the content that determines the tokens."""
+    parts = [
+        f"lexer={_lexer.LEXER_VERSION}",
+        f"byteorder={sys.byteorder}",
+        "layout=" + ",".join(f"{name}:{typecode}{array(typecode).itemsize}" for name, typecode in _COLUMNS),
+        "types=" + ",".join(TOKEN_TYPES),
+    ]
+    for table in (_lexer.INSTRUCTIONS, _lexer.REGISTERS, _lexer.PSEUDO_INSTRUCTIONS, _lexer.TYPES):
+        parts.append("|".join(sorted(table)))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).digest()
+
+
+def default_cache_dir() -> Path:
+    """Return the cache directory, honouring ``SOME_ASM_CACHE_DIR``.
+
+    Returns:
+        ``$SOME_ASM_CACHE_DIR``, or ``some-asm/tokens`` inside the user's
+        cache directory
+    """
+    override = os.environ.get("SOME_ASM_CACHE_DIR")
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "some-asm" / "tokens"
+
+
+def decode_source(data: bytes, encoding: str = 'utf-8') -> str:
+    """Decode a file's bytes the way a file opened in text mode reads them.
+
+    Args:
+        data: The raw bytes of the file
+        encoding: Text encoding of the file
+
+    Returns:
+        The text, with CRLF and CR line breaks turned into LF
+
+    Raises:
+        UnicodeDecodeError: If the content is not valid in ``encoding``
+    """
+    source = data.decode(encoding)
+    if '\r' in source:
+        source = source.replace('\r\n', '\n').replace('\r', '\n')
+    return source
+
+
+class TokenCache:
+    """On-disk cache of token streams with a size cap and LRU eviction.
+
+    Reading an entry bumps its modification time, so when the directory
+    grows past ``max_bytes`` the entries that were used least recently are
+    deleted first. Entries are written atomically, so several processes can
+    share a cache. Cache errors are never fatal: a broken or unreadable
+    entry is treated as a miss and the file is lexed again.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str] | None = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """Initialize the cache. The directory is created on the first write.
+
+        Args:
+            directory: Where entries are stored; defaults to ``default_cache_dir()``
+            max_bytes: Size above which least recently used entries are evicted
+        """
+        self.directory = Path(directory) if directory is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+        self._fingerprint = _fingerprint()
+        # Estimated size of the directory, measured on the first write
+        self._size: int | None = None
+
+    def key(self, data: bytes, encoding: str = 'utf-8') -> str:
+        """Return the cache key of a file's content.
+
+        Token offsets count characters of the decoded text, so the same
+        bytes read with another encoding get another key.
+
+        Args:
+            data: The raw bytes of the file
+            encoding: Text encoding the content is decoded with
+
+        Returns:
+            The hex digest identifying the content, its encoding and the lexer
+
+        Raises:
+            LookupError: If the encoding is unknown
+        """
+        # Aliases such as "utf8" and "UTF-8" share entries
+        encoding = codecs.lookup(encoding).name
+        return hashlib.sha256(self._fingerprint + encoding.encode('ascii') + b'\0' + data).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        """Return the entry path of a key, sharded by its first byte."""
+        return self.directory / key[:2] / f"{key}{_SUFFIX}"
+
+    def get(self, key: str, source: str) -> TokenStream | None:
+        """Load a cached stream.
+
+        Args:
+            key: Key of the content, from ``key``
+            source: The decoded content the stream's offsets refer to
+
+        Returns:
+            The cached stream, or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < _HEADER.size:
+                    return None
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+        except OSError:
+            return None
+
+        view = memoryview(mm)
+        magic, count = _HEADER.unpack_from(view)
+        if magic != _MAGIC or size != _HEADER.size + count * _ROW_BYTES:
+            view.release()
+            mm.close()
+            return None
+
+        columns = {}
+        offset = _HEADER.size
+        for name, typecode in _COLUMNS:
+            length = count * array(typecode).itemsize
+            columns[name] = view[offset:offset + length].cast(typecode)
+            offset += length
+        return TokenStream.from_buffers(source, **columns)
+
+    def put(self, key: str, stream: TokenStream) -> None:
+        """Store a stream, evicting old entries if the cache is full.
+
+        Args:
+            key: Key of the content, from ``key``
+            stream: The tokens of the content
+        """
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(_HEADER.pack(_MAGIC, len(stream)))
+                    for name, _ in _COLUMNS:
+                        f.write(getattr(stream, name))
+                # Readers only ever see complete entries
+                os.replace(tmp_name, path)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+        except OSError:
+            return
+
+        if self._size is None:
+            self._size = self._disk_usage()
+        else:
+            self._size += _HEADER.size + len(stream) * _ROW_BYTES
+        if self._size > self.max_bytes:
+            self.prune()
+
+    def _entries(self) -> list[os.DirEntry[str]]:
+        """List the entry files of the cache directory."""
+        entries = []
+        try:
+            shards = list(os.scandir(self.directory))
+        except OSError:
+            return entries
+        for shard in shards:
+            if shard.is_dir():
+                try:
+                    entries.extend(e for e in os.scandir(shard.path) if e.name.endswith(_SUFFIX))
+                except OSError:
+                    continue
+        return entries
+
+    def _disk_usage(self) -> int:
+        """Return the total size of the cache entries."""
+        total = 0
+        for entry in self._entries():
+            try:
+                total += entry.stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def prune(self) -> int:
+        """Delete least recently used entries until the cache fits its cap.
+
+        Returns:
+            The number of entries deleted
+        """
+        stats = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            stats.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in stats)
+        removed = 0
+        for _, size, path in sorted(stats):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._size = total
+        return removed
+
+    def clear(self) -> None:
+        """Delete every entry of the cache."""
+        for entry in self._entries():
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                continue
+        self._size = 0
+
+    def lex_bytes(self, data: bytes, encoding: str = 'utf-8') -> tuple[TokenStream, bool]:
+        """Return the tokens of a file's content, lexing it only on a miss.
+
+        Args:
+            data: The raw bytes of the file
+            encoding: Text encoding of the file
+
+        Returns:
+            The token stream and whether it came from the cache
+
+        Raises:
+            UnicodeDecodeError: If the content is not valid in ``encoding``
+        """
+        source = decode_source(data, encoding)
+        key = self.key(data, encoding)
+        stream = self.get(key, source)
+        if stream is not None:
+            return stream, True
+
+        stream = Lexer(source).analyze_stream()
+        self.put(key, stream)
+        return stream, False
+
+    def lex_file(self, path: str | os.PathLike[str], encoding: str = 'utf-8') -> tuple[TokenStream, bool]:
+        """Return the tokens of a file, lexing it only on a miss.
+
+        Args:
+            path: Path to the assembly file
+            encoding: Text encoding of the file
+
+        Returns:
+            The token stream and whether it came from the cache
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        return self.lex_bytes(data, encoding)
@@ -0,0 +1,14 @@
+"""Defaults shared by the core modules and the command line.
+
+This module imports nothing, so the CLI can build its options from it
+without loading the modules that use them.
+"""
+
+# File patterns picked up when a directory is given
+DEFAULT_PATTERNS = ("*.asm", "*.inc", "*.s", "*.nasm")
+
+# Instructions executed by ``Emulator.run`` when no budget is given
+DEFAULT_MAX_INSTRUCTIONS = 10_000_000
+
+# Instructions a program may run in a watch pass before it is stopped
+WATCH_MAX_INSTRUCTIONS = 1_000_000
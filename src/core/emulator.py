@@ -0,0 +1,1294 @@
+"""In-process 8086 emulator for DOS ``.com`` programs.
+
+``Emulator`` loads a ``.com`` image after a Program Segment Prefix, with the
+command tail at offset 80h like DOS does, and runs it on a Python 8086 core.
+The BIOS and DOS services the examples use (INT 10h, 16h, 20h and 21h) are
+implemented in Python on top of pluggable byte streams, so programs run
+headlessly, with their input given as bytes and their output captured.
+
+Each instruction is decoded once into a closure that is cached by address;
+hot loops only pay for executing those closures. Writes to memory that
+holds decoded code drop the cache, so self-modifying programs still work.
+Runs stop after an instruction budget, and can be resumed with ``run``.
+
+The core covers the 8086 instruction set (except the FPU escapes and
+``int`` through the interrupt vector table), plus the 186 forms NASM emits
+by default and the 386 near conditional jumps.
+"""
+
+from __future__ import annotations
+
+import io
+from typing import TYPE_CHECKING, BinaryIO, NamedTuple
+
+from .defaults import DEFAULT_MAX_INSTRUCTIONS
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+# Segment the program is loaded at, as emu2 and DOSBox do
+PSP_SEGMENT = 0x0700
+
+# Largest .com image: a 64 KiB segment minus the PSP and the initial stack word
+MAX_COM_SIZE = 0xFF00 - 2
+
+# Character DOS reads from an exhausted stdin
+EOF_CHARACTER = 0x1A
+
+_MEMORY_SIZE = 0x110000 + 2
+
+# Registers of the ``regs`` list, in ModRM order
+AX, CX, DX, BX, SP, BP, SI, DI = range(8)
+# Segment registers of the ``sregs`` list, in ModRM order
+ES, CS, SS, DS = range(4)
+
+_SEGMENT_OVERRIDES = {0x26: ES, 0x2E: CS, 0x36: SS, 0x3E: DS}
+
+# Flag and value set by CLC, STC, CLI, STI, CLD and STD
+_FLAG_INSTRUCTIONS = {
+    0xF8: ("cf", False), 0xF9: ("cf", True), 0xFA: ("if_", False),
+    0xFB: ("if_", True), 0xFC: ("df", False), 0xFD: ("df", True),
+}
+
+# Base/index registers of each r/m value of 16-bit addressing
+_RM_REGISTERS = ((BX, SI), (BX, DI), (BP, SI), (BP, DI), (SI,), (DI,), (BP,), (BX,))
+
+_PARITY = bytes(1 - bin(value).count("1") % 2 for value in range(256))
+
+# Conditions of the conditional jumps, by condition code
+_CONDITIONS: tuple[Callable[[Emulator], bool], ...] = (
+    lambda cpu: cpu.of,
+    lambda cpu: not cpu.of,
+    lambda cpu: cpu.cf,
+    lambda cpu: not cpu.cf,
+    lambda cpu: cpu.zf,
+    lambda cpu: not cpu.zf,
+    lambda cpu: cpu.cf or cpu.zf,
+    lambda cpu: not (cpu.cf or cpu.zf),
+    lambda cpu: cpu.sf,
+    lambda cpu: not cpu.sf,
+    lambda cpu: cpu.pf,
+    lambda cpu: not cpu.pf,
+    lambda cpu: cpu.sf != cpu.of,
+    lambda cpu: cpu.sf == cpu.of,
+    lambda cpu: cpu.zf or cpu.sf != cpu.of,
+    lambda cpu: not cpu.zf and cpu.sf == cpu.of,
+)
+
+
+class EmulatorError(RuntimeError):
+    """Raised when a program cannot be loaded or executes something unsupported."""
+
+
+class RunResult(NamedTuple):
+    """How a run of the emulator ended."""
+
+    # "exit" when the program terminated, "halt" on HLT, "budget" when the
+    # instruction budget ran out first
+    status: str
+    exit_code: int | None
+    instructions: int
+
+
+class _Stop(Exception):
+    """Raised by an instruction or service to end the run."""
+
+    def __init__(self, status: str, exit_code: int | None = None) -> None:
+        super().__init__(status)
+        self.status = status
+        self.exit_code = exit_code
+
+
+class _Console:
+    """Byte-oriented stdin with one byte of lookahead."""
+
+    def __init__(self, stream: BinaryIO | None) -> None:
+        self.stream = stream
+        self.pending: int | None = None
+
+    def peek(self) -> int | None:
+        """Return the next input byte without consuming it; None at EOF."""
+        if self.pending is None and self.stream is not None:
+            data = self.stream.read(1)
+            self.pending = data[0] if data else None
+        return self.pending
+
+    def read(self) -> int | None:
+        """Consume the next input byte; None at EOF."""
+        value = self.peek()
+        self.pending = None
+        return value
+
+
+class Emulator:
+    """An 8086 running a single DOS ``.com`` program."""
+
+    def __init__(
+        self,
+        image: bytes,
+        args: str = "",
+        stdin: BinaryIO | None = None,
+        stdout: BinaryIO | None = None,
+        echo: bool = True,
+    ) -> None:
+        """Load a program.
+
+        Args:
+            image: The ``.com`` file
+            args: Command line arguments, stored in the PSP command tail
+            stdin: Stream the program's keyboard and stdin reads come from;
+                no input when None
+            stdout: Stream the program's output goes to; captured in an
+                ``io.BytesIO`` when None
+            echo: Echo characters read by the DOS input services, as DOS
+                does; disable it when the input already shows on a terminal
+
+        Raises:
+            EmulatorError: If the image does not fit in a segment
+        """
+        if len(image) > MAX_COM_SIZE:
+            raise EmulatorError(f".com image is {len(image)} bytes, the limit is {MAX_COM_SIZE}")
+        self.memory = bytearray(_MEMORY_SIZE)
+        # 1 for every byte that belongs to a decoded instruction
+        self._code = bytearray(_MEMORY_SIZE)
+        self._decoded: dict[int, tuple[Callable[[], None], int]] = {}
+        self.stdin = _Console(stdin)
+        self.stdout = stdout if stdout is not None else io.BytesIO()
+        self.echo = echo
+        self.instructions = 0
+
+        self.regs = [0] * 8
+        self.sregs = [PSP_SEGMENT] * 4
+        self.ip = 0x100
+        self.cf = self.pf = self.af = self.zf = self.sf = self.tf = self.df = self.of = False
+        self.if_ = True
+
+        base = PSP_SEGMENT << 4
+        memory = self.memory
+        # INT 20h at PSP:0000, where a final RET lands
+        memory[base:base + 2] = b"\xCD\x20"
+        memory[base + 2:base + 4] = (0xA000).to_bytes(2, "little")
+        tail = (" " + args if args else "").encode("latin-1", errors="replace")[:126]
+        memory[base + 0x80] = len(tail)
+        memory[base + 0x81:base + 0x82 + len(tail)] = tail + b"\r"
+        memory[base + 0x100:base + 0x100 + len(image)] = image
+        # The stack starts with a zero word, the return address of the program
+        self.regs[SP] = 0xFFFE
+
+        self._services: dict[int, Callable[[], None]] = {
+            0x10: self._video_service,
+            0x16: self._keyboard_service,
+            0x20: self._terminate,
+            0x21: self._dos_service,
+        }
+
+    # -- Execution -------------------------------------------------------
+
+    def run(self, max_instructions: int | None = DEFAULT_MAX_INSTRUCTIONS) -> RunResult:
+        """Run the program until it ends or the budget runs out.
+
+        Args:
+            max_instructions: Most instructions to execute in this call; None
+                for no limit. A ``rep`` string instruction counts once.
+
+        Returns:
+            How the run ended
+
+        Raises:
+            EmulatorError: On an unsupported instruction or interrupt, or a
+                division error
+        """
+        decoded = self._decoded
+        decode = self._decode
+        sregs = self.sregs
+        budget = max_instructions if max_instructions is not None else -1
+        count = 0
+        ip = self.ip
+        try:
+            while count != budget:
+                ip = self.ip
+                linear = (sregs[CS] << 4) + ip
+                entry = decoded.get(linear)
+                if entry is None:
+                    entry = decode(linear)
+                self.ip = (ip + entry[1]) & 0xFFFF
+                entry[0]()
+                count += 1
+        except _Stop as stop:
+            self.instructions += count + 1
+            return RunResult(stop.status, stop.exit_code, self.instructions)
+        except EmulatorError as error:
+            self.instructions += count
+            raise EmulatorError(f"{error} at {sregs[CS]:04X}:{ip:04X}") from None
+        self.instructions += count
+        return RunResult("budget", None, self.instructions)
+
+    # -- Memory and registers --------------------------------------------
+
+    def read16(self, address: int) -> int:
+        """Read a little-endian word at a linear address."""
+        memory = self.memory
+        return memory[address] | memory[address + 1] << 8
+
+    def write8(self, address: int, value: int) -> None:
+        """Write a byte at a linear address."""
+        self.memory[address] = value
+        if self._code[address]:
+            self._invalidate()
+
+    def write16(self, address: int, value: int) -> None:
+        """Write a little-endian word at a linear address."""
+        memory = self.memory
+        memory[address] = value & 0xFF
+        memory[address + 1] = value >> 8
+        if self._code[address] or self._code[address + 1]:
+            self._invalidate()
+
+    def _invalidate(self) -> None:
+        """Forget every decoded instruction after code was overwritten."""
+        self._decoded.clear()
+        self._code = bytearray(_MEMORY_SIZE)
+
+    def get8(self, index: int) -> int:
+        """Return an 8-bit register by its ModRM index (AL, CL, ... BH)."""
+        return self.regs[index] & 0xFF if index < 4 else self.regs[index - 4] >> 8
+
+    def set8(self, index: int, value: int) -> None:
+        """Set an 8-bit register by its ModRM index."""
+        regs = self.regs
+        if index < 4:
+            regs[index] = regs[index] & 0xFF00 | value
+        else:
+            regs[index - 4] = regs[index - 4] & 0xFF | value << 8
+
+    def push(self, value: int) -> None:
+        """Push a word on the stack."""
+        sp = self.regs[SP] = (self.regs[SP] - 2) & 0xFFFF
+        self.write16((self.sregs[SS] << 4) + sp, value)
+
+    def pop(self) -> int:
+        """Pop a word from the stack."""
+        sp = self.regs[SP]
+        self.regs[SP] = (sp + 2) & 0xFFFF
+        return self.read16((self.sregs[SS] << 4) + sp)
+
+    @property
+    def flags(self) -> int:
+        """The FLAGS register."""
+        return (
+            0xF002 | self.cf | self.pf << 2 | self.af << 4 | self.zf << 6 | self.sf << 7
+            | self.tf << 8 | self.if_ << 9 | self.df << 10 | self.of << 11
+        )
+
+    @flags.setter
+    def flags(self, value: int) -> None:
+        self.cf = bool(value & 0x001)
+        self.pf = bool(value & 0x004)
+        self.af = bool(value & 0x010)
+        self.zf = bool(value & 0x040)
+        self.sf = bool(value & 0x080)
+        self.tf = bool(value & 0x100)
+        self.if_ = bool(value & 0x200)
+        self.df = bool(value & 0x400)
+        self.of = bool(value & 0x800)
+
+    def _string_bytes(self, segment: int, offset: int, end: int) -> bytes:
+        """Read memory from ``segment:offset`` up to a terminator byte."""
+        start = (segment << 4) + offset
+        stop = self.memory.find(end, start, start + 0x10000)
+        return bytes(self.memory[start:stop if stop != -1 else start + 0x10000])
+
+    # -- Arithmetic ------------------------------------------------------
+
+    def _set_result_flags(self, result: int, sign: int) -> None:
+        self.zf = result == 0
+        self.sf = bool(result & sign)
+        self.pf = bool(_PARITY[result & 0xFF])
+
+    def alu(self, operation: int, a: int, b: int, wide: bool) -> int:
+        """Apply ADD, OR, ADC, SBB, AND, SUB, XOR or CMP and set the flags.
+
+        Args:
+            operation: The /digit of the operation, 0 to 7
+            a: Destination operand
+            b: Source operand
+            wide: Whether the operands are words
+
+        Returns:
+            The result, masked to the operand size
+        """
+        mask, sign = (0xFFFF, 0x8000) if wide else (0xFF, 0x80)
+        if operation == 0 or operation == 2:
+            result = a + b + (operation == 2 and self.cf)
+            self.cf = result > mask
+            self.of = bool((a ^ result) & (b ^ result) & sign)
+            self.af = bool((a ^ b ^ result) & 0x10)
+        elif operation == 3 or operation == 5 or operation == 7:
+            result = a - b - (operation == 3 and self.cf)
+            self.cf = result < 0
+            self.of = bool((a ^ b) & (a ^ result) & sign)
+            self.af = bool((a ^ b ^ result) & 0x10)
+        else:
+            result = a | b if operation == 1 else a & b if operation == 4 else a ^ b
+            self.cf = self.of = self.af = False
+        result &= mask
+        self._set_result_flags(result, sign)
+        return result
+
+    def step(self, value: int, delta: int, wide: bool) -> int:
+        """Increment or decrement a value, leaving CF alone."""
+        mask, sign = (0xFFFF, 0x8000) if wide else (0xFF, 0x80)
+        result = (value + delta) & mask
+        self.of = result == (sign if delta > 0 else sign - 1)
+        self.af = bool((value ^ result) & 0x10) if delta > 0 else (value & 0xF) == 0
+        self._set_result_flags(result, sign)
+        return result
+
+    def shift(self, operation: int, value: int, count: int, wide: bool) -> int:
+        """Apply a rotate or shift of the D0-D3 group and set the flags."""
+        count &= 0x1F
+        if not count:
+            return value
+        bits = 16 if wide else 8
+        mask, sign = (1 << bits) - 1, 1 << (bits - 1)
+        if operation == 0:  # ROL
+            for _ in range(count):
+                value = (value << 1 | value >> (bits - 1)) & mask
+            self.cf = bool(value & 1)
+            self.of = bool(value & sign) != self.cf
+        elif operation == 1:  # ROR
+            for _ in range(count):
+                value = (value >> 1 | (value & 1) << (bits - 1)) & mask
+            self.cf = bool(value & sign)
+            self.of = bool((value ^ value << 1) & sign)
+        elif operation == 2:  # RCL
+            for _ in range(count):
+                carry = bool(value & sign)
+                value = (value << 1 | self.cf) & mask
+                self.cf = carry
+            self.of = bool(value & sign) != self.cf
+        elif operation == 3:  # RCR
+            for _ in range(count):
+                carry = bool(value & 1)
+                value = value >> 1 | self.cf << (bits - 1)
+                self.cf = carry
+            self.of = bool((value ^ value << 1) & sign)
+        elif operation == 4 or operation == 6:  # SHL/SAL
+            self.cf = bool(value << (count - 1) & sign) if count <= bits else False
+            result = (value << count) & mask
+            self.of = bool(result & sign) != self.cf
+            value = result
+            self._set_result_flags(value, sign)
+        elif operation == 5:  # SHR
+            self.cf = bool(value >> (count - 1) & 1)
+            self.of = bool(value & sign)
+            value >>= count
+            self._set_result_flags(value, sign)
+        else:  # SAR
+            signed = value - (1 << bits) if value & sign else value
+            self.cf = bool(signed >> (count - 1) & 1)
+            self.of = False
+            value = (signed >> count) & mask
+            self._set_result_flags(value, sign)
+        return value
+
+    def multiply_divide(self, operation: int, value: int, wide: bool) -> None:
+        """Apply MUL, IMUL, DIV or IDIV (/4 to /7 of the F6/F7 group)."""
+        regs = self.regs
+        if wide:
+            bits, accumulator = 16, regs[DX] << 16 | regs[AX]
+        else:
+            bits, accumulator = 8, regs[AX]
+        mask, sign = (1 << bits) - 1, 1 << (bits - 1)
+
+        if operation == 4 or operation == 5:
+            a = regs[AX] & mask
+            if operation == 5:
+                a = a - (1 << bits) if a & sign else a
+                value = value - (1 << bits) if value & sign else value
+            product = a * value
+            low, high = product & mask, (product >> bits) & mask
+            if operation == 4:
+                self.cf = self.of = high != 0
+            else:
+                self.cf = self.of = not -sign <= product < sign
+            if wide:
+                regs[AX], regs[DX] = low, high
+            else:
+                regs[AX] = high << 8 | low
+            return
+
+        if value == 0:
+            raise EmulatorError("divide error")
+        if operation == 6:
+            quotient, remainder = divmod(accumulator, value)
+            if quotient > mask:
+                raise EmulatorError("divide error")
+        else:
+            double = 1 << (bits * 2)
+            dividend = accumulator - double if accumulator & (double >> 1) else accumulator
+            divisor = value - (1 << bits) if value & sign else value
+            quotient = abs(dividend) // abs(divisor)
+            if (dividend < 0) != (divisor < 0):
+                quotient = -quotient
+            remainder = dividend - quotient * divisor
+            if not -sign <= quotient < sign:
+                raise EmulatorError("divide error")
+            quotient &= mask
+            remainder &= mask
+        if wide:
+            regs[AX], regs[DX] = quotient, remainder
+        else:
+            regs[AX] = remainder << 8 | quotient
+
+    # -- Decoding --------------------------------------------------------
+
+    def _decode(self, linear: int) -> tuple[Callable[[], None], int]:
+        """Decode the instruction at a linear address and cache it."""
+        memory = self.memory
+        at = linear
+        segment = None
+        repeat = None
+        while True:
+            byte = memory[at]
+            if byte in _SEGMENT_OVERRIDES:
+                segment = _SEGMENT_OVERRIDES[byte]
+            elif byte == 0xF2 or byte == 0xF3:
+                repeat = byte
+            elif byte != 0xF0:
+                break
+            at += 1
+            if at - linear > 14:
+                raise EmulatorError("too many prefixes")
+
+        execute, length = self._decode_opcode(byte, at + 1, segment, repeat)
+        length += at - linear
+        entry = (execute, length)
+        self._decoded[linear] = entry
+        self._code[linear:linear + length] = b"\x01" * length
+        return entry
+
+    def _immediate(self, at: int, wide: bool) -> int:
+        """Read an immediate operand."""
+        return self.read16(at) if wide else self.memory[at]
+
+    def _modrm(
+        self, at: int, segment: int | None
+    ) -> tuple[int, int, int, Callable[[], int] | None, Callable[[], int] | None, int]:
+        """Decode a ModRM byte and its displacement.
+
+        Returns:
+            mod, reg and rm, closures returning the operand's offset and
+            linear address (None for register operands), and the number of
+            bytes used
+        """
+        modrm = self.memory[at]
+        mod, reg, rm = modrm >> 6, modrm >> 3 & 7, modrm & 7
+        if mod == 3:
+            return mod, reg, rm, None, None, 1
+
+        if mod == 0 and rm == 6:
+            registers: tuple[int, ...] = ()
+            displacement, length = self.read16(at + 1), 3
+        else:
+            registers = _RM_REGISTERS[rm]
+            if mod == 1:
+                displacement = self.memory[at + 1]
+                displacement -= (displacement & 0x80) << 1
+            else:
+                displacement = self.read16(at + 1) if mod == 2 else 0
+            length = 1 + mod
+        if segment is None:
+            segment = SS if BP in registers else DS
+
+        regs = self.regs
+        sregs = self.sregs
+        if len(registers) == 2:
+            first, second = registers
+
+            def offset() -> int:
+                return (regs[first] + regs[second] + displacement) & 0xFFFF
+        elif registers:
+            (first,) = registers
+
+            def offset() -> int:
+                return (regs[first] + displacement) & 0xFFFF
+        else:
+            def offset() -> int:
+                return displacement
+
+        def address() -> int:
+            return (sregs[segment] << 4) + offset()
+
+        return mod, reg, rm, offset, address, length
+
+    def _register_accessors(self, index: int, wide: bool) -> tuple[Callable[[], int], Callable[[int], None]]:
+        """Return a getter and a setter for a general register."""
+        regs = self.regs
+        if wide:
+            def get() -> int:
+                return regs[index]
+
+            def set_(value: int) -> None:
+                regs[index] = value
+        elif index < 4:
+            def get() -> int:
+                return regs[index] & 0xFF
+
+            def set_(value: int) -> None:
+                regs[index] = regs[index] & 0xFF00 | value
+        else:
+            high = index - 4
+
+            def get() -> int:
+                return regs[high] >> 8
+
+            def set_(value: int) -> None:
+                regs[high] = regs[high] & 0xFF | value << 8
+        return get, set_
+
+    def _rm_accessors(
+        self, rm: int, address: Callable[[], int] | None, wide: bool
+    ) -> tuple[Callable[[], int], Callable[[int], None]]:
+        """Return a getter and a setter for the r/m operand of a ModRM byte."""
+        if address is None:
+            return self._register_accessors(rm, wide)
+        memory = self.memory
+        if wide:
+            read16, write16 = self.read16, self.write16
+
+            def get() -> int:
+                return read16(address())
+
+            def set_(value: int) -> None:
+                write16(address(), value)
+        else:
+            write8 = self.write8
+
+            def get() -> int:
+                return memory[address()]
+
+            def set_(value: int) -> None:
+                write8(address(), value)
+        return get, set_
+
+    def _decode_opcode(
+        self, opcode: int, at: int, segment: int | None, repeat: int | None
+    ) -> tuple[Callable[[], None], int]:
+        """Decode the instruction after its prefixes.
+
+        Args:
+            opcode: The opcode byte
+            at: Linear address of the byte after the opcode
+            segment: Segment register of a segment override prefix
+            repeat: The F2 or F3 prefix, if any
+
+        Returns:
+            A closure executing the instruction, and the number of bytes
+            after the prefixes
+        """
+        cpu = self
+        memory = self.memory
+        regs = self.regs
+        sregs = self.sregs
+
+        # ALU operations in their six forms
+        if opcode < 0x40 and opcode & 7 < 6:
+            operation = opcode >> 3
+            wide = bool(opcode & 1)
+            alu = self.alu
+            if opcode & 7 >= 4:
+                value = self._immediate(at, wide)
+                get, set_ = self._register_accessors(AX, wide)
+                if operation == 7:
+                    return lambda: alu(7, get(), value, wide), 1 + wide + 1
+                return lambda: set_(alu(operation, get(), value, wide)), 1 + wide + 1
+            _, reg, rm, _, address, length = self._modrm(at, segment)
+            get_rm, set_rm = self._rm_accessors(rm, address, wide)
+            get_reg, set_reg = self._register_accessors(reg, wide)
+            if opcode & 2:
+                get_rm, set_rm, get_reg, set_reg = get_reg, set_reg, get_rm, set_rm
+            if operation == 7:
+                return lambda: alu(7, get_rm(), get_reg(), wide), 1 + length
+            return lambda: set_rm(alu(operation, get_rm(), get_reg(), wide)), 1 + length
+
+        if opcode < 0x20 and opcode & 7 >= 6:
+            index = opcode >> 3
+            if opcode & 1 == 0:
+                return lambda: cpu.push(sregs[index]), 1
+            if opcode == 0x0F:
+                return self._decode_extended(at)
+
+            def pop_segment() -> None:
+                sregs[index] = cpu.pop()
+            return pop_segment, 1
+
+        if opcode in (0x27, 0x2F, 0x37, 0x3F):
+            return self._decode_adjust(opcode), 1
+
+        if 0x40 <= opcode < 0x50:
+            index = opcode & 7
+            delta = 1 if opcode < 0x48 else -1
+            step = self.step
+
+            def step_register() -> None:
+                regs[index] = step(regs[index], delta, True)
+            return step_register, 1
+
+        if 0x50 <= opcode < 0x58:
+            index = opcode & 7
+            return lambda: cpu.push(regs[index]), 1
+
+        if 0x58 <= opcode < 0x60:
+            index = opcode & 7
+
+            def pop_register() -> None:
+                regs[index] = cpu.pop()
+            return pop_register, 1
+
+        if opcode == 0x60:
+            def pusha() -> None:
+                sp = regs[SP]
+                for index in range(8):
+                    cpu.push(sp if index == SP else regs[index])
+            return pusha, 1
+
+        if opcode == 0x61:
+            def popa() -> None:
+                for index in reversed(range(8)):
+                    value = cpu.pop()
+                    if index != SP:
+                        regs[index] = value
+            return popa, 1
+
+        if opcode == 0x68 or opcode == 0x6A:
+            if opcode == 0x68:
+                value = self.read16(at)
+            else:
+                value = memory[at] | (0xFF00 if memory[at] & 0x80 else 0)
+            return lambda: cpu.push(value), 1 + (2 if opcode == 0x68 else 1)
+
+        if 0x70 <= opcode < 0x80:
+            return self._jump_if(_CONDITIONS[opcode & 0xF], memory[at] - ((memory[at] & 0x80) << 1)), 2
+
+        if 0x80 <= opcode < 0x84:
+            wide = opcode & 1
+            _, operation, rm, _, address, length = self._modrm(at, segment)
+            get, set_ = self._rm_accessors(rm, address, bool(wide))
+            if opcode == 0x83:
+                value = memory[at + length]
+                value |= 0xFF00 if value & 0x80 else 0
+                size = 1
+            else:
+                value = self._immediate(at + length, bool(wide))
+                size = 1 + wide
+            alu = self.alu
+            if operation == 7:
+                return lambda: alu(7, get(), value, bool(wide)), 1 + length + size
+            return lambda: set_(alu(operation, get(), value, bool(wide))), 1 + length + size
+
+        if opcode == 0x84 or opcode == 0x85:
+            wide = bool(opcode & 1)
+            _, reg, rm, _, address, length = self._modrm(at, segment)
+            get_rm, _ = self._rm_accessors(rm, address, wide)
+            get_reg, _ = self._register_accessors(reg, wide)
+            alu = self.alu
+            return lambda: alu(4, get_rm(), get_reg(), wide), 1 + length
+
+        if opcode == 0x86 or opcode == 0x87:
+            wide = bool(opcode & 1)
+            _, reg, rm, _, address, length = self._modrm(at, segment)
+            get_rm, set_rm = self._rm_accessors(rm, address, wide)
+            get_reg, set_reg = self._register_accessors(reg, wide)
+
+            def exchange() -> None:
+                value = get_rm()
+                set_rm(get_reg())
+                set_reg(value)
+            return exchange, 1 + length
+
+        if 0x88 <= opcode < 0x8C:
+            wide = bool(opcode & 1)
+            _, reg, rm, _, address, length = self._modrm(at, segment)
+            get_rm, set_rm = self._rm_accessors(rm, address, wide)
+            get_reg, set_reg = self._register_accessors(reg, wide)
+            if opcode & 2:
+                return lambda: set_reg(get_rm()), 1 + length
+            return lambda: set_rm(get_reg()), 1 + length
+
+        if opcode == 0x8C:
+            _, reg, rm, _, address, length = self._modrm(at, segment)
+            _, set_rm = self._rm_accessors(rm, address, True)
+            index = reg & 3
+            return lambda: set_rm(sregs[index]), 1 + length
+
+        if opcode == 0x8D:
+            _, reg, _, offset, _, length = self._modrm(at, segment)
+            if offset is None:
+                raise EmulatorError("lea with a register operand")
+            _, set_reg = self._register_accessors(reg, True)
+            return lambda: set_reg(offset()), 1 + length
+
+        if opcode == 0x8E:
+            _, reg, rm, _, address, length = self._modrm(at, segment)
+            get_rm, _ = self._rm_accessors(rm, address, True)
+            index = reg & 3
+
+            def load_segment() -> None:
+                sregs[index] = get_rm()
+            return load_segment, 1 + length
+
+        if opcode == 0x8F:
+            _, _, rm, _, address, length = self._modrm(at, segment)
+            _, set_rm = self._rm_accessors(rm, address, True)
+            return lambda: set_rm(cpu.pop()), 1 + length
+
+        if 0x90 <= opcode < 0x98:
+            index = opcode & 7
+            if index == AX:
+                return lambda: None, 1
+
+            def exchange_ax() -> None:
+                regs[AX], regs[index] = regs[index], regs[AX]
+            return exchange_ax, 1
+
+        if opcode == 0x98:
+            def cbw() -> None:
+                al = regs[AX] & 0xFF
+                regs[AX] = al | (0xFF00 if al & 0x80 else 0)
+            return cbw, 1
+
+        if opcode == 0x99:
+            def cwd() -> None:
+                regs[DX] = 0xFFFF if regs[AX] & 0x8000 else 0
+            return cwd, 1
+
+        if opcode == 0x9A:
+            offset_value, segment_value = self.read16(at), self.read16(at + 2)
+
+            def call_far() -> None:
+                cpu.push(sregs[CS])
+                cpu.push(cpu.ip)
+                sregs[CS], cpu.ip = segment_value, offset_value
+            return call_far, 5
+
+        if opcode == 0x9B:
+            return lambda: None, 1
+
+        if opcode == 0x9C:
+            return lambda: cpu.push(cpu.flags), 1
+
+        if opcode == 0x9D:
+            def popf() -> None:
+                cpu.flags = cpu.pop()
+            return popf, 1
+
+        if opcode == 0x9E:
+            def sahf() -> None:
+                cpu.flags = cpu.flags & 0xFF00 | regs[AX] >> 8
+            return sahf, 1
+
+        if opcode == 0x9F:
+            def lahf() -> None:
+                regs[AX] = regs[AX] & 0xFF | (cpu.flags & 0xFF) << 8
+            return lahf, 1
+
+        if 0xA0 <= opcode < 0xA4:
+            wide = bool(opcode & 1)
+            offset_value = self.read16(at)
+            index = DS if segment is None else segment
+            get, set_ = self._register_accessors(AX, wide)
+            if opcode < 0xA2:
+                if wide:
+                    return lambda: set_(cpu.read16((sregs[index] << 4) + offset_value)), 3
+                return lambda: set_(memory[(sregs[index] << 4) + offset_value]), 3
+            if wide:
+                return lambda: cpu.write16((sregs[index] << 4) + offset_value, get()), 3
+            return lambda: cpu.write8((sregs[index] << 4) + offset_value, get()), 3
+
+        if 0xA4 <= opcode < 0xB0 and opcode not in (0xA8, 0xA9):
+            return self._decode_string(opcode, segment, repeat), 1
+
+        if opcode == 0xA8 or opcode == 0xA9:
+            wide = bool(opcode & 1)
+            value = self._immediate(at, wide)
+            get, _ = self._register_accessors(AX, wide)
+            alu = self.alu
+            return lambda: alu(4, get(), value, wide), 2 + wide
+
+        if 0xB0 <= opcode < 0xC0:
+            wide = opcode >= 0xB8
+            value = self._immediate(at, wide)
+            _, set_ = self._register_accessors(opcode & 7, wide)
+            return lambda: set_(value), 2 + wide
+
+        if opcode in (0xC0, 0xC1, 0xD0, 0xD1, 0xD2, 0xD3):
+            wide = bool(opcode & 1)
+            _, operation, rm, _, address, length = self._modrm(at, segment)
+            get, set_ = self._rm_accessors(rm, address, wide)
+            shift = self.shift
+            if opcode < 0xC2:
+                count = memory[at + length]
+                return lambda: set_(shift(operation, get(), count, wide)), 2 + length
+            if opcode < 0xD2:
+                return lambda: set_(shift(operation, get(), 1, wide)), 1 + length
+            return lambda: set_(shift(operation, get(), regs[CX] & 0xFF, wide)), 1 + length
+
+        if opcode in (0xC2, 0xC3, 0xCA, 0xCB):
+            far = opcode >= 0xCA
+            release = self.read16(at) if opcode & 1 == 0 else 0
+
+            def return_() -> None:
+                cpu.ip = cpu.pop()
+                if far:
+                    sregs[CS] = cpu.pop()
+                regs[SP] = (regs[SP] + release) & 0xFFFF
+            return return_, 1 if opcode & 1 else 3
+
+        if opcode == 0xC4 or opcode == 0xC5:
+            _, reg, _, _, address, length = self._modrm(at, segment)
+            if address is None:
+                raise EmulatorError("les/lds with a register operand")
+            index = ES if opcode == 0xC4 else DS
+
+            def load_pointer() -> None:
+                linear = address()
+                regs[reg] = cpu.read16(linear)
+                sregs[index] = cpu.read16(linear + 2)
+            return load_pointer, 1 + length
+
+        if opcode == 0xC6 or opcode == 0xC7:
+            wide = bool(opcode & 1)
+            _, _, rm, _, address, length = self._modrm(at, segment)
+            _, set_ = self._rm_accessors(rm, address, wide)
+            value = self._immediate(at + length, wide)
+            return lambda: set_(value), 1 + length + 1 + wide
+
+        if opcode == 0xC9:
+            def leave() -> None:
+                regs[SP] = regs[BP]
+                regs[BP] = cpu.pop()
+            return leave, 1
+
+        if opcode in (0xCC, 0xCD, 0xCE):
+            if opcode == 0xCE:
+                return lambda: cpu.of and cpu.interrupt(4), 1
+            number = 3 if opcode == 0xCC else memory[at]
+            return lambda: cpu.interrupt(number), 1 if opcode == 0xCC else 2
+
+        if opcode == 0xCF:
+            def iret() -> None:
+                cpu.ip = cpu.pop()
+                sregs[CS] = cpu.pop()
+                cpu.flags = cpu.pop()
+            return iret, 1
+
+        if opcode == 0xD4 or opcode == 0xD5:
+            base = memory[at]
+            if opcode == 0xD4 and base == 0:
+                raise EmulatorError("divide error")
+
+            def ascii_adjust() -> None:
+                al, ah = regs[AX] & 0xFF, regs[AX] >> 8
+                if opcode == 0xD4:
+                    ah, al = divmod(al, base)
+                else:
+                    al, ah = (al + ah * base) & 0xFF, 0
+                regs[AX] = ah << 8 | al
+                cpu._set_result_flags(al, 0x80)
+            return ascii_adjust, 2
+
+        if opcode == 0xD7:
+            index = DS if segment is None else segment
+
+            def xlat() -> None:
+                linear = (sregs[index] << 4) + ((regs[BX] + (regs[AX] & 0xFF)) & 0xFFFF)
+                regs[AX] = regs[AX] & 0xFF00 | memory[linear]
+            return xlat, 1
+
+        if 0xE0 <= opcode < 0xE4:
+            displacement = memory[at] - ((memory[at] & 0x80) << 1)
+            if opcode == 0xE3:
+                return self._jump_if(lambda _: regs[CX] == 0, displacement), 2
+
+            def loop() -> None:
+                count = regs[CX] = (regs[CX] - 1) & 0xFFFF
+                if count and (opcode == 0xE2 or cpu.zf == (opcode == 0xE1)):
+                    cpu.ip = (cpu.ip + displacement) & 0xFFFF
+            return loop, 2
+
+        if opcode in (0xE4, 0xE5, 0xEC, 0xED):
+            wide = bool(opcode & 1)
+            _, set_ = self._register_accessors(AX, wide)
+            # No devices are attached; reads return an idle bus
+            return lambda: set_(0xFFFF if wide else 0xFF), 2 if opcode < 0xE8 else 1
+
+        if opcode in (0xE6, 0xE7, 0xEE, 0xEF):
+            return lambda: None, 2 if opcode < 0xE8 else 1
+
+        if opcode == 0xE8:
+            displacement = self.read16(at)
+
+            def call() -> None:
+                cpu.push(cpu.ip)
+                cpu.ip = (cpu.ip + displacement) & 0xFFFF
+            return call, 3
+
+        if opcode == 0xE9 or opcode == 0xEB:
+            if opcode == 0xE9:
+                displacement = self.read16(at)
+            else:
+                displacement = memory[at] - ((memory[at] & 0x80) << 1)
+
+            def jump() -> None:
+                cpu.ip = (cpu.ip + displacement) & 0xFFFF
+            return jump, 3 if opcode == 0xE9 else 2
+
+        if opcode == 0xEA:
+            offset_value, segment_value = self.read16(at), self.read16(at + 2)
+
+            def jump_far() -> None:
+                sregs[CS], cpu.ip = segment_value, offset_value
+            return jump_far, 5
+
+        if opcode == 0xF4:
+            def halt() -> None:
+                raise _Stop("halt")
+            return halt, 1
+
+        if opcode == 0xF5:
+            return lambda: setattr(cpu, "cf", not cpu.cf), 1
+
+        if opcode in _FLAG_INSTRUCTIONS:
+            flag, value = _FLAG_INSTRUCTIONS[opcode]
+            return lambda: setattr(cpu, flag, value), 1
+
+        if opcode == 0xF6 or opcode == 0xF7:
+            wide = bool(opcode & 1)
+            _, operation, rm, _, address, length = self._modrm(at, segment)
+            get, set_ = self._rm_accessors(rm, address, wide)
+            if operation < 2:
+                value = self._immediate(at + length, wide)
+                alu = self.alu
+                return lambda: alu(4, get(), value, wide), 1 + length + 1 + wide
+            if operation == 2:
+                mask = 0xFFFF if wide else 0xFF
+                return lambda: set_(get() ^ mask), 1 + length
+            if operation == 3:
+                alu = self.alu
+                return lambda: set_(alu(5, 0, get(), wide)), 1 + length
+            multiply_divide = self.multiply_divide
+            return lambda: multiply_divide(operation, get(), wide), 1 + length
+
+        if opcode == 0xFE or opcode == 0xFF:
+            wide = opcode == 0xFF
+            _, operation, rm, _, address, length = self._modrm(at, segment)
+            get, set_ = self._rm_accessors(rm, address, wide)
+            if operation < 2:
+                step = self.step
+                delta = 1 if operation == 0 else -1
+                return lambda: set_(step(get(), delta, wide)), 1 + length
+            if not wide or operation == 7:
+                raise EmulatorError(f"invalid opcode {opcode:02X} /{operation}")
+            if operation == 2:
+                def call_indirect() -> None:
+                    target = get()
+                    cpu.push(cpu.ip)
+                    cpu.ip = target
+                return call_indirect, 1 + length
+            if operation == 4:
+                def jump_indirect() -> None:
+                    cpu.ip = get()
+                return jump_indirect, 1 + length
+            if operation == 6:
+                return lambda: cpu.push(get()), 1 + length
+            if address is None:
+                raise EmulatorError("far call or jump through a register")
+
+            def far_indirect() -> None:
+                linear = address()
+                offset_value, segment_value = cpu.read16(linear), cpu.read16(linear + 2)
+                if operation == 3:
+                    cpu.push(sregs[CS])
+                    cpu.push(cpu.ip)
+                sregs[CS], cpu.ip = segment_value, offset_value
+            return far_indirect, 1 + length
+
+        raise EmulatorError(f"unsupported opcode {opcode:02X}")
+
+    def _decode_extended(self, at: int) -> tuple[Callable[[], None], int]:
+        """Decode a 0F-prefixed instruction; only near conditional jumps exist."""
+        opcode = self.memory[at]
+        if not 0x80 <= opcode < 0x90:
+            raise EmulatorError(f"unsupported opcode 0F {opcode:02X}")
+        return self._jump_if(_CONDITIONS[opcode & 0xF], self.read16(at + 1)), 4
+
+    def _jump_if(self, condition: Callable[[Emulator], bool], displacement: int) -> Callable[[], None]:
+        """Return a closure jumping by ``displacement`` when a condition holds."""
+        cpu = self
+
+        def jump() -> None:
+            if condition(cpu):
+                cpu.ip = (cpu.ip + displacement) & 0xFFFF
+        return jump
+
+    def _decode_adjust(self, opcode: int) -> Callable[[], None]:
+        """Decode DAA, DAS, AAA or AAS."""
+        cpu = self
+        regs = self.regs
+
+        def decimal_adjust() -> None:
+            al = regs[AX] & 0xFF
+            carry = cpu.cf
+            if opcode == 0x27 or opcode == 0x2F:
+                sign = 1 if opcode == 0x27 else -1
+                cpu.af = (al & 0xF) > 9 or cpu.af
+                adjust = 6 if cpu.af else 0
+                # DAS also sets CF when the low adjustment borrows
+                borrow = sign < 0 and adjust > al
+                if al > 0x99 or carry:
+                    adjust += 0x60
+                cpu.cf = adjust >= 0x60 or borrow
+                al += adjust * sign
+                al &= 0xFF
+                regs[AX] = regs[AX] & 0xFF00 | al
+                cpu._set_result_flags(al, 0x80)
+                return
+            sign = 1 if opcode == 0x37 else -1
+            if (al & 0xF) > 9 or cpu.af:
+                ax = (regs[AX] + 0x106 * sign) & 0xFFFF
+                cpu.af = cpu.cf = True
+            else:
+                ax = regs[AX]
+                cpu.af = cpu.cf = False
+            regs[AX] = ax & 0xFF0F
+        return decimal_adjust
+
+    def _decode_string(self, opcode: int, segment: int | None, repeat: int | None) -> Callable[[], None]:
+        """Decode MOVS, CMPS, STOS, LODS or SCAS, with a REP prefix."""
+        cpu = self
+        regs = self.regs
+        sregs = self.sregs
+        memory = self.memory
+        wide = bool(opcode & 1)
+        size = 2 if wide else 1
+        source = DS if segment is None else segment
+        kind = opcode & 0xFE
+
+        def once() -> None:
+            delta = -size if cpu.df else size
+            if kind != 0xAA and kind != 0xAE:
+                linear = (sregs[source] << 4) + regs[SI]
+                value = cpu.read16(linear) if wide else memory[linear]
+                regs[SI] = (regs[SI] + delta) & 0xFFFF
+            if kind == 0xAC:
+                if wide:
+                    regs[AX] = value
+                else:
+                    regs[AX] = regs[AX] & 0xFF00 | value
+                return
+            target = (sregs[ES] << 4) + regs[DI]
+            regs[DI] = (regs[DI] + delta) & 0xFFFF
+            if kind == 0xA4 or kind == 0xAA:
+                if kind == 0xAA:
+                    value = regs[AX] if wide else regs[AX] & 0xFF
+                if wide:
+                    cpu.write16(target, value)
+                else:
+                    cpu.write8(target, value)
+                return
+            other = cpu.read16(target) if wide else memory[target]
+            if kind == 0xA6:
+                cpu.alu(7, value, other, wide)
+            else:
+                cpu.alu(7, regs[AX] if wide else regs[AX] & 0xFF, other, wide)
+
+        if repeat is None:
+            return once
+        compares = kind == 0xA6 or kind == 0xAE
+        until_equal = repeat == 0xF2
+
+        def repeated() -> None:
+            while regs[CX]:
+                once()
+                regs[CX] = (regs[CX] - 1) & 0xFFFF
+                if compares and cpu.zf == until_equal:
+                    break
+        return repeated
+
+    # -- BIOS and DOS services -------------------------------------------
+
+    def interrupt(self, number: int) -> None:
+        """Run the BIOS or DOS service of a software interrupt."""
+        service = self._services.get(number)
+        if service is None:
+            raise EmulatorError(f"unsupported interrupt {number:02X}h")
+        service()
+
+    def _write(self, data: bytes) -> None:
+        self.stdout.write(data)
+
+    def _read_key(self, echo: bool) -> int:
+        """Read a keyboard character, as a CR for line breaks."""
+        value = self.stdin.read()
+        if value is None:
+            value = EOF_CHARACTER
+        elif value == 0x0A:
+            value = 0x0D
+        if echo and self.echo:
+            self._write(bytes((value,)))
+        return value
+
+    def _terminate(self) -> None:
+        raise _Stop("exit", 0)
+
+    def _video_service(self) -> None:
+        regs = self.regs
+        function = regs[AX] >> 8
+        if function == 0x0E:
+            self._write(bytes((regs[AX] & 0xFF,)))
+        elif function in (0x09, 0x0A):
+            self._write(bytes((regs[AX] & 0xFF,)) * regs[CX])
+        elif function == 0x03:
+            regs[CX], regs[DX] = 0x0607, 0
+        elif function == 0x0F:
+            regs[AX] = 80 << 8 | 3
+            regs[BX] &= 0x00FF
+        elif function == 0x13:
+            start = (self.sregs[ES] << 4) + regs[BP]
+            self._write(bytes(self.memory[start:start + regs[CX]]))
+        # Mode, cursor and scrolling functions have nothing to do on a stream
+
+    def _keyboard_service(self) -> None:
+        regs = self.regs
+        function = regs[AX] >> 8
+        if function in (0x00, 0x10):
+            regs[AX] = self._read_key(echo=False)
+        elif function in (0x01, 0x11):
+            value = self.stdin.peek()
+            self.zf = value is None
+            if value is not None:
+                regs[AX] = 0x0D if value == 0x0A else value
+        elif function in (0x02, 0x12):
+            regs[AX] &= 0xFF00
+
+    def _dos_service(self) -> None:
+        regs = self.regs
+        sregs = self.sregs
+        function = regs[AX] >> 8
+        if function == 0x4C:
+            raise _Stop("exit", regs[AX] & 0xFF)
+        if function == 0x00:
+            raise _Stop("exit", 0)
+        if function == 0x01:
+            self.set8(0, self._read_key(echo=True))
+        elif function == 0x02:
+            character = regs[DX] & 0xFF
+            self._write(bytes((character,)))
+            self.set8(0, character)
+        elif function == 0x06:
+            if regs[DX] & 0xFF == 0xFF:
+                available = self.stdin.peek() is not None
+                self.zf = not available
+                self.set8(0, self._read_key(echo=False) if available else 0)
+            else:
+                self._write(bytes((regs[DX] & 0xFF,)))
+        elif function in (0x07, 0x08):
+            self.set8(0, self._read_key(echo=False))
+        elif function == 0x09:
+            self._write(self._string_bytes(sregs[DS], regs[DX], ord("$")))
+            self.set8(0, ord("$"))
+        elif function == 0x0A:
+            self._buffered_input((sregs[DS] << 4) + regs[DX])
+        elif function == 0x0B:
+            self.set8(0, 0xFF if self.stdin.peek() is not None else 0)
+        elif function == 0x30:
+            regs[AX] = 5
+        elif function == 0x3F:
+            self._read_handle()
+        elif function == 0x40:
+            self._write_handle()
+        elif function in (0x25, 0x35):
+            if function == 0x35:
+                regs[BX] = 0
+                sregs[ES] = 0
+        else:
+            raise EmulatorError(f"unsupported DOS function {function:02X}h")
+
+    def _buffered_input(self, buffer: int) -> None:
+        """INT 21h/0Ah: read a line into a length-prefixed buffer."""
+        memory = self.memory
+        capacity = memory[buffer]
+        if capacity == 0:
+            return
+        count = 0
+        while True:
+            value = self._read_key(echo=True)
+            if value == 0x0D or value == EOF_CHARACTER:
+                break
+            if value == 0x08:
+                count = max(count - 1, 0)
+                continue
+            if count < capacity - 1:
+                self.write8(buffer + 2 + count, value)
+                count += 1
+        self.write8(buffer + 2 + count, 0x0D)
+        self.write8(buffer + 1, count)
+
+    def _read_handle(self) -> None:
+        """INT 21h/3Fh: read from stdin into DS:DX."""
+        regs = self.regs
+        if regs[BX] != 0:
+            self.cf = True
+            regs[AX] = 6
+            return
+        start = (self.sregs[DS] << 4) + regs[DX]
+        count = 0
+        while count < regs[CX]:
+            value = self.stdin.read()
+            if value is None:
+                break
+            self.write8(start + count, value)
+            count += 1
+            if value == 0x0A:
+                break
+        regs[AX] = count
+        self.cf = False
+
+    def _write_handle(self) -> None:
+        """INT 21h/40h: write CX bytes from DS:DX to stdout or stderr."""
+        regs = self.regs
+        if regs[BX] not in (1, 2):
+            self.cf = True
+            regs[AX] = 6
+            return
+        start = (self.sregs[DS] << 4) + regs[DX]
+        self._write(bytes(self.memory[start:start + regs[CX]]))
+        regs[AX] = regs[CX]
+        self.cf = False
+
+
+def run_com(
+    image: bytes,
+    args: str = "",
+    stdin: bytes = b"",
+    max_instructions: int | None = DEFAULT_MAX_INSTRUCTIONS,
+) -> tuple[RunResult, bytes]:
+    """Run a ``.com`` program headlessly.
+
+    Args:
+        image: The ``.com`` file
+        args: Command line arguments
+        stdin: Everything the program reads
+        max_instructions: Instruction budget; None for no limit
+
+    Returns:
+        How the run ended, and everything the program wrote
+
+    Raises:
+        EmulatorError: If the program does something unsupported
+    """
+    stdout = io.BytesIO()
+    emulator = Emulator(image, args, io.BytesIO(stdin), stdout)
+    return emulator.run(max_instructions), stdout.getvalue()
@@ -0,0 +1,167 @@
+"""Machine-readable output formats for lexed tokens.
+
+Every writer takes an iterable of ``TokenRow`` tuples and a binary file
+object, so tokens can be written as they are produced without building a
+table or a list first.
+
+The binary format is a small header followed by one length-prefixed record
+per token::
+
+    magic      b"ASMTOK"
+    version    u8
+    n_types    u8, then n_types names as (u8 length, UTF-8 bytes)
+    records    (u32 line, u32 column, u8 type id, u32 length, UTF-8 value)*
+
+All integers are little-endian. Records run until the end of the file, so a
+stream can be written before the number of tokens is known.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import struct
+from typing import TYPE_CHECKING, BinaryIO
+
+from .tokens import TOKEN_TYPES, TYPE_IDS, TokenRow
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+# Formats understood by ``write_tokens``
+FORMATS = ("jsonl", "csv", "tsv", "binary")
+
+BINARY_MAGIC = b"ASMTOK"
+BINARY_VERSION = 1
+
+_RECORD = struct.Struct("<IIBI")
+_TYPE_LENGTH = struct.Struct("<B")
+
+# Column names of the delimited formats
+_HEADER = ("index", "value", "type", "line", "column")
+
+
+def write_tokens(rows: Iterable[TokenRow], out: BinaryIO, fmt: str) -> int:
+    """Write tokens to a binary file object in a machine-readable format.
+
+    Args:
+        rows: The tokens to write, in order
+        out: Binary file object that receives the output
+        fmt: One of ``FORMATS``
+
+    Returns:
+        The number of tokens written
+    """
+    if fmt == "binary":
+        return write_binary(rows, out)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt!r}")
+
+    # newline="" lets the csv module choose its own line endings
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=False)
+    try:
+        if fmt == "jsonl":
+            return _write_jsonl(rows, text)
+        return _write_delimited(rows, text, "\t" if fmt == "tsv" else ",")
+    finally:
+        text.flush()
+        # Leave ``out`` open for the caller
+        text.detach()
+
+
+def _write_jsonl(rows: Iterable[TokenRow], text: io.TextIOBase) -> int:
+    """Write one JSON object per token."""
+    dumps = json.dumps
+    # Type names are constants, so their JSON is only encoded once
+    types = {name: dumps(name, ensure_ascii=False) for name in TOKEN_TYPES}
+    write = text.write
+    count = 0
+    for count, (value, type_name, line, column) in enumerate(rows, start=1):
+        write(
+            f'{{"index":{count},"value":{dumps(value, ensure_ascii=False)},'
+            f'"type":{types[type_name]},"line":{line},"column":{column}}}\n'
+        )
+    return count
+
+
+def _write_delimited(rows: Iterable[TokenRow], text: io.TextIOBase, delimiter: str) -> int:
+    """Write a header line and one delimited record per token."""
+    writer = csv.writer(text, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(_HEADER)
+    count = 0
+    for count, (value, type_name, line, column) in enumerate(rows, start=1):
+        writer.writerow((count, value, type_name, line, column))
+    return count
+
+
+def write_binary(rows: Iterable[TokenRow], out: BinaryIO) -> int:
+    """Write tokens in the compact, length-prefixed binary format.
+
+    Args:
+        rows: The tokens to write, in order
+        out: Binary file object that receives the output
+
+    Returns:
+        The number of tokens written
+    """
+    header = bytearray(BINARY_MAGIC)
+    header += bytes((BINARY_VERSION, len(TOKEN_TYPES)))
+    for name in TOKEN_TYPES:
+        encoded = name.encode("utf-8")
+        header += _TYPE_LENGTH.pack(len(encoded)) + encoded
+    out.write(header)
+
+    pack = _RECORD.pack
+    write = out.write
+    count = 0
+    for count, (value, type_name, line, column) in enumerate(rows, start=1):
+        encoded = value.encode("utf-8")
+        write(pack(line, column, TYPE_IDS[type_name], len(encoded)) + encoded)
+    return count
+
+
+def read_binary(data: bytes | BinaryIO) -> Iterator[TokenRow]:
+    """Read tokens written by ``write_binary``.
+
+    Args:
+        data: The encoded tokens, or a binary file object to read them from
+
+    Yields:
+        TokenRow: The value, type, line and column of each token
+
+    Raises:
+        ValueError: If the data is not in the binary token format
+    """
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        data = data.read()
+    view = memoryview(data)
+
+    magic_end = len(BINARY_MAGIC)
+    if bytes(view[:magic_end]) != BINARY_MAGIC or len(view) < magic_end + 2:
+        raise ValueError("Not a binary token stream")
+    version, n_types = view[magic_end], view[magic_end + 1]
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary token stream version: {version}")
+
+    # The type table is stored in the file so ids stay meaningful even if
+    # TOKEN_TYPES changes later
+    pos = magic_end + 2
+    types = []
+    for _ in range(n_types):
+        length = view[pos]
+        types.append(str(view[pos + 1:pos + 1 + length], "utf-8"))
+        pos += 1 + length
+
+    unpack_from = _RECORD.unpack_from
+    record_size = _RECORD.size
+    end = len(view)
+    while pos < end:
+        if pos + record_size > end:
+            raise ValueError("Truncated binary token stream")
+        line, column, type_id, length = unpack_from(view, pos)
+        pos += record_size
+        if pos + length > end:
+            raise ValueError("Truncated binary token stream")
+        yield TokenRow(str(view[pos:pos + length], "utf-8"), types[type_id], line, column)
+        pos += length
@@ -0,0 +1,334 @@
+"""Resolution of ``%include`` directives across assembly files.
+
+The lexer itself treats ``%include "file"`` as a symbol followed by a string.
+``IncludeResolver`` finds those directives, resolves them to files, builds
+the include graph of a project and splices the tokens of included files into
+the files that include them. Each distinct file content is lexed once per
+resolver, however many programs include it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from bisect import bisect_left
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from .cache import TokenCache, decode_source
+from .lexer import Lexer
+from .tokens import TYPE_IDS, TokenRow, TokenStream
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from .incremental import DocumentLexer
+
+_INCLUDE_PATTERN = re.compile(r'%include\b', re.IGNORECASE)
+
+
+class IncludeDirective(NamedTuple):
+    """An ``%include`` directive found in a token stream."""
+
+    row: int
+    line: int
+    target: str
+
+
+class IncludedToken(NamedTuple):
+    """A token of an expanded file, with the file it comes from."""
+
+    path: Path
+    row: TokenRow
+
+
+class IncludeCycleError(ValueError):
+    """Raised when expanding a file that ends up including itself."""
+
+    def __init__(self, chain: list[Path]) -> None:
+        """Initialize the error with the files of the cycle.
+
+        Args:
+            chain: The include chain, starting and ending with the same file
+        """
+        self.chain = chain
+        super().__init__("Include cycle: " + " -> ".join(str(path) for path in chain))
+
+
+class LexedFile(NamedTuple):
+    """Tokens and include directives of a file, as last read from disk."""
+
+    path: Path
+    signature: tuple[int, int]
+    digest: str
+    stream: TokenStream
+    directives: list[IncludeDirective]
+
+
+class IncludeGraph:
+    """Include dependencies between the files of a project."""
+
+    def __init__(self) -> None:
+        # Files included by each file, in directive order
+        self.edges: dict[Path, list[Path]] = {}
+        # Include targets of each file that could not be resolved
+        self.missing: dict[Path, list[str]] = {}
+        # Cycles found, each starting and ending with the same file
+        self.cycles: list[list[Path]] = []
+
+    @property
+    def files(self) -> list[Path]:
+        """Every file reached from the roots."""
+        return list(self.edges)
+
+    def dependents(self, path: Path) -> set[Path]:
+        """Return the files that include a file, directly or not.
+
+        Args:
+            path: A file of the graph
+
+        Returns:
+            The files whose expansion contains ``path``
+        """
+        included_by: dict[Path, list[Path]] = {}
+        for source, targets in self.edges.items():
+            for target in targets:
+                included_by.setdefault(target, []).append(source)
+
+        found: set[Path] = set()
+        pending = [path]
+        while pending:
+            for source in included_by.get(pending.pop(), ()):
+                if source not in found:
+                    found.add(source)
+                    pending.append(source)
+        return found
+
+
+def find_includes(stream: TokenStream) -> list[IncludeDirective]:
+    """Find the ``%include "file"`` directives of a token stream.
+
+    Args:
+        stream: Tokens of a file
+
+    Returns:
+        The directives, in source order
+    """
+    string_id = TYPE_IDS["CONSTANTE_STR"]
+    starts = stream.starts
+    directives = []
+    # Searching the source is much cheaper than slicing every token's value
+    for match in _INCLUDE_PATTERN.finditer(stream.source):
+        row = bisect_left(starts, match.start())
+        if (
+            row + 1 < len(stream)
+            and starts[row] == match.start()
+            and stream.ends[row] == match.end()
+            and stream.type_ids[row + 1] == string_id
+            and stream.lines[row + 1] == stream.lines[row]
+        ):
+            target = stream.value(row + 1)[1:-1]
+            directives.append(IncludeDirective(row, stream.lines[row], target))
+    return directives
+
+
+def document_includes(document: DocumentLexer) -> list[str]:
+    """Find the include targets of the committed lines of a document.
+
+    Same rules as ``find_includes``, read from the tokens of each line.
+
+    Args:
+        document: The document, or a snapshot of it
+
+    Returns:
+        The included file names, in source order
+    """
+    string_id = TYPE_IDS["CONSTANTE_STR"]
+    targets = []
+    for entry in document.iter_entries():
+        text = entry.text
+        # Most lines have no directive, and the check is cheap
+        if "%" not in text:
+            continue
+        spans = entry.spans or ()
+        for match in _INCLUDE_PATTERN.finditer(text):
+            for (start, end, _), (value_start, value_end, type_id) in zip(spans, spans[1:]):
+                if start == match.start() and end == match.end() and type_id == string_id:
+                    targets.append(text[value_start + 1:value_end - 1])
+                    break
+    return targets
+
+
+class IncludeResolver:
+    """Resolves, lexes and splices included files.
+
+    Lexed files are remembered by path, and re-read only when their size or
+    modification time changes. Their tokens are shared by content hash, so
+    two copies of a library are lexed once, and with a ``TokenCache`` a
+    library already lexed by another process is not lexed at all.
+    """
+
+    def __init__(self, search_paths: Iterable[str | Path] = (), cache: TokenCache | None = None) -> None:
+        """Initialize the resolver.
+
+        Args:
+            search_paths: Directories searched for include targets after the
+                directory of the including file
+            cache: On-disk token cache used to lex files
+        """
+        self.search_paths = [Path(path) for path in search_paths]
+        self.cache = cache
+        self._files: dict[Path, LexedFile] = {}
+        self._streams: dict[str, tuple[TokenStream, list[IncludeDirective]]] = {}
+        # Number of files actually lexed, as opposed to served from memory or cache
+        self.lex_count = 0
+
+    def load(self, path: str | Path) -> LexedFile:
+        """Return the tokens and include directives of a file.
+
+        Args:
+            path: Path to the assembly file
+
+        Returns:
+            The lexed file
+
+        Raises:
+            OSError: If the file cannot be read
+            UnicodeDecodeError: If the file is not valid UTF-8
+        """
+        path = Path(path).resolve()
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        lexed = self._files.get(path)
+        if lexed is not None and lexed.signature == signature:
+            return lexed
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        shared = self._streams.get(digest)
+        if shared is None:
+            if self.cache is not None:
+                stream, cached = self.cache.lex_bytes(data)
+            else:
+                stream, cached = Lexer(decode_source(data)).analyze_stream(), False
+            self.lex_count += not cached
+            shared = self._streams[digest] = (stream, find_includes(stream))
+
+        lexed = self._files[path] = LexedFile(path, signature, digest, *shared)
+        return lexed
+
+    def forget(self, path: str | Path) -> None:
+        """Stop remembering a file, e.g. one that was deleted.
+
+        Args:
+            path: Path to the assembly file
+        """
+        self._files.pop(Path(path).resolve(), None)
+
+    def prune(self) -> int:
+        """Drop the tokens of contents that no remembered file has any more.
+
+        Every saved version of a file is kept by its content hash until
+        then, so long-running callers prune after each round of loads.
+
+        Returns:
+            The number of contents dropped
+        """
+        live = {lexed.digest for lexed in self._files.values()}
+        stale = [digest for digest in self._streams if digest not in live]
+        for digest in stale:
+            del self._streams[digest]
+        return len(stale)
+
+    def resolve(self, target: str, including: Path) -> Path | None:
+        """Find the file an include target refers to.
+
+        Args:
+            target: The file name written in the directive
+            including: The file containing the directive
+
+        Returns:
+            The resolved file, or None if no candidate exists
+        """
+        for base in (including.parent, *self.search_paths):
+            candidate = base / target
+            if candidate.is_file():
+                return candidate.resolve()
+        return None
+
+    def graph(self, roots: Iterable[str | Path]) -> IncludeGraph:
+        """Build the include graph reachable from some files.
+
+        Args:
+            roots: The files to start from
+
+        Returns:
+            The graph, with its missing targets and cycles
+        """
+        graph = IncludeGraph()
+        active: list[Path] = []
+
+        def visit(path: Path) -> None:
+            active.append(path)
+            targets = graph.edges[path] = []
+            for directive in self.load(path).directives:
+                target = self.resolve(directive.target, path)
+                if target is None:
+                    graph.missing.setdefault(path, []).append(directive.target)
+                    continue
+                targets.append(target)
+                if target in active:
+                    graph.cycles.append([*active[active.index(target):], target])
+                elif target not in graph.edges:
+                    visit(target)
+            active.pop()
+
+        for root in roots:
+            root = Path(root).resolve()
+            if root not in graph.edges:
+                visit(root)
+        return graph
+
+    def expand(self, path: str | Path) -> Iterator[IncludedToken]:
+        """Iterate over the tokens of a file with its includes spliced in.
+
+        Each resolved ``%include`` directive is replaced by the expanded
+        tokens of the included file; unresolved directives are kept as is.
+
+        Args:
+            path: Path to the assembly file
+
+        Yields:
+            IncludedToken: Each token and the file it comes from
+
+        Raises:
+            IncludeCycleError: If a file ends up including itself
+        """
+        yield from self._expand(Path(path).resolve(), [])
+
+    def _expand(self, path: Path, chain: list[Path]) -> Iterator[IncludedToken]:
+        """Expand one file, ``chain`` holding the files being expanded."""
+        if path in chain:
+            raise IncludeCycleError([*chain[chain.index(path):], path])
+        chain.append(path)
+
+        lexed = self.load(path)
+        includes = {}
+        for directive in lexed.directives:
+            target = self.resolve(directive.target, path)
+            if target is not None:
+                includes[directive.row] = target
+
+        skip = -1
+        for row, token in enumerate(lexed.stream.rows()):
+            if row <= skip:
+                continue
+            target = includes.get(row)
+            if target is None:
+                yield IncludedToken(path, token)
+            else:
+                # The directive and its file name are replaced by the file
+                yield from self._expand(target, chain)
+                skip = row + 1
+
+        chain.pop()
@@ -0,0 +1,422 @@
+"""Incremental, line-based lexing for documents that are edited in place."""
+
+from __future__ import annotations
+
+import copy
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, chain, islice
+from typing import TYPE_CHECKING, NamedTuple
+
+from .lexer import Lexer
+from .tokens import TOKEN_TYPES, TokenRow, TokenStream, token_model
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+
+    from .tokens import Token
+
+
+class LineEntry:
+    """Cached tokens of a single line of the document."""
+
+    __slots__ = ("text", "revision", "spans")
+
+    def __init__(self, text: str, revision: int = 0) -> None:
+        """Initialize a dirty entry for a line.
+
+        Args:
+            text: The text of the line, without its line break
+            revision: Revision of the line when its text was captured
+        """
+        self.text = text
+        self.revision = revision
+        # (start, end, type_id) spans relative to the line; None until lexed
+        self.spans: list[tuple[int, int, int]] | None = None
+
+
+class RowChange(NamedTuple):
+    """Range of token rows replaced by a commit."""
+
+    first: int
+    removed: int
+    added: int
+
+
+class _Block:
+    """A run of consecutive lines of a document."""
+
+    __slots__ = ("entries", "offsets")
+
+    def __init__(self, entries: list[LineEntry]) -> None:
+        self.entries = entries
+        # offsets[i] is the row of line i's first token within the block, the
+        # last element the block's token count; set when the block is committed
+        self.offsets: array | None = None
+
+
+class DocumentLexer:
+    """Per-line token cache that only re-lexes the lines that were edited.
+
+    Tokens never span line breaks, so every line is lexed on its own and the
+    document's tokens are the concatenation of its lines' tokens. Edits are
+    spliced in with ``replace_lines``; ``commit`` then reports which rows of
+    the flattened token list changed so views can update just that range.
+
+    Lines are kept in blocks of at most ``BLOCK_LINES``, each holding the row
+    offsets of its lines, along with the first line and first row of every
+    block. Finding a row or a line is two binary searches, and an edit only
+    rebuilds the blocks it touches and the per-block sums, so its cost grows
+    with the number of blocks rather than the number of lines. Committed
+    blocks are never modified, only replaced, which lets ``snapshot`` hand
+    the committed state to another thread.
+
+    The document behaves like the token sequence produced by ``Lexer``: rows
+    are addressed with the same ``value``/``type_name``/``line`` accessors as
+    a ``TokenStream``.
+    """
+
+    # Lines per block; an edit costs about this plus the number of blocks
+    BLOCK_LINES = 512
+
+    def __init__(self, source: str = "", lexer: Lexer | None = None) -> None:
+        """Initialize the document and lex its source.
+
+        Args:
+            source: Initial text of the document
+            lexer: Lexer used to tokenize lines
+        """
+        self.lexer = lexer or Lexer("")
+        self._blocks: list[_Block] = []
+        # block_lines[b] and block_rows[b] are the first line and the first
+        # row of block b; the last elements are the numbers of lines and rows
+        self._block_lines = array('Q', [0])
+        self._block_rows = array('Q', [0])
+        self._dirty: list[LineEntry] = []
+        # Blocks as edited since the last commit, their first lines, the
+        # first block rebuilt and the bounds of the edits
+        self._working: list[_Block] | None = None
+        self._working_lines: array | None = None
+        self._first_block = 0
+        self._pending: tuple[int, int] | None = None
+        self.reset(source)
+        self.relex()
+
+    @property
+    def line_count(self) -> int:
+        """Number of lines in the document, including uncommitted edits."""
+        return (self._working_lines if self._working is not None else self._block_lines)[-1]
+
+    @property
+    def committed_line_count(self) -> int:
+        """Number of lines in the document as of the last commit."""
+        return self._block_lines[-1]
+
+    def reset(self, source: str) -> None:
+        """Replace the whole document with a new source.
+
+        Args:
+            source: The new text of the document
+        """
+        self.replace_lines(0, self.line_count, source.split('\n'))
+
+    def replace_lines(
+        self,
+        first: int,
+        removed: int,
+        texts: Sequence[str],
+        revisions: Sequence[int] | None = None,
+    ) -> None:
+        """Splice new lines into the document.
+
+        The replaced lines are only marked dirty; they are lexed by ``relex``
+        (or by the caller, through ``dirty_entries``) before ``commit``. Until
+        then, row accessors keep reporting the last committed state. When
+        ``revisions`` are given, a new line whose revision matches the old
+        line at the same position keeps its cached tokens.
+
+        Args:
+            first: Index of the first replaced line
+            removed: Number of lines removed from the document
+            texts: Text of the lines inserted in their place
+            revisions: Revision of each inserted line
+        """
+        if self._working is None:
+            # Only the list of blocks is copied; the blocks themselves are
+            # replaced when edited
+            self._working = list(self._blocks)
+            self._working_lines = array('Q', self._block_lines)
+        blocks = self._working
+        block_lines = self._working_lines
+        line_count = block_lines[-1]
+
+        # Blocks holding the replaced lines, or the line the new ones go before
+        start = max(min(bisect_right(block_lines, first) - 1, len(blocks) - 1), 0)
+        stop = max(min(bisect_right(block_lines, first + removed - 1), len(blocks)), start + 1) if blocks else 0
+        region_first = block_lines[start]
+        lines = [entry for block in blocks[start:stop] for entry in block.entries]
+
+        offset = first - region_first
+        old_entries = lines[offset:offset + removed]
+        new_entries = []
+        for index, text in enumerate(texts):
+            revision = revisions[index] if revisions is not None else 0
+            if revisions is not None and index < len(old_entries):
+                old = old_entries[index]
+                if old.revision == revision and old.text == text:
+                    new_entries.append(old)
+                    continue
+            entry = LineEntry(text, revision)
+            self._dirty.append(entry)
+            new_entries.append(entry)
+        lines[offset:offset + removed] = new_entries
+
+        # A short run takes in the next block, so deletions don't leave
+        # ever smaller blocks behind
+        size = self.BLOCK_LINES
+        if len(lines) < size // 2 and stop < len(blocks):
+            lines += blocks[stop].entries
+            stop += 1
+        blocks[start:stop] = [_Block(lines[i:i + size]) for i in range(0, len(lines), size)]
+        del block_lines[start:]
+        block_lines.extend(accumulate((len(block.entries) for block in blocks[start:]), initial=region_first))
+
+        # Lines before ``lo`` and the last ``tail`` lines are untouched
+        tail = line_count - first - removed
+        if self._pending is None:
+            self._first_block = start
+            self._pending = (first, tail)
+        else:
+            lo, old_tail = self._pending
+            # Blocks before a rebuilt one keep their index through later edits
+            self._first_block = min(self._first_block, start)
+            self._pending = (min(lo, first), min(old_tail, tail))
+
+    def _working_entries(self) -> Iterator[LineEntry]:
+        """Iterate over the lines including uncommitted edits."""
+        blocks = self._working if self._working is not None else self._blocks
+        return chain.from_iterable(block.entries for block in blocks)
+
+    def dirty_entries(self) -> list[LineEntry]:
+        """Return the lines that still have to be lexed.
+
+        Returns:
+            The dirty entries; their ``text`` can be lexed on any thread
+        """
+        self._dirty = [entry for entry in self._dirty if entry.spans is None]
+        return list(self._dirty)
+
+    def load_stream(self, stream: TokenStream) -> int:
+        """Fill in dirty lines from the tokens of an already lexed source.
+
+        Only lines whose text still matches the same line of the stream's
+        source are filled in; the rest stay dirty and are lexed as usual.
+
+        Args:
+            stream: Tokens of a source that the document was reset to
+
+        Returns:
+            The number of lines that no longer need lexing
+        """
+        line_spans: dict[int, list[tuple[int, int, int]]] = {}
+        for start, end, type_id, line, column in zip(
+            stream.starts, stream.ends, stream.type_ids, stream.lines, stream.columns
+        ):
+            line_spans.setdefault(line, []).append((column, column + end - start, type_id))
+
+        source_lines = stream.source.split('\n')
+        filled = 0
+        for index, entry in enumerate(islice(self._working_entries(), len(source_lines))):
+            if entry.spans is None and entry.text == source_lines[index]:
+                entry.spans = line_spans.get(index + 1, [])
+                filled += 1
+        return filled
+
+    def relex(self) -> RowChange:
+        """Lex every dirty line and commit the result.
+
+        Returns:
+            The range of rows that changed
+        """
+        tokenize_line = self.lexer.tokenize_line
+        for entry in self.dirty_entries():
+            entry.spans = tokenize_line(entry.text)
+        return self.commit()
+
+    def pending_change(self) -> RowChange:
+        """Return the range of rows the next ``commit`` replaces.
+
+        Like ``commit``, it must be called once the dirty lines are lexed;
+        views use it to announce a change before it is made.
+
+        Returns:
+            The range of rows ``commit`` will report
+        """
+        if self._working is None or self._pending is None:
+            return RowChange(len(self), 0, 0)
+        lo, tail = self._pending
+        old_row_count = len(self)
+        first_row = self.first_row(lo)
+        tail_rows = old_row_count - self.first_row(self.committed_line_count - tail)
+
+        # Blocks before the first rebuilt one are the committed ones, and keep
+        # their first rows; rebuilt blocks are never shared, so their offsets
+        # can be computed ahead of the commit
+        start = self._first_block
+        blocks = self._working[start:]
+        for block in blocks:
+            if block.offsets is None:
+                block.offsets = array('Q', accumulate((len(entry.spans or ()) for entry in block.entries), initial=0))
+        new_row_count = self._block_rows[start] + sum(block.offsets[-1] for block in blocks)
+
+        return RowChange(
+            first_row,
+            old_row_count - first_row - tail_rows,
+            new_row_count - first_row - tail_rows,
+        )
+
+    def commit(self) -> RowChange:
+        """Rebuild the row index after the dirty lines have been lexed.
+
+        Returns:
+            The range of rows replaced since the previous commit
+        """
+        change = self.pending_change()
+        if self._working is None or self._pending is None:
+            return change
+
+        blocks = self._blocks = self._working
+        self._block_lines = self._working_lines
+        self._working = None
+        self._working_lines = None
+        self._pending = None
+        self._dirty.clear()
+
+        # The arrays are copied, as snapshots may share them
+        start = self._first_block
+        block_rows = self._block_rows[:start + 1]
+        del block_rows[start:]
+        block_rows.extend(accumulate((block.offsets[-1] for block in blocks[start:]), initial=self._block_rows[start]))
+        self._block_rows = block_rows
+        return change
+
+    def snapshot(self) -> DocumentLexer:
+        """Return the committed state as a document that later edits leave alone.
+
+        The snapshot shares the committed blocks, so taking one is cheap, and
+        it can be read from another thread while this document is edited.
+
+        Returns:
+            A read-only copy of the document as of the last commit
+        """
+        snapshot = copy.copy(self)
+        snapshot._dirty = []
+        snapshot._working = None
+        snapshot._working_lines = None
+        snapshot._pending = None
+        return snapshot
+
+    def entry(self, line_index: int) -> LineEntry:
+        """Return the committed entry of a 0-based line."""
+        if not 0 <= line_index < self.committed_line_count:
+            raise IndexError("line index out of range")
+        block_index = bisect_right(self._block_lines, line_index) - 1
+        return self._blocks[block_index].entries[line_index - self._block_lines[block_index]]
+
+    def iter_entries(self) -> Iterator[LineEntry]:
+        """Iterate over the committed entries, in line order."""
+        blocks = self._blocks
+        return chain.from_iterable(block.entries for block in blocks)
+
+    def first_row(self, line_index: int) -> int:
+        """Return the row of the first token at or after the start of a 0-based line.
+
+        Args:
+            line_index: 0-based line; the line count gives the number of rows
+
+        Returns:
+            The row where the line's tokens start
+        """
+        if line_index >= self.committed_line_count:
+            return len(self)
+        block_index = bisect_right(self._block_lines, line_index) - 1
+        block = self._blocks[block_index]
+        return self._block_rows[block_index] + block.offsets[line_index - self._block_lines[block_index]]
+
+    def _locate(self, row: int) -> tuple[int, tuple[int, int, int]]:
+        """Return the line index and span of the token at ``row``."""
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("token index out of range")
+        block_index = bisect_right(self._block_rows, row) - 1
+        block = self._blocks[block_index]
+        local_row = row - self._block_rows[block_index]
+        index = bisect_right(block.offsets, local_row) - 1
+        spans = block.entries[index].spans or ()
+        return self._block_lines[block_index] + index, spans[local_row - block.offsets[index]]
+
+    def value(self, row: int) -> str:
+        """Return the source text of the token at ``row``."""
+        line_index, (start, end, _) = self._locate(row)
+        return self.entry(line_index).text[start:end]
+
+    def type_id(self, row: int) -> int:
+        """Return the type id of the token at ``row``."""
+        return self._locate(row)[1][2]
+
+    def type_name(self, row: int) -> str:
+        """Return the type name of the token at ``row``."""
+        return TOKEN_TYPES[self._locate(row)[1][2]]
+
+    def line(self, row: int) -> int:
+        """Return the 1-based line of the token at ``row``."""
+        return self._locate(row)[0] + 1
+
+    def column(self, row: int) -> int:
+        """Return the 0-based column of the token at ``row``."""
+        return self._locate(row)[1][0]
+
+    def first_row_for_line(self, line: int) -> int | None:
+        """Return the row of the first token on a line.
+
+        Args:
+            line: 1-based line number
+
+        Returns:
+            The row of the line's first token, or None if the line has none
+        """
+        if not 1 <= line <= self.committed_line_count:
+            return None
+        block_index = bisect_right(self._block_lines, line - 1) - 1
+        offsets = self._blocks[block_index].offsets
+        index = line - 1 - self._block_lines[block_index]
+        if offsets[index] == offsets[index + 1]:
+            return None
+        return self._block_rows[block_index] + offsets[index]
+
+    def rows(self) -> Iterator[TokenRow]:
+        """Iterate over the tokens as lightweight ``TokenRow`` tuples.
+
+        Yields:
+            TokenRow: The value, type, line and column of each token
+        """
+        for line_num, entry in enumerate(self.iter_entries(), start=1):
+            for start, end, type_id in entry.spans or ():
+                yield TokenRow(entry.text[start:end], TOKEN_TYPES[type_id], line_num, start)
+
+    def __len__(self) -> int:
+        return self._block_rows[-1]
+
+    def __getitem__(self, row: int) -> Token:
+        line_index, (start, end, type_id) = self._locate(row)
+        return token_model()(
+            value=self.entry(line_index).text[start:end],
+            type=TOKEN_TYPES[type_id],
+            line=line_index + 1,
+        )
+
+    def __iter__(self) -> Iterator[Token]:
+        Token = token_model()
+        for value, type_name, line, _ in self.rows():
+            yield Token(value=value, type=type_name, line=line)
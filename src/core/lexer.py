@@ -2,22 +2,24 @@
 
 from __future__ import annotations
 
+import mmap
+import os
 import re
-from typing import TYPE_CHECKING
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
-from pydantic import BaseModel
+from .profiling import LexerStats
+from .tokens import TOKEN_TYPES, TYPE_IDS, TokenRow, TokenStream, token_model
 
 if TYPE_CHECKING:
-    from collections.abc import Generator
+    from collections.abc import Generator, Iterator
 
+    from .tokens import Token
 
-class Token(BaseModel):
-    """Represents a lexical token with its value, type, and line number."""
-    
-    value: str
-    type: str
-    line: int
 
+# Bump whenever tokenization changes, so cached token streams are discarded
+LEXER_VERSION = 1
 
 # Define the dictionaries for fast lookup
 INSTRUCTIONS = {
@@ -45,18 +47,92 @@ TYPES = {
     "BYTE PTR", "WORD PTR"
 }
 
+# Pseudoinstructions are matched as raw substrings, even inside longer words,
+# longest first so multi-word directives win over their shorter parts.
+_PSEUDO_ALTERNATION = "|".join(
+    re.escape(pseudo) for pseudo in sorted(PSEUDO_INSTRUCTIONS, key=lambda p: (-len(p), p))
+)
+_PSEUDO_INITIALS = "".join(sorted({re.escape(pseudo[0]) for pseudo in PSEUDO_INSTRUCTIONS}))
+
+# A word is a run of non-separator characters that stops right before any
+# pseudoinstruction; only the few characters that can start one pay for the
+# lookahead.
+_WORD_PATTERN = (
+    rf"(?:[^\s,:\[\]'\"{_PSEUDO_INITIALS}]"
+    rf"|(?!{_PSEUDO_ALTERNATION})[{_PSEUDO_INITIALS}])+"
+)
+
+# Master pattern used to tokenize a cleaned line in a single linear scan.
+_TOKEN_PATTERN = re.compile(
+    r"(?P<string>'[^']*'|\"[^\"]*\")"
+    r"|(?P<unterminated>['\"].*)"
+    r"|(?P<separator>[,:])"
+    r"|(?P<bracket>[\[\]])"
+    rf"|(?P<pseudo>{_PSEUDO_ALTERNATION})"
+    rf"|(?P<word>{_WORD_PATTERN})"
+)
+
+# Digits of the numeric constant notations
+_HEX_DIGITS = re.compile(r'[0-9A-F]+')
+_BIN_DIGITS = re.compile(r'[01]+')
+_DEC_DIGITS = re.compile(r'[0-9]+')
+
+# Number of distinct words remembered by the classification cache; real
+# sources repeat a few hundred lexemes, so this is rarely reached
+CLASSIFY_CACHE_SIZE = 4096
+
+# How much of a memory-mapped file is read before its pages are released
+_MMAP_RELEASE_BYTES = 16 * 1024 * 1024
+
+# Token type ids for the groups that never need classification
+_GROUP_TYPE_IDS = {
+    "string": TYPE_IDS["CONSTANTE_STR"],
+    "pseudo": TYPE_IDS["PSEUDOINSTRUCCIÓN"],
+    "separator": TYPE_IDS["SEPARADOR"],
+    "bracket": TYPE_IDS["SEPARADOR"],
+}
+
+
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
+def _word_type_id(value: str) -> int:
+    """Classify a word or unterminated string into a type id.
+    
+    Classification only depends on the lexeme, so results are memoized and
+    shared by every lexer; a repeated word costs a single cache lookup.
+    
+    Args:
+        value: The lexeme to classify
+        
+    Returns:
+        The index of its type in ``TOKEN_TYPES``
+    """
+    return TYPE_IDS[_CLASSIFIER._simple_token_type(value)]
+
+
+def __getattr__(name: str) -> Any:
+    # ``Token`` stays importable from here without importing pydantic up front
+    if name == "Token":
+        return token_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 class Lexer:
     """Lexical analyzer for 8086 assembly code."""
     
-    def __init__(self, source_code: str) -> None:
+    _word_type_id = staticmethod(_word_type_id)
+    
+    def __init__(self, source_code: str, profile: bool = False) -> None:
         """Initialize the lexer with the source code.
         
         Args:
             source_code: The complete source code as a single string
+            profile: Record the time and calls of each phase in ``stats``
         """
         self.source_code = source_code
         self.tokens: list[Token] = []
+        self.stream: TokenStream | None = None
+        # Per-phase timings of the last analysis; None unless profiling
+        self.stats: LexerStats | None = LexerStats() if profile else None
     
     def _clean_code(self) -> str:
         """Remove comments from the source code.
@@ -92,12 +168,12 @@ class Lexer:
         # Check for 0x prefix
         if value.upper().startswith('0X'):
             hex_part = value[2:]
-            return bool(re.fullmatch(r'[0-9A-F]+', hex_part))
+            return _HEX_DIGITS.fullmatch(hex_part) is not None
         
         # Check for trailing 'h' or 'H'
         if value.upper().endswith('H') and len(value) > 1:
             hex_part = value[:-1]
-            return bool(re.fullmatch(r'[0-9A-F]+', hex_part))
+            return _HEX_DIGITS.fullmatch(hex_part) is not None
         
         return False
     
@@ -112,7 +188,7 @@ class Lexer:
         """
         if value.upper().endswith('B') and len(value) > 1:
             bin_part = value[:-1]
-            return bool(re.fullmatch(r'[01]+', bin_part))
+            return _BIN_DIGITS.fullmatch(bin_part) is not None
         
         return False
     
@@ -125,7 +201,7 @@ class Lexer:
         Returns:
             True if it's a decimal constant, False otherwise
         """
-        return bool(re.fullmatch(r'[0-9]+', value))
+        return _DEC_DIGITS.fullmatch(value) is not None
     
     def _is_string_constant(self, value: str) -> bool:
         """Check if a value is a string constant.
@@ -184,12 +260,168 @@ class Lexer:
         # Default to symbol for everything else
         return "SÍMBOLO"
     
-    def _tokenize(self) -> Generator[Token, None, None]:
-        """Tokenize the cleaned source code.
+    def _scan(self, text: str, pos: int, endpos: int) -> list[tuple[int, int, int]]:
+        """Tokenize one line of ``text`` with the compiled master pattern.
+        
+        The line spans ``text[pos:endpos]``; everything from the first ``;``
+        onwards is a comment. Whitespace is skipped implicitly because no
+        alternative of ``_TOKEN_PATTERN`` matches it.
+        
+        Args:
+            text: String containing the line
+            pos: Offset of the first character of the line
+            endpos: Offset one past the last character of the line
+            
+        Returns:
+            ``(start, end, type_id)`` spans as offsets into ``text``
+        """
+        comment_pos = text.find(';', pos, endpos)
+        if comment_pos != -1:
+            endpos = comment_pos
+        
+        spans = []
+        for match in _TOKEN_PATTERN.finditer(text, pos, endpos):
+            start, end = match.span()
+            type_id = _GROUP_TYPE_IDS.get(match.lastgroup)
+            if type_id is None:
+                # Words and unterminated strings go through classification
+                value = match.group()
+                if match.lastgroup == "unterminated":
+                    value = value.rstrip()
+                    end = start + len(value)
+                type_id = self._word_type_id(value)
+            spans.append((start, end, type_id))
+        return spans
+    
+    def tokenize_line(self, line: str) -> list[tuple[int, int, int]]:
+        """Tokenize a single source line.
+        
+        Args:
+            line: One line of source code, without its line break
+            
+        Returns:
+            ``(start, end, type_id)`` spans relative to the start of the line
+        """
+        return self._scan(line, 0, len(line))
+    
+    @staticmethod
+    def _lines(source: str) -> Iterator[tuple[int, int, int]]:
+        """Split source code into lines without copying them.
+        
+        Args:
+            source: The source code to split
+            
+        Yields:
+            tuple: The number, start offset and end offset of each line
+        """
+        line_num = 1
+        line_start = 0
+        source_len = len(source)
+        while line_start <= source_len:
+            line_end = source.find('\n', line_start)
+            if line_end == -1:
+                line_end = source_len
+            yield line_num, line_start, line_end
+            line_num += 1
+            line_start = line_end + 1
+    
+    def _tokenize(self) -> TokenStream:
+        """Tokenize the source code into a columnar token stream.
+        
+        Lines are scanned in place, so token offsets, lines and columns refer
+        to the original source, blank and comment lines included.
+        
+        Returns:
+            The stream of tokens found in the source code
+        """
+        source = self.source_code
+        stream = TokenStream(source)
+        append = stream.append
+        scan = self._scan
+        
+        for line_num, line_start, line_end in self._lines(source):
+            for start, end, type_id in scan(source, line_start, line_end):
+                append(start, end, type_id, line_num, start - line_start)
+        
+        return stream
+    
+    def _tokenize_profiled(self) -> TokenStream:
+        """Tokenize with ``_tokenize`` while timing each phase into ``stats``.
+        
+        Line splitting, scanning and classification are timed by shadowing
+        their methods on the instance, so the loop itself is shared and the
+        regular path pays nothing for profiling. The rest of the loop, mostly
+        appending to the stream, is recorded as the stream phase. The hits
+        and misses of the classification cache during the run are recorded
+        as counters.
+        
+        Returns:
+            The stream of tokens found in the source code
+        """
+        stats = self.stats
+        clock = time.perf_counter
+        word_type_id = self._word_type_id
+        scan = self._scan
+        split_lines = self._lines
+        lines = 0
+        lines_time = scan_time = 0.0
+        
+        def timed_word_type_id(value: str) -> int:
+            start = clock()
+            try:
+                return word_type_id(value)
+            finally:
+                stats.add("scan/classify", clock() - start)
+        
+        def timed_scan(text: str, pos: int, endpos: int) -> list[tuple[int, int, int]]:
+            nonlocal scan_time
+            start = clock()
+            spans = scan(text, pos, endpos)
+            scan_time += clock() - start
+            return spans
+        
+        def timed_lines(source: str) -> Iterator[tuple[int, int, int]]:
+            nonlocal lines, lines_time
+            found = split_lines(source)
+            while True:
+                start = clock()
+                line = next(found, None)
+                lines_time += clock() - start
+                if line is None:
+                    return
+                lines += 1
+                yield line
+        
+        self._word_type_id = timed_word_type_id
+        self._scan = timed_scan
+        self._lines = timed_lines
+        cache_before = _word_type_id.cache_info()
+        
+        start = clock()
+        try:
+            stream = self._tokenize()
+        finally:
+            del self._word_type_id, self._scan, self._lines
+        total_time = clock() - start
+        
+        cache_after = _word_type_id.cache_info()
+        stats.count("classify cache hits", cache_after.hits - cache_before.hits)
+        stats.count("classify cache misses", cache_after.misses - cache_before.misses)
+        
+        stats.add("lines", lines_time, lines)
+        stats.add("scan", scan_time, lines)
+        stats.add("stream", total_time - lines_time - scan_time, len(stream))
+        return stream
+    
+    def _tokenize_legacy(self) -> Generator[Token, None, None]:
+        """Tokenize the cleaned source code character by character.
+        
+        Reference implementation kept to validate the regex engine against.
         
         Yields:
             Token: A token from the source code
         """
+        Token = token_model()
         cleaned_code = self._clean_code()
         lines = cleaned_code.split('\n')
         
@@ -299,13 +531,98 @@ class Lexer:
         Yields:
             Token: Processed tokens from the simple token
         """
+        yield token_model()(value=token, type=self._simple_token_type(token, line_num), line=line_num)
+    
+    def _simple_token_type(self, token: str, line_num: int = 0) -> str:
+        """Determine the type of a simple token.
+        
+        Args:
+            token: The token string to classify
+            line_num: Line number for the token
+            
+        Returns:
+            The type of the token
+        """
         # Check if it's a bracket expression like [xxx]
         if token.startswith('[') and token.endswith(']'):
-            yield Token(value=token, type="OPERADOR_COMPUESTO", line=line_num)
+            return "OPERADOR_COMPUESTO"
+        return self._classify(token, line_num)
+    
+    def analyze_stream(self) -> TokenStream:
+        """Run the lexical analysis and return the columnar token stream.
+        
+        Returns:
+            A stream of the tokens extracted from the source code
+        """
+        if self.stats is None:
+            self.stream = self._tokenize()
         else:
-            # Classify and yield the token
-            token_type = self._classify(token, line_num)
-            yield Token(value=token, type=token_type, line=line_num)
+            self.stream = self._tokenize_profiled()
+        return self.stream
+    
+    @classmethod
+    def iter_file_rows(cls, path: str | os.PathLike[str], encoding: str = 'utf-8') -> Iterator[TokenRow]:
+        """Lex a file line by line without loading it into memory.
+        
+        The file is memory-mapped and read one line at a time; pages that
+        were already lexed are handed back to the OS, so peak memory stays
+        flat regardless of the file size.
+        
+        Args:
+            path: Path to the assembly file
+            encoding: Text encoding of the file
+            
+        Yields:
+            TokenRow: The value, type, line and column of each token
+        """
+        lexer = cls("")
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                released = 0
+                
+                for line_num, raw_line in enumerate(iter(mm.readline, b""), start=1):
+                    line = raw_line.decode(encoding).removesuffix('\n')
+                    for start, end, type_id in lexer.tokenize_line(line):
+                        yield TokenRow(line[start:end], TOKEN_TYPES[type_id], line_num, start)
+                    
+                    position = mm.tell()
+                    if position - released >= _MMAP_RELEASE_BYTES and hasattr(mmap, 'MADV_DONTNEED'):
+                        release_end = position - position % mmap.PAGESIZE
+                        mm.madvise(mmap.MADV_DONTNEED, released, release_end - released)
+                        released = release_end
+    
+    @classmethod
+    def iter_file(cls, path: str | os.PathLike[str], encoding: str = 'utf-8') -> Iterator[Token]:
+        """Lex a file line by line, yielding ``Token`` objects.
+        
+        Args:
+            path: Path to the assembly file
+            encoding: Text encoding of the file
+            
+        Yields:
+            Token: A token from the file
+        """
+        Token = token_model()
+        for value, token_type, line, _ in cls.iter_file_rows(path, encoding):
+            yield Token(value=value, type=token_type, line=line)
+    
+    @staticmethod
+    def classify_cache_info():
+        """Return the hit and miss counters of the classification cache.
+        
+        Returns:
+            The ``functools`` cache info, shared by every lexer
+        """
+        return _word_type_id.cache_info()
+    
+    @staticmethod
+    def clear_classify_cache() -> None:
+        """Empty the classification cache and reset its counters."""
+        _word_type_id.cache_clear()
     
     def analyze(self) -> list[Token]:
         """Run the lexical analysis on the source code.
@@ -313,5 +630,15 @@ class Lexer:
         Returns:
             A list of tokens extracted from the source code
         """
-        self.tokens = list(self._tokenize())
-        return self.tokens
\ No newline at end of file
+        stream = self.analyze_stream()
+        if self.stats is None:
+            self.tokens = list(stream)
+        else:
+            start = time.perf_counter()
+            self.tokens = list(stream)
+            self.stats.add("tokens", time.perf_counter() - start, len(self.tokens))
+        return self.tokens
+
+
+# Lexer that classifies the words missing from the classification cache
+_CLASSIFIER = Lexer("")
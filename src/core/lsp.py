@@ -0,0 +1,365 @@
+"""Language Server Protocol server for 8086 assembly, over stdio.
+
+Open documents are kept in a ``DocumentLexer``, so an incremental
+``textDocument/didChange`` only re-lexes the lines it touches. Semantic
+tokens are kept encoded between requests: each edit splices the encoding of
+the rows it changed into the document's token data, and
+``semanticTokens/full/delta`` answers with the one edit covering every
+change since the previous result.
+
+Token types map to standard LSP semantic token types, registers and
+symbols being told apart by the ``defaultLibrary`` modifier.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from typing import TYPE_CHECKING, Any, BinaryIO
+
+from .incremental import DocumentLexer
+from .tokens import TOKEN_TYPES
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# Standard semantic token type and modifiers of each token type
+SEMANTIC_TOKEN_TYPES: dict[str, tuple[str, tuple[str, ...]]] = {
+    "INSTRUCCIÓN": ("keyword", ()),
+    "REGISTRO": ("variable", ("defaultLibrary",)),
+    "TIPO_DATO": ("type", ()),
+    "CONSTANTE_HEX": ("number", ()),
+    "CONSTANTE_BIN": ("number", ()),
+    "CONSTANTE_DEC": ("number", ()),
+    "CONSTANTE_STR": ("string", ()),
+    "PSEUDOINSTRUCCIÓN": ("macro", ()),
+    "SÍMBOLO": ("variable", ()),
+    "SEPARADOR": ("operator", ()),
+    "OPERADOR_COMPUESTO": ("operator", ()),
+}
+
+LEGEND_TYPES = list(dict.fromkeys(semantic for semantic, _ in SEMANTIC_TOKEN_TYPES.values()))
+LEGEND_MODIFIERS = list(dict.fromkeys(m for _, modifiers in SEMANTIC_TOKEN_TYPES.values() for m in modifiers))
+
+# Legend index and modifier bits of each type id
+_ENCODED_TYPES = [
+    (
+        LEGEND_TYPES.index(SEMANTIC_TOKEN_TYPES[name][0]),
+        sum(1 << LEGEND_MODIFIERS.index(m) for m in SEMANTIC_TOKEN_TYPES[name][1]),
+    )
+    for name in TOKEN_TYPES
+]
+
+# JSON-RPC error codes
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_NOT_INITIALIZED = -32002
+
+
+def _utf16_length(text: str) -> int:
+    """Return the length of a string in UTF-16 code units."""
+    return len(text) if text.isascii() else len(text.encode("utf-16-le")) // 2
+
+
+def _utf16_index(text: str, units: int) -> int:
+    """Return the string index of a UTF-16 offset into a line."""
+    if text.isascii():
+        return units
+    index = 0
+    while units > 0 and index < len(text):
+        units -= 2 if ord(text[index]) > 0xFFFF else 1
+        index += 1
+    return index
+
+
+class Document:
+    """An open text document and its encoded semantic tokens."""
+
+    def __init__(self, uri: str, text: str, version: int, utf16: bool) -> None:
+        """Lex a newly opened document.
+
+        Args:
+            uri: The document's URI
+            text: Its full text
+            version: Its version, as sent by the client
+            utf16: Whether positions count UTF-16 code units instead of code points
+        """
+        self.uri = uri
+        self.version = version
+        self.utf16 = utf16
+        self.lexer = DocumentLexer(text)
+        # Semantic token data of the current text, five integers per row
+        self.data: list[int] = self._encode(0, len(self.lexer))
+        # Data of the last result sent, and the bounds of the changes since:
+        # data before ``changed[0]`` and the last ``changed[1]`` integers match
+        self.result_id = 0
+        self._sent: list[int] | None = None
+        self._changed: tuple[int, int] | None = None
+
+    def line_text(self, line: int) -> str:
+        """Return the text of a line, without its line break."""
+        lexer = self.lexer
+        return lexer.entry(line).text if line < lexer.committed_line_count else ""
+
+    def _column(self, text: str, index: int) -> int:
+        return _utf16_length(text[:index]) if self.utf16 else index
+
+    def _index(self, text: str, character: int) -> int:
+        return min(_utf16_index(text, character) if self.utf16 else character, len(text))
+
+    def apply_change(self, change: dict[str, Any]) -> None:
+        """Apply one content change of ``textDocument/didChange``.
+
+        Args:
+            change: A change with a ``range``, or a whole new text
+        """
+        lexer = self.lexer
+        if "range" not in change:
+            lexer.reset(change["text"])
+        else:
+            start, end = change["range"]["start"], change["range"]["end"]
+            last = max(lexer.line_count - 1, 0)
+            first_line, last_line = min(start["line"], last), min(end["line"], last)
+            first_text, last_text = self.line_text(first_line), self.line_text(last_line)
+            prefix = first_text[:self._index(first_text, start["character"])]
+            suffix = last_text[self._index(last_text, end["character"]):]
+            lines = (prefix + change["text"] + suffix).split("\n")
+            lexer.replace_lines(first_line, last_line - first_line + 1, lines)
+
+        first, removed, added = lexer.relex()
+        # The token after the edit is encoded relative to the edited ones
+        following = 1 if first + added < len(lexer) else 0
+        start_index = first * 5
+        stop_index = start_index + (removed + following) * 5
+        self.data[start_index:stop_index] = self._encode(first, first + added + following)
+
+        tail = len(self.data) - start_index - (added + following) * 5
+        if self._changed is None:
+            self._changed = (start_index, tail)
+        else:
+            self._changed = (min(self._changed[0], start_index), min(self._changed[1], tail))
+
+    def _encode(self, first: int, stop: int) -> list[int]:
+        """Encode rows ``[first, stop)`` relative to the row before them."""
+        lexer = self.lexer
+        data: list[int] = []
+        if first >= stop:
+            return data
+        if first:
+            previous_line = lexer.line(first - 1) - 1
+            previous_column = self._column(self.line_text(previous_line), lexer.column(first - 1))
+        else:
+            previous_line = previous_column = 0
+
+        line = lexer.line(first) - 1
+        row = first
+        while row < stop:
+            entry = lexer.entry(line)
+            text = entry.text
+            spans = entry.spans or ()
+            base = lexer.first_row(line)
+            for start, end, type_id in spans[row - base:stop - base]:
+                column = self._column(text, start)
+                length = self._column(text, end) - column if self.utf16 else end - start
+                delta_column = column - previous_column if line == previous_line else column
+                token_type, modifiers = _ENCODED_TYPES[type_id]
+                data += (line - previous_line, delta_column, length, token_type, modifiers)
+                previous_line, previous_column = line, column
+                row += 1
+            line += 1
+        return data
+
+    def full(self) -> dict[str, Any]:
+        """Answer ``semanticTokens/full`` and remember the result."""
+        self.result_id += 1
+        self._sent = list(self.data)
+        self._changed = None
+        return {"resultId": str(self.result_id), "data": list(self.data)}
+
+    def delta(self, previous_result_id: str) -> dict[str, Any]:
+        """Answer ``semanticTokens/full/delta``.
+
+        Args:
+            previous_result_id: The result the client holds
+
+        Returns:
+            The edits from that result, or full tokens if it is not the last
+        """
+        if self._sent is None or previous_result_id != str(self.result_id):
+            return self.full()
+        edits = []
+        if self._changed is not None:
+            start, tail = self._changed
+            stop = len(self.data) - tail
+            edits.append({"start": start, "deleteCount": len(self._sent) - tail - start, "data": self.data[start:stop]})
+            self._sent[start:len(self._sent) - tail] = self.data[start:stop]
+        self.result_id += 1
+        self._changed = None
+        return {"resultId": str(self.result_id), "edits": edits}
+
+
+class ResponseError(Exception):
+    """An error answered to a request."""
+
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class LanguageServer:
+    """Handles LSP messages for a set of open documents."""
+
+    def __init__(self) -> None:
+        self.documents: dict[str, Document] = {}
+        self.initialized = False
+        self.shutdown_requested = False
+        self.utf16 = True
+        self._handlers: dict[str, Callable[[dict[str, Any]], Any]] = {
+            "initialize": self.initialize,
+            "shutdown": self.shutdown,
+            "textDocument/didOpen": self.did_open,
+            "textDocument/didChange": self.did_change,
+            "textDocument/didClose": self.did_close,
+            "textDocument/semanticTokens/full": self.semantic_tokens_full,
+            "textDocument/semanticTokens/full/delta": self.semantic_tokens_delta,
+        }
+
+    def handle(self, message: dict[str, Any]) -> dict[str, Any] | None:
+        """Handle one request or notification.
+
+        Args:
+            message: The decoded JSON-RPC message
+
+        Returns:
+            The response to send, or None for notifications
+        """
+        method = message.get("method")
+        is_request = "id" in message
+        handler = self._handlers.get(method or "")
+        try:
+            if handler is None:
+                if is_request:
+                    raise ResponseError(METHOD_NOT_FOUND, f"Unhandled method {method}")
+                return None
+            if not self.initialized and method != "initialize":
+                if is_request:
+                    raise ResponseError(SERVER_NOT_INITIALIZED, "Server not initialized")
+                return None
+            result = handler(message.get("params") or {})
+        except ResponseError as error:
+            return {"jsonrpc": "2.0", "id": message["id"], "error": {"code": error.code, "message": error.message}}
+        except (KeyError, TypeError, ValueError) as error:
+            if not is_request:
+                return None
+            return {"jsonrpc": "2.0", "id": message["id"], "error": {"code": INVALID_PARAMS, "message": str(error)}}
+        if not is_request:
+            return None
+        return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+
+    def _document(self, params: dict[str, Any]) -> Document:
+        uri = params["textDocument"]["uri"]
+        document = self.documents.get(uri)
+        if document is None:
+            raise ResponseError(INVALID_PARAMS, f"Document {uri} is not open")
+        return document
+
+    def initialize(self, params: dict[str, Any]) -> dict[str, Any]:
+        encodings = (params.get("capabilities") or {}).get("general", {}).get("positionEncodings", [])
+        # Code points are what the lexer counts, so prefer them when offered
+        self.utf16 = "utf-32" not in encodings
+        self.initialized = True
+        return {
+            "capabilities": {
+                "positionEncoding": "utf-16" if self.utf16 else "utf-32",
+                "textDocumentSync": {"openClose": True, "change": 2},
+                "semanticTokensProvider": {
+                    "legend": {"tokenTypes": LEGEND_TYPES, "tokenModifiers": LEGEND_MODIFIERS},
+                    "full": {"delta": True},
+                },
+            },
+            "serverInfo": {"name": "some-asm"},
+        }
+
+    def shutdown(self, params: dict[str, Any]) -> None:
+        self.shutdown_requested = True
+
+    def did_open(self, params: dict[str, Any]) -> None:
+        item = params["textDocument"]
+        self.documents[item["uri"]] = Document(item["uri"], item["text"], item.get("version", 0), self.utf16)
+
+    def did_change(self, params: dict[str, Any]) -> None:
+        document = self._document(params)
+        for change in params["contentChanges"]:
+            document.apply_change(change)
+        document.version = params["textDocument"].get("version", document.version)
+
+    def did_close(self, params: dict[str, Any]) -> None:
+        self.documents.pop(params["textDocument"]["uri"], None)
+
+    def semantic_tokens_full(self, params: dict[str, Any]) -> dict[str, Any]:
+        return self._document(params).full()
+
+    def semantic_tokens_delta(self, params: dict[str, Any]) -> dict[str, Any]:
+        return self._document(params).delta(params["previousResultId"])
+
+
+def read_message(reader: BinaryIO) -> dict[str, Any] | None:
+    """Read one framed JSON-RPC message.
+
+    Args:
+        reader: Stream the client writes to
+
+    Returns:
+        The decoded message, or None at the end of the stream
+    """
+    length = None
+    while True:
+        header = reader.readline()
+        if not header:
+            return None
+        header = header.strip()
+        if not header:
+            break
+        name, _, value = header.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    if length is None:
+        raise ValueError("Message without a Content-Length header")
+    return json.loads(reader.read(length))
+
+
+def write_message(writer: BinaryIO, message: dict[str, Any]) -> None:
+    """Write one framed JSON-RPC message.
+
+    Args:
+        writer: Stream the client reads from
+        message: The message to encode
+    """
+    body = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    writer.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+    writer.flush()
+
+
+def serve(reader: BinaryIO | None = None, writer: BinaryIO | None = None) -> int:
+    """Run the server until the client sends ``exit``.
+
+    Args:
+        reader: Stream of client messages; stdin when None
+        writer: Stream of server messages; stdout when None
+
+    Returns:
+        The process exit code: 0 if ``shutdown`` came before ``exit``
+    """
+    reader = reader or sys.stdin.buffer
+    writer = writer or sys.stdout.buffer
+    server = LanguageServer()
+    while True:
+        message = read_message(reader)
+        if message is None:
+            return 1
+        if message.get("method") == "exit":
+            return 0 if server.shutdown_requested else 1
+        response = server.handle(message)
+        if response is not None:
+            write_message(writer, response)
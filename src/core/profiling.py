@@ -0,0 +1,188 @@
+"""Opt-in profiling of the lexer.
+
+``LexerStats`` collects the wall time and call count of each phase of an
+analysis run with ``Lexer(source, profile=True)``. Phases are named like
+paths: ``scan/classify`` is part of ``scan``, and its time is included in
+the time of ``scan``.
+
+``trace_speedscope`` records every function call made while running a
+callable and returns it as a speedscope evented profile, which can be
+opened at https://www.speedscope.app.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class PhaseStats:
+    """Accumulated wall time and calls of a single phase."""
+
+    __slots__ = ("seconds", "calls")
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.calls = 0
+
+
+class PhaseRow(NamedTuple):
+    """One line of a profiling report."""
+
+    name: str
+    seconds: float
+    self_seconds: float
+    calls: int
+
+
+class LexerStats:
+    """Wall time and call counts of the phases of a lexer run."""
+
+    def __init__(self) -> None:
+        self.phases: dict[str, PhaseStats] = {}
+        # Events without a duration, such as cache hits
+        self.counters: dict[str, int] = {}
+
+    def add(self, name: str, seconds: float, calls: int = 1) -> None:
+        """Record time spent in a phase.
+
+        Args:
+            name: Phase name; nested phases are separated by ``/``
+            seconds: Wall time spent in the phase
+            calls: Number of calls the time covers
+        """
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = PhaseStats()
+        phase.seconds += seconds
+        phase.calls += calls
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Increase an event counter.
+
+        Args:
+            name: Counter name
+            amount: Number of events to add
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def self_seconds(self, name: str) -> float:
+        """Return the time of a phase excluding its nested phases.
+
+        Args:
+            name: Phase name
+
+        Returns:
+            The time spent in the phase itself
+        """
+        prefix = name + "/"
+        children = sum(
+            phase.seconds
+            for child, phase in self.phases.items()
+            if child.startswith(prefix) and "/" not in child[len(prefix):]
+        )
+        return self.phases[name].seconds - children
+
+    @property
+    def total_seconds(self) -> float:
+        """Wall time of all top-level phases."""
+        return sum(phase.seconds for name, phase in self.phases.items() if "/" not in name)
+
+    def rows(self) -> list[PhaseRow]:
+        """Return one report row per phase, nested phases after their parent.
+
+        Returns:
+            The phases with their total and self times
+        """
+        order = {name: index for index, name in enumerate(self.phases)}
+        names = sorted(self.phases, key=lambda n: [order.get(a, len(order)) for a in _ancestors(n)])
+        return [
+            PhaseRow(name, self.phases[name].seconds, self.self_seconds(name), self.phases[name].calls)
+            for name in names
+        ]
+
+
+def _ancestors(name: str) -> list[str]:
+    """Return a phase name and the names of the phases containing it."""
+    parts = name.split("/")
+    return ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+def trace_speedscope(func: Callable[[], Any], name: str = "profile") -> tuple[Any, dict]:
+    """Run a callable and record its calls as a speedscope evented profile.
+
+    Every Python and built-in function call is recorded, so the run is a lot
+    slower than usual; the relative timings stay meaningful.
+
+    Args:
+        func: The callable to profile
+        name: Name of the profile in speedscope
+
+    Returns:
+        The callable's return value and the speedscope document
+    """
+    frames: list[dict] = []
+    frame_ids: dict[object, int] = {}
+    events: list[dict] = []
+    stack: list[int] = []
+    clock = time.perf_counter
+    start = clock()
+
+    def frame_id(key: object, frame_name: str, file: str | None, line: int | None) -> int:
+        index = frame_ids.get(key)
+        if index is None:
+            index = frame_ids[key] = len(frames)
+            entry: dict[str, Any] = {"name": frame_name}
+            if file is not None:
+                entry["file"] = file
+                entry["line"] = line
+            frames.append(entry)
+        return index
+
+    def profiler(frame, event: str, arg) -> None:
+        at = clock() - start
+        if event == "call":
+            code = frame.f_code
+            index = frame_id(code, code.co_qualname, code.co_filename, code.co_firstlineno)
+        elif event == "c_call":
+            module = getattr(arg, "__module__", None)
+            qualname = getattr(arg, "__qualname__", repr(arg))
+            index = frame_id((module, qualname), f"{module}.{qualname}" if module else qualname, None, None)
+        else:
+            # return, c_return and c_exception close the innermost frame; calls
+            # that were already running when tracing started are ignored
+            if stack:
+                events.append({"type": "C", "frame": stack.pop(), "at": at})
+            return
+        stack.append(index)
+        events.append({"type": "O", "frame": index, "at": at})
+
+    sys.setprofile(profiler)
+    try:
+        result = func()
+    finally:
+        sys.setprofile(None)
+    end = clock() - start
+    while stack:
+        events.append({"type": "C", "frame": stack.pop(), "at": end})
+
+    document = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "evented",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": end,
+            "events": events,
+        }],
+        "name": name,
+        "activeProfileIndex": 0,
+        "exporter": "some-asm",
+    }
+    return result, document
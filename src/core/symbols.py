@@ -0,0 +1,427 @@
+"""Project-wide index of symbol definitions and references.
+
+The lexer reports labels, ``equ`` names and macro names as plain
+``SÍMBOLO`` tokens. ``extract_symbols`` reads the statements of a file the
+way the assembler does and tells definitions from uses:
+
+* a word followed by ``:`` is a label;
+* a word that is not a mnemonic, followed by a data directive, ``resb``
+  and friends, ``times`` or ``equ``, is a data label or constant;
+* ``%macro`` and ``%define`` name macros;
+* any other identifier in an operand or a statement is a reference.
+
+Local labels (``.loop``) are qualified with the last non-local label
+before them, as NASM does, so ``.loop`` under ``PrintString`` is indexed as
+``PrintString.loop``.
+
+``SymbolIndex`` keeps the definitions and references of many files by name,
+so finding them is a dictionary lookup. Files are re-read only when their
+content hash changes, and the index is saved as JSON between sessions.
+``index_project`` keeps the saved index of a directory up to date with the
+files open in an editor and everything they include.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from bisect import bisect_right
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from .assembler import LABELLED_DIRECTIVES, MNEMONICS, statement_lines
+from .cache import decode_source, default_cache_dir
+from .includes import IncludeResolver
+from .lexer import Lexer
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping
+
+    from .cache import TokenCache
+    from .incremental import DocumentLexer
+    from .tokens import TokenStream
+
+# Bumped whenever extraction changes, so older saved indexes are ignored
+INDEX_VERSION = 1
+
+_IDENTIFIER = re.compile(r"[A-Za-z_.?@][\w.?@$#~]*\Z")
+
+# Words of operands that are not symbols
+_KEYWORDS = {"byte", "word", "dword", "short", "near", "far", "ptr", "offset", "seg", "wrt", "strict", "dup"}
+
+# Statements whose operands name sections rather than symbols
+_SECTION_DIRECTIVES = {"section", "segment"}
+
+
+class SymbolDefinition(NamedTuple):
+    """Where a symbol is defined: ``label``, ``data``, ``equ``, ``macro`` or ``define``."""
+
+    name: str
+    kind: str
+    path: str
+    line: int
+    column: int
+
+
+class SymbolReference(NamedTuple):
+    """A use of a symbol."""
+
+    name: str
+    path: str
+    line: int
+    column: int
+
+
+class FileSymbols(NamedTuple):
+    """Definitions and references of one file, and the hash of its content."""
+
+    digest: str
+    definitions: list[SymbolDefinition]
+    references: list[SymbolReference]
+
+
+def _qualify(name: str, scope: str) -> str:
+    """Prefix a local label with the label it belongs to."""
+    if name.startswith(".") and not name.startswith("..@") and scope:
+        return scope + name
+    return name
+
+
+def extract_symbols(
+    stream: TokenStream | DocumentLexer, path: str
+) -> tuple[list[SymbolDefinition], list[SymbolReference]]:
+    """Find the symbol definitions and references of a lexed file.
+
+    Args:
+        stream: Tokens of the file, or the committed state of a document
+        path: Path recorded in the results
+
+    Returns:
+        The definitions and references, in source order
+    """
+    definitions: list[SymbolDefinition] = []
+    references: list[SymbolReference] = []
+    scope = ""
+
+    for rows in statement_lines(stream):
+        if rows[0].value == "[" and rows[-1].value == "]":
+            rows = rows[1:-1]
+            if not rows:
+                continue
+        first = rows[0].value.lower()
+
+        if first in ("%macro", "%define", "%xdefine", "%assign"):
+            if len(rows) > 1 and _IDENTIFIER.match(rows[1].value):
+                kind = "macro" if first == "%macro" else "define"
+                definitions.append(SymbolDefinition(rows[1].value, kind, path, rows[1].line, rows[1].column))
+            continue
+        if first.startswith("%"):
+            continue
+
+        # Same rules as the assembler: ``name:``, or a non-mnemonic before a
+        # data directive, ``times`` or ``equ``
+        label = None
+        if len(rows) > 1 and rows[1].value == ":" and rows[1].type == "SEPARADOR":
+            label, rows = rows[0], rows[2:]
+        elif first not in MNEMONICS and len(rows) > 1 and rows[1].value.lower() in LABELLED_DIRECTIVES:
+            label, rows = rows[0], rows[1:]
+
+        if label is not None and _IDENTIFIER.match(label.value):
+            directive = rows[0].value.lower() if rows else ""
+            kind = "equ" if directive == "equ" else "data" if directive in LABELLED_DIRECTIVES else "label"
+            name = _qualify(label.value, scope)
+            if not label.value.startswith("."):
+                scope = label.value
+            definitions.append(SymbolDefinition(name, kind, path, label.line, label.column))
+
+        if rows and rows[0].value.lower() in _SECTION_DIRECTIVES:
+            continue
+        for row in rows:
+            value = row.value
+            if (
+                row.type == "SÍMBOLO"
+                and _IDENTIFIER.match(value)
+                and value.lower() not in MNEMONICS
+                and value.lower() not in _KEYWORDS
+            ):
+                references.append(SymbolReference(_qualify(value, scope), path, row.line, row.column))
+    return definitions, references
+
+
+def default_index_path(root: str | Path) -> Path:
+    """Return where the index of a project directory is saved.
+
+    Args:
+        root: The project directory
+
+    Returns:
+        A file next to the token cache, named after the resolved directory
+    """
+    key = hashlib.sha256(str(Path(root).resolve()).encode("utf-8")).hexdigest()[:16]
+    return default_cache_dir().parent / "symbols" / f"{key}.json"
+
+
+class SymbolIndex:
+    """Definitions and references of a set of files, by symbol name."""
+
+    def __init__(self, cache: TokenCache | None = None) -> None:
+        """Initialize an empty index.
+
+        Args:
+            cache: Token cache used to lex files
+        """
+        self.cache = cache
+        self.files: dict[str, FileSymbols] = {}
+        # name -> path -> entries, so updating a file only touches its names
+        self._definitions: dict[str, dict[str, list[SymbolDefinition]]] = {}
+        self._references: dict[str, dict[str, list[SymbolReference]]] = {}
+        # path -> (line, name) of the labels that scope local ``.labels``
+        self._scopes: dict[str, list[tuple[int, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def definitions(self, name: str) -> list[SymbolDefinition]:
+        """Return the definitions of a symbol, in every file."""
+        return [entry for entries in self._definitions.get(name, {}).values() for entry in entries]
+
+    def references(self, name: str) -> list[SymbolReference]:
+        """Return the uses of a symbol, in every file."""
+        return [entry for entries in self._references.get(name, {}).values() for entry in entries]
+
+    def qualify(self, path: str | Path, line: int, name: str) -> str:
+        """Return the full name of a symbol written at a line of a file.
+
+        Args:
+            path: The file
+            line: 1-based line where the name is written
+            name: The name as written, possibly a local ``.label``
+
+        Returns:
+            The name under which the symbol is indexed
+        """
+        if not name.startswith("."):
+            return name
+        scopes = self._scopes.get(str(Path(path).resolve()))
+        if scopes is None:
+            return name
+        index = bisect_right(scopes, (line, "￿")) - 1
+        return _qualify(name, scopes[index][1] if index >= 0 else "")
+
+    def update(self, paths: Iterable[str | Path]) -> int:
+        """Bring many files up to date; files that no longer exist are removed.
+
+        Args:
+            paths: Files to check
+
+        Returns:
+            The number of files whose symbols changed
+        """
+        changed = 0
+        for path in paths:
+            try:
+                changed += self.update_file(path)
+            except FileNotFoundError:
+                changed += self.remove_file(path)
+            except (OSError, UnicodeDecodeError):
+                continue
+        return changed
+
+    def update_file(self, path: str | Path) -> bool:
+        """Re-index a file if its content changed.
+
+        Args:
+            path: The file
+
+        Returns:
+            Whether the file was (re)indexed
+
+        Raises:
+            OSError: If the file cannot be read
+            UnicodeDecodeError: If the file is not valid UTF-8
+        """
+        path = Path(path).resolve()
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        known = self.files.get(str(path))
+        if known is not None and known.digest == digest:
+            return False
+        if self.cache is not None:
+            stream, _ = self.cache.lex_bytes(data)
+        else:
+            stream = Lexer(decode_source(data)).analyze_stream()
+        self._store(str(path), digest, *extract_symbols(stream, str(path)))
+        return True
+
+    def update_source(self, path: str | Path, source: str) -> bool:
+        """Re-index a file from text that may not be saved yet, e.g. an editor buffer.
+
+        Args:
+            path: The file the text belongs to
+            source: Its current text
+
+        Returns:
+            Whether the file was (re)indexed
+        """
+        path = str(Path(path).resolve())
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        known = self.files.get(path)
+        if known is not None and known.digest == digest:
+            return False
+        self._store(path, digest, *extract_symbols(Lexer(source).analyze_stream(), path))
+        return True
+
+    def update_symbols(
+        self, path: str | Path, definitions: list[SymbolDefinition], references: list[SymbolReference]
+    ) -> None:
+        """Replace the symbols of a file with ones extracted elsewhere, e.g. from an editor's tokens.
+
+        They are stored without a content hash, so the next ``update_file``
+        reads the file again.
+
+        Args:
+            path: The file the symbols belong to
+            definitions: Its definitions, in source order
+            references: Its references, in source order
+        """
+        self._store(str(Path(path).resolve()), "", definitions, references)
+
+    def remove_file(self, path: str | Path) -> bool:
+        """Drop a file from the index.
+
+        Args:
+            path: The file
+
+        Returns:
+            Whether the file was indexed
+        """
+        path = str(Path(path).resolve())
+        symbols = self.files.pop(path, None)
+        if symbols is None:
+            return False
+        del self._scopes[path]
+        for table, entries in ((self._definitions, symbols.definitions), (self._references, symbols.references)):
+            for name in {entry.name for entry in entries}:
+                by_path = table[name]
+                del by_path[path]
+                if not by_path:
+                    del table[name]
+        return True
+
+    def _store(
+        self, path: str, digest: str, definitions: list[SymbolDefinition], references: list[SymbolReference]
+    ) -> None:
+        """Replace the symbols of a file."""
+        self.remove_file(path)
+        self.files[path] = FileSymbols(digest, definitions, references)
+        self._scopes[path] = [
+            (definition.line, definition.name) for definition in definitions
+            if definition.kind in ("label", "data", "equ") and "." not in definition.name[1:]
+        ]
+        for definition in definitions:
+            self._definitions.setdefault(definition.name, {}).setdefault(path, []).append(definition)
+        for reference in references:
+            self._references.setdefault(reference.name, {}).setdefault(path, []).append(reference)
+
+    def save(self, path: str | Path) -> None:
+        """Write the index to a JSON file, atomically.
+
+        Args:
+            path: Where to write it
+        """
+        document = {
+            "version": INDEX_VERSION,
+            "files": {
+                file: {
+                    "digest": symbols.digest,
+                    "definitions": [[d.name, d.kind, d.line, d.column] for d in symbols.definitions],
+                    "references": [[r.name, r.line, r.column] for r in symbols.references],
+                }
+                for file, symbols in self.files.items()
+            },
+        }
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(document, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str | Path, cache: TokenCache | None = None) -> SymbolIndex:
+        """Read an index saved with ``save``.
+
+        A missing, unreadable or outdated file gives an empty index, which
+        ``update`` then fills in.
+
+        Args:
+            path: The saved index
+            cache: Token cache used to lex files
+
+        Returns:
+            The index
+        """
+        index = cls(cache)
+        try:
+            with open(path, encoding="utf-8") as f:
+                document = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if not isinstance(document, dict) or document.get("version") != INDEX_VERSION:
+            return index
+        for file, entry in document["files"].items():
+            definitions = [SymbolDefinition(name, kind, file, line, column) for name, kind, line, column in entry["definitions"]]
+            references = [SymbolReference(name, file, line, column) for name, line, column in entry["references"]]
+            index._store(file, entry["digest"], definitions, references)
+        return index
+
+
+def index_project(
+    root: str | Path, documents: Mapping[str | Path, Iterable[str]], cache: TokenCache | None = None
+) -> SymbolIndex:
+    """Bring the saved index of a directory up to date with the files open in an editor, and save it.
+
+    The open files are not read, as their symbols come from the editor;
+    the files they include, directly or not, and the files the index
+    already knows are checked, and only those edited since they were last
+    indexed are read again.
+
+    Args:
+        root: The project directory, which names the saved index
+        documents: Include targets of each open file, as written in it
+        cache: Token cache used to lex files
+
+    Returns:
+        The updated index
+    """
+    index_path = default_index_path(root)
+    index = SymbolIndex.load(index_path, cache)
+    resolver = IncludeResolver(cache=cache)
+    open_files = {Path(path).resolve() for path in documents}
+    paths: set[Path] = set()
+    for path, targets in documents.items():
+        path = Path(path).resolve()
+        for target in targets:
+            included = resolver.resolve(target, path)
+            if included is None or included in paths:
+                continue
+            try:
+                paths.update(resolver.graph([included]).files)
+            except (OSError, UnicodeDecodeError):
+                # update() drops the file if it is gone and skips it otherwise
+                paths.add(included)
+    # Known files are checked too, so deleted ones are dropped
+    paths.update(Path(path) for path in index.files)
+    if index.update(sorted(paths - open_files)):
+        try:
+            index.save(index_path)
+        except OSError:
+            pass
+    return index
@@ -0,0 +1,160 @@
+"""Indexed search over the token rows of a document.
+
+``TokenIndex`` is built once from the committed lines of a ``DocumentLexer``
+and answers ``TokenFilter`` queries without scanning every row:
+
+* every token type has a sorted bucket of the rows of that type;
+* every distinct value (compared case-insensitively, as the assembler does)
+  has a sorted bucket of its rows, and the values are kept sorted, so a
+  prefix is a binary search away from the buckets it selects;
+* rows are ordered by line, so a line range is a contiguous range of rows.
+
+Type, prefix and line queries therefore cost about the size of their result.
+A regular expression is matched against the distinct values rather than the
+rows, which is far fewer in any real listing.
+"""
+
+from __future__ import annotations
+
+import re
+from array import array
+from bisect import bisect_left
+from itertools import chain
+from typing import TYPE_CHECKING, NamedTuple
+
+from .tokens import TOKEN_TYPES
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+    from .incremental import DocumentLexer, LineEntry
+
+
+class TokenFilter(NamedTuple):
+    """Criteria of a token search; criteria left unset match every token."""
+
+    # Type ids to keep
+    types: frozenset[int] | None = None
+    # Start of the value, compared case-insensitively
+    prefix: str = ""
+    # Pattern searched in the casefolded value
+    pattern: re.Pattern[str] | None = None
+    # First and last 1-based line, both included; None leaves that end open
+    first_line: int | None = None
+    last_line: int | None = None
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether the filter keeps every token."""
+        return (
+            self.types is None and not self.prefix and self.pattern is None
+            and self.first_line is None and self.last_line is None
+        )
+
+
+class TokenIndex:
+    """Row buckets by type and by value of a snapshot of a document.
+
+    The index reads the lines it is built from but never changes them, and
+    the committed lines of a ``DocumentLexer`` are never changed either
+    (edits replace them), so it can be built on a worker thread from
+    ``iter_entries``.
+    """
+
+    def __init__(self, lines: Iterable[LineEntry]) -> None:
+        """Build the index of a document's lines.
+
+        Args:
+            lines: Lexed lines of the document, in order
+        """
+        # line_rows[i] is the row of the first token of line i; the last
+        # element is the total number of rows
+        self.line_rows = array('I', [0])
+        self.type_ids = array('B')
+        self.by_type = [array('I') for _ in TOKEN_TYPES]
+        self.by_value: dict[str, array] = {}
+
+        row = 0
+        by_type = self.by_type
+        by_value = self.by_value
+        type_ids = self.type_ids
+        for entry in lines:
+            text = entry.text
+            for start, end, type_id in entry.spans or ():
+                type_ids.append(type_id)
+                by_type[type_id].append(row)
+                key = text[start:end].casefold()
+                rows = by_value.get(key)
+                if rows is None:
+                    rows = by_value[key] = array('I')
+                rows.append(row)
+                row += 1
+            self.line_rows.append(row)
+
+        self.values = sorted(by_value)
+
+    @classmethod
+    def from_document(cls, document: DocumentLexer) -> TokenIndex:
+        """Build the index of the committed state of a document."""
+        return cls(document.iter_entries())
+
+    def __len__(self) -> int:
+        return self.line_rows[-1]
+
+    def _row_bounds(self, token_filter: TokenFilter) -> tuple[int, int]:
+        """Return the range of rows on the filter's lines."""
+        line_count = len(self.line_rows) - 1
+        first = max(token_filter.first_line or 1, 1)
+        last = min(token_filter.last_line or line_count, line_count)
+        if first > last:
+            return 0, 0
+        return self.line_rows[first - 1], self.line_rows[last]
+
+    def matching_values(self, prefix: str = "", pattern: re.Pattern[str] | None = None) -> list[str]:
+        """Return the casefolded values that start with a prefix and match a pattern.
+
+        Args:
+            prefix: Start of the values
+            pattern: Pattern searched in the values
+
+        Returns:
+            The matching values, in sorted order
+        """
+        values = self.values
+        prefix = prefix.casefold()
+        lo = bisect_left(values, prefix)
+        hi = bisect_left(values, prefix + '\U0010ffff', lo) if prefix else len(values)
+        if pattern is None:
+            return values[lo:hi]
+        return [value for value in values[lo:hi] if pattern.search(value)]
+
+    def select(self, token_filter: TokenFilter) -> Sequence[int]:
+        """Return the rows that pass a filter.
+
+        Args:
+            token_filter: Criteria of the search
+
+        Returns:
+            The matching rows, in ascending order
+        """
+        lo, hi = self._row_bounds(token_filter)
+        if token_filter.prefix or token_filter.pattern is not None:
+            buckets = [self.by_value[value] for value in self.matching_values(token_filter.prefix, token_filter.pattern)]
+        elif token_filter.types is not None:
+            buckets = [self.by_type[type_id] for type_id in sorted(token_filter.types)]
+        else:
+            return range(lo, hi)
+
+        # Buckets are sorted, so the rows on the filter's lines are a slice of each
+        runs = [bucket[bisect_left(bucket, lo):bisect_left(bucket, hi)] for bucket in buckets]
+        if len(runs) == 1:
+            rows = runs[0]
+        else:
+            # Sorting a concatenation of sorted runs is close to linear
+            rows = array('I', sorted(chain.from_iterable(runs)))
+
+        types = token_filter.types
+        if types is not None and (token_filter.prefix or token_filter.pattern is not None):
+            type_ids = self.type_ids
+            rows = array('I', [row for row in rows if type_ids[row] in types])
+        return rows
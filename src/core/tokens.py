@@ -0,0 +1,230 @@
+"""Token types and columnar token storage for the 8086 assembly lexer."""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, NamedTuple, overload
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+
+    from pydantic import BaseModel
+
+    class Token(BaseModel):
+        """Represents a lexical token with its value, type, and line number."""
+
+        value: str
+        type: str
+        line: int
+
+
+@lru_cache(maxsize=None)
+def token_model() -> type[Token]:
+    """Return the ``Token`` model, importing pydantic on first use.
+
+    Tokens are stored as ``TokenStream`` columns and ``TokenRow`` tuples;
+    the pydantic model is only needed by the ``Token``-returning APIs, so
+    importing the lexer does not import pydantic.
+
+    Returns:
+        The ``Token`` class, the same one every call
+    """
+    from pydantic import BaseModel
+
+    class Token(BaseModel):
+        """Represents a lexical token with its value, type, and line number."""
+
+        value: str
+        type: str
+        line: int
+
+    # Named as a module-level class, so ``tokens.Token`` pickles and prints as one
+    Token.__module__ = __name__
+    Token.__qualname__ = "Token"
+    return Token
+
+
+def __getattr__(name: str) -> Any:
+    if name == "Token":
+        return token_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Token type names, indexed by the small-int ids stored in a TokenStream
+TOKEN_TYPES: tuple[str, ...] = (
+    "INSTRUCCIÓN",
+    "REGISTRO",
+    "TIPO_DATO",
+    "CONSTANTE_HEX",
+    "CONSTANTE_BIN",
+    "CONSTANTE_DEC",
+    "CONSTANTE_STR",
+    "PSEUDOINSTRUCCIÓN",
+    "SÍMBOLO",
+    "SEPARADOR",
+    "OPERADOR_COMPUESTO",
+)
+
+TYPE_IDS: dict[str, int] = {name: type_id for type_id, name in enumerate(TOKEN_TYPES)}
+
+
+class TokenRow(NamedTuple):
+    """Lightweight, immutable view of a single token."""
+
+    value: str
+    type: str
+    line: int
+    column: int
+
+
+class TokenStream:
+    """Tokens stored as parallel compact arrays over the original source.
+
+    Each token is described by its ``[start, end)`` offsets into ``source``,
+    a type id from ``TOKEN_TYPES``, its 1-based line and its 0-based column in
+    that line. Values are only sliced out of the source when requested, and
+    ``Token`` objects are only built when the stream is used as a sequence.
+    """
+
+    __slots__ = ("source", "starts", "ends", "type_ids", "lines", "columns")
+
+    def __init__(self, source: str) -> None:
+        """Initialize an empty stream over the given source.
+
+        Args:
+            source: The source code the token offsets refer to
+        """
+        self.source = source
+        self.starts = array('Q')
+        self.ends = array('Q')
+        self.type_ids = array('B')
+        self.lines = array('I')
+        self.columns = array('I')
+
+    @classmethod
+    def from_buffers(
+        cls,
+        source: str,
+        starts: Sequence[int],
+        ends: Sequence[int],
+        type_ids: Sequence[int],
+        lines: Sequence[int],
+        columns: Sequence[int],
+    ) -> TokenStream:
+        """Build a read-only stream over existing columns.
+
+        The columns can be any indexable buffers, such as memoryviews cast
+        over a memory-mapped file, and are used without being copied.
+
+        Args:
+            source: The source code the token offsets refer to
+            starts: Start offset of each token
+            ends: End offset of each token
+            type_ids: Type id of each token
+            lines: 1-based line of each token
+            columns: 0-based column of each token
+
+        Returns:
+            A stream backed by the given columns
+        """
+        stream = cls.__new__(cls)
+        stream.source = source
+        stream.starts = starts
+        stream.ends = ends
+        stream.type_ids = type_ids
+        stream.lines = lines
+        stream.columns = columns
+        return stream
+
+    def append(self, start: int, end: int, type_id: int, line: int, column: int) -> None:
+        """Append a token to the stream.
+
+        Args:
+            start: Offset of the first character of the token in the source
+            end: Offset one past the last character of the token
+            type_id: Index of the token type in ``TOKEN_TYPES``
+            line: 1-based line number in the original source
+            column: 0-based column of the token in its line
+        """
+        self.starts.append(start)
+        self.ends.append(end)
+        self.type_ids.append(type_id)
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def value(self, index: int) -> str:
+        """Return the source text of the token at ``index``."""
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def type_id(self, index: int) -> int:
+        """Return the type id of the token at ``index``."""
+        return self.type_ids[index]
+
+    def type_name(self, index: int) -> str:
+        """Return the type name of the token at ``index``."""
+        return TOKEN_TYPES[self.type_ids[index]]
+
+    def line(self, index: int) -> int:
+        """Return the 1-based line of the token at ``index``."""
+        return self.lines[index]
+
+    def column(self, index: int) -> int:
+        """Return the 0-based column of the token at ``index``."""
+        return self.columns[index]
+
+    def first_row_for_line(self, line: int) -> int | None:
+        """Return the index of the first token on a line.
+
+        Args:
+            line: 1-based line number
+
+        Returns:
+            The index of the line's first token, or None if the line has none
+        """
+        index = bisect_left(self.lines, line)
+        return index if index < len(self.lines) and self.lines[index] == line else None
+
+    def rows(self) -> Iterator[TokenRow]:
+        """Iterate over the tokens as lightweight ``TokenRow`` tuples.
+
+        Yields:
+            TokenRow: The value, type, line and column of each token
+        """
+        source = self.source
+        for start, end, type_id, line, column in zip(
+            self.starts, self.ends, self.type_ids, self.lines, self.columns
+        ):
+            yield TokenRow(source[start:end], TOKEN_TYPES[type_id], line, column)
+
+    def _token(self, index: int) -> Token:
+        """Build the ``Token`` model for the token at ``index``."""
+        return token_model()(
+            value=self.source[self.starts[index]:self.ends[index]],
+            type=TOKEN_TYPES[self.type_ids[index]],
+            line=self.lines[index],
+        )
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @overload
+    def __getitem__(self, index: int) -> Token: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Token]: ...
+
+    def __getitem__(self, index: int | slice) -> Token | list[Token]:
+        if isinstance(index, slice):
+            return [self._token(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("token index out of range")
+        return self._token(index)
+
+    def __iter__(self) -> Iterator[Token]:
+        Token = token_model()
+        for value, type_name, line, _ in self.rows():
+            yield Token(value=value, type=type_name, line=line)
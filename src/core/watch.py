@@ -0,0 +1,394 @@
+"""Watching a directory of assembly files and re-analyzing what changes.
+
+A watcher reports the files of a tree that were created, modified or
+deleted. ``InotifyWatcher`` uses Linux inotify through ``ctypes``;
+``PollingWatcher`` compares the modification time and size of every file
+between scans and works anywhere. ``create_watcher`` picks the first that
+is available.
+
+``WatchSession`` keeps the tokens, include graph and results of every file
+in memory between passes. A pass only lexes the files that changed and
+re-checks the files including them, and can assemble and run programs in
+the emulator so each save gets its output back.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from collections import Counter
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Protocol
+
+from .assembler import Assembler, AssemblerError
+from .batch import FileResult
+from .defaults import DEFAULT_PATTERNS, WATCH_MAX_INSTRUCTIONS
+from .emulator import EmulatorError, run_com
+from .includes import IncludeCycleError, IncludeGraph, IncludeResolver
+from .tokens import TOKEN_TYPES
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# Time to wait for more events after the first one, as editors save in steps
+SETTLE_SECONDS = 0.05
+
+# inotify event masks, from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class Watcher(Protocol):
+    """Reports the files of a tree that changed since the last call."""
+
+    root: Path
+
+    def files(self) -> list[Path]:
+        """Return the watched files that currently exist."""
+        ...
+
+    def changes(self, timeout: float | None = None) -> set[Path]:
+        """Wait for files to be created, modified or deleted.
+
+        Args:
+            timeout: Seconds to wait; None waits until something changes
+
+        Returns:
+            The changed files, empty if the timeout expired first
+        """
+        ...
+
+    def close(self) -> None:
+        """Release the resources of the watcher."""
+        ...
+
+
+def _matches(name: str, patterns: tuple[str, ...]) -> bool:
+    return any(fnmatch(name, pattern) for pattern in patterns)
+
+
+def _scan(root: Path, patterns: tuple[str, ...]) -> dict[Path, tuple[int, int]]:
+    """Return the modification time and size of every matching file of a tree."""
+    found: dict[Path, tuple[int, int]] = {}
+    pending = [root]
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(Path(entry.path))
+                elif _matches(entry.name, patterns):
+                    stat = entry.stat()
+                    found[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                continue
+    return found
+
+
+class PollingWatcher:
+    """Finds changes by comparing the modification time and size of files between scans."""
+
+    def __init__(self, root: str | Path, patterns: Iterable[str] = DEFAULT_PATTERNS, interval: float = 0.5) -> None:
+        """Take the first snapshot of a tree.
+
+        Args:
+            root: Directory to watch, recursively
+            patterns: Patterns of the file names to watch
+            interval: Seconds between scans
+        """
+        self.root = Path(root).resolve()
+        self.patterns = tuple(patterns)
+        self.interval = interval
+        self._snapshot = _scan(self.root, self.patterns)
+
+    def files(self) -> list[Path]:
+        return sorted(self._snapshot)
+
+    def changes(self, timeout: float | None = None) -> set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = _scan(self.root, self.patterns)
+            changed = {
+                path for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            wait = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            time.sleep(max(wait, 0))
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Finds changes with Linux inotify, watching every directory of the tree."""
+
+    def __init__(self, root: str | Path, patterns: Iterable[str] = DEFAULT_PATTERNS) -> None:
+        """Start watching a tree.
+
+        Args:
+            root: Directory to watch, recursively
+            patterns: Patterns of the file names to watch
+
+        Raises:
+            OSError: If inotify is not available
+        """
+        path = ctypes.util.find_library("c")
+        if path is None or not hasattr(os, "O_NONBLOCK"):
+            raise OSError("inotify is not available")
+        libc = ctypes.CDLL(path, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.root = Path(root).resolve()
+        self.patterns = tuple(patterns)
+        self._directories: dict[int, Path] = {}
+        self._files: set[Path] = set()
+        self._add_tree(self.root)
+
+    def _add_tree(self, directory: Path) -> set[Path]:
+        """Watch a directory and its subdirectories; return the files found in them."""
+        found = set()
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(current), _WATCH_MASK)
+            if descriptor < 0:
+                continue
+            self._directories[descriptor] = current
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(Path(entry.path))
+                elif _matches(entry.name, self.patterns):
+                    found.add(Path(entry.path))
+        self._files |= found
+        return found
+
+    def files(self) -> list[Path]:
+        return sorted(self._files)
+
+    def changes(self, timeout: float | None = None) -> set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed: set[Path] = set()
+        while not changed:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not select.select([self._fd], [], [], remaining)[0]:
+                return changed
+            changed = self._read_events()
+        # Keep collecting until the events stop, so one save is one pass
+        while select.select([self._fd], [], [], SETTLE_SECONDS)[0]:
+            changed |= self._read_events()
+        return changed
+
+    def _read_events(self) -> set[Path]:
+        """Read the pending events and return the files they concern."""
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += _EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost; report everything and start over
+                changed |= self._files
+                self._files = set()
+                changed |= self._add_tree(self.root)
+                continue
+            directory = self._directories.get(descriptor)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._directories[descriptor]
+                continue
+            if not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed |= self._add_tree(path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    gone = {file for file in self._files if path in file.parents}
+                    self._files -= gone
+                    changed |= gone
+                continue
+            if not _matches(path.name, self.patterns):
+                continue
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                self._files.discard(path)
+            else:
+                self._files.add(path)
+            changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(
+    root: str | Path, patterns: Iterable[str] = DEFAULT_PATTERNS, polling: bool = False, interval: float = 0.5
+) -> Watcher:
+    """Create an inotify watcher, or a polling one where inotify is missing.
+
+    Args:
+        root: Directory to watch, recursively
+        patterns: Patterns of the file names to watch
+        polling: Always poll, e.g. for network file systems inotify misses
+        interval: Seconds between scans when polling
+
+    Returns:
+        The watcher
+    """
+    if not polling:
+        try:
+            return InotifyWatcher(root, patterns)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root, patterns, interval)
+
+
+class ProgramRun(NamedTuple):
+    """Outcome of assembling and running a program in a watch pass."""
+
+    status: str
+    exit_code: int | None
+    instructions: int
+    output: bytes
+    error: str | None = None
+
+
+class WatchResult(NamedTuple):
+    """Result of one file in a watch pass."""
+
+    lex: FileResult
+    run: ProgramRun | None = None
+
+
+class WatchPass(NamedTuple):
+    """What a watch pass did."""
+
+    results: list[WatchResult]
+    removed: list[Path]
+    seconds: float
+
+
+class WatchSession:
+    """Results of a tree of files, kept up to date one change set at a time."""
+
+    def __init__(
+        self,
+        include_paths: Iterable[str | Path] = (),
+        run: bool = False,
+        max_instructions: int = WATCH_MAX_INSTRUCTIONS,
+    ) -> None:
+        """Initialize an empty session.
+
+        Args:
+            include_paths: Directories searched for included files after
+                each file's own
+            run: Also assemble ``.asm`` files and run them in the emulator
+            max_instructions: Instruction budget of each run
+        """
+        self.resolver = IncludeResolver(include_paths)
+        self.assembler = Assembler(resolver=self.resolver)
+        self.run = run
+        self.max_instructions = max_instructions
+        self.results: dict[Path, WatchResult] = {}
+        # What each file included the last time it was analyzed
+        self.graph = IncludeGraph()
+
+    def update(self, changed: Iterable[str | Path]) -> WatchPass:
+        """Re-analyze changed files and every file that includes them.
+
+        Args:
+            changed: Files created, modified or deleted since the last pass;
+                on the first pass, every file to watch
+
+        Returns:
+            The new results and the files that were removed
+        """
+        start = time.perf_counter()
+        changed = {Path(path).resolve() for path in changed}
+        affected = set(changed)
+        for path in changed:
+            affected |= self.graph.dependents(path)
+
+        removed = []
+        results = []
+        for path in sorted(affected):
+            if not path.is_file():
+                if self.results.pop(path, None) is not None:
+                    removed.append(path)
+                self.graph.edges.pop(path, None)
+                self.resolver.forget(path)
+                continue
+            result = self.results[path] = self._analyze(path)
+            results.append(result)
+        # Tokens of earlier versions of the files would otherwise pile up
+        self.resolver.prune()
+        return WatchPass(results, removed, time.perf_counter() - start)
+
+    def _analyze(self, path: Path) -> WatchResult:
+        """Lex a file, record what it includes and optionally run it."""
+        start = time.perf_counter()
+        try:
+            lexed = self.resolver.load(path)
+        except (OSError, UnicodeDecodeError) as e:
+            return WatchResult(FileResult(str(path), 0, {}, time.perf_counter() - start, str(e)))
+        self.graph.edges[path] = [
+            target for directive in lexed.directives
+            if (target := self.resolver.resolve(directive.target, path)) is not None
+        ]
+        types = {TOKEN_TYPES[type_id]: count for type_id, count in Counter(lexed.stream.type_ids).items()}
+        lex = FileResult(str(path), len(lexed.stream), types, time.perf_counter() - start)
+        if not self.run or path.suffix.lower() != ".asm":
+            return WatchResult(lex)
+        return WatchResult(lex, self._run(path))
+
+    def _run(self, path: Path) -> ProgramRun:
+        """Assemble a program and run it with no input."""
+        try:
+            image = self.assembler.assemble_file(path).image
+            result, output = run_com(image, max_instructions=self.max_instructions)
+        except (AssemblerError, EmulatorError, IncludeCycleError) as e:
+            return ProgramRun("error", None, 0, b"", str(e))
+        return ProgramRun(result.status, result.exit_code, result.instructions, output)
@@ -1,41 +1,91 @@
 """Main entry point for the assembler lexer analyzer application.
 
 This module initializes and runs the main application window.
+
+Set ``SOME_ASM_STARTUP_TIMING=1`` to print how long each startup step took,
+up to the first paint of the window, to stderr.
 """
 
+import os
 import sys
+import time
 from pathlib import Path
 
+_STARTED = time.perf_counter()
+
+from PyQt6.QtCore import QEvent, QObject, QTimer
 from PyQt6.QtWidgets import QApplication
-from rich.console import Console
-from rich.text import Text
 
 # Add the src directory to Python path to allow imports
 sys.path.insert(0, str(Path(__file__).parent))
 
 from ui.main_window import MainWindow
 
+# Environment variable that enables the startup timing report
+STARTUP_TIMING_ENV = "SOME_ASM_STARTUP_TIMING"
+
+
+class StartupTimer(QObject):
+    """Records startup steps and reports them once the window is first painted."""
+
+    def __init__(self, enabled: bool):
+        super().__init__()
+        self.enabled = enabled
+        self.marks = [("imports", time.perf_counter())]
+
+    def mark(self, step: str) -> None:
+        """Record the end of a startup step."""
+        self.marks.append((step, time.perf_counter()))
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.Paint:
+            watched.removeEventFilter(self)
+            self.mark("first paint")
+            if self.enabled:
+                self.report()
+        return False
+
+    def report(self) -> None:
+        """Print each step's duration and the total to stderr."""
+        previous = _STARTED
+        for step, moment in self.marks:
+            print(f"{step:>12}: {(moment - previous) * 1000:8.1f} ms", file=sys.stderr)
+            previous = moment
+        print(f"{'total':>12}: {(previous - _STARTED) * 1000:8.1f} ms", file=sys.stderr)
+
+
+def print_banner() -> None:
+    """Print the project name in blue and the version in green italic."""
+    # rich is only needed here, so it is imported once the window is up
+    from rich.console import Console
+    from rich.text import Text
 
-def main() -> None:
-    """Main entry point of the application."""
-    # Print project name in blue and version in green italic
-    console = Console()
     output = Text()
     output.append("some-asm", style="blue")
     output.append(" ")
     output.append("v0.1.0", style="green italic")
-    console.print(output)
+    Console().print(output)
+
+
+def main() -> None:
+    """Main entry point of the application."""
+    timer = StartupTimer(os.environ.get(STARTUP_TIMING_ENV, "") not in ("", "0"))
 
     # Initialize Qt application
     app = QApplication(sys.argv)
-    
+    timer.mark("application")
+
     # Create and show the main window
     window = MainWindow()
+    timer.mark("window")
+    window.installEventFilter(timer)
     window.show()
-    
+    timer.mark("show")
+    QTimer.singleShot(0, print_banner)
+
     # Execute the application
     sys.exit(app.exec())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,239 @@
+"""Background analysis for the assembler lexer analyzer.
+
+This module contains the AnalysisScheduler class that debounces analysis
+requests from the editor and lexes dirty lines on a worker thread, the
+BackgroundRunner class that runs other work off the UI thread, and the
+TokenIndexer class that builds the token table's search index with it.
+"""
+
+from __future__ import annotations
+
+import traceback
+from typing import TYPE_CHECKING, Any
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+import sys
+from pathlib import Path
+# Add the src directory to the Python path so we can import from core
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path))
+
+from core.incremental import DocumentLexer, LineEntry, RowChange
+from core.token_index import TokenIndex
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class _AnalysisSignals(QObject):
+    """Signals emitted by an analysis task back to the UI thread."""
+
+    finished = pyqtSignal(int)
+
+
+class _AnalysisTask(QRunnable):
+    """Lexes a snapshot of dirty lines on a thread pool."""
+
+    def __init__(self, generation: int, document_lexer: DocumentLexer, entries: list[LineEntry]):
+        super().__init__()
+        self.generation = generation
+        self.tokenize_line = document_lexer.lexer.tokenize_line
+        # Edits replace entries rather than change their text, so the list is
+        # safe to read from the worker
+        self.entries = entries
+        self.signals = _AnalysisSignals()
+
+    def run(self) -> None:
+        # For the same reason an entry's spans can be stored from here, even
+        # if the result is superseded
+        tokenize_line = self.tokenize_line
+        try:
+            for entry in self.entries:
+                entry.spans = tokenize_line(entry.text)
+        except Exception:
+            # Lines left unlexed commit without tokens; reporting back still
+            # matters, as the view waits for the commit
+            traceback.print_exc()
+        try:
+            self.signals.finished.emit(self.generation)
+        except RuntimeError:
+            # The application quit while the lines were lexed
+            pass
+
+
+class AnalysisScheduler(QObject):
+    """Debounces analysis requests and runs them off the UI thread.
+
+    Every request bumps a generation counter and restarts the debounce timer,
+    so a burst of edits results in a single analysis. Workers store the
+    tokens of each line on its entry, and the document is only committed
+    when the worker of the latest request finishes; lines lexed by a
+    superseded worker are simply skipped by the next one.
+    """
+
+    analyzed = pyqtSignal(object)
+
+    def __init__(
+        self,
+        document_lexer: DocumentLexer,
+        debounce_ms: int = 150,
+        parent: QObject | None = None,
+        commit: Callable[[], RowChange] | None = None,
+    ):
+        super().__init__(parent)
+        self.document_lexer = document_lexer
+        # Commits the document; a table model passes its own, so its views
+        # hear about the change around it
+        self.commit = commit if commit is not None else document_lexer.commit
+        self.generation = 0
+        self.thread_pool = QThreadPool.globalInstance()
+        self._tasks: dict[QObject, _AnalysisTask] = {}
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self._start)
+
+    @property
+    def debounce_ms(self) -> int:
+        """Delay, in milliseconds, between the last request and the analysis."""
+        return self._timer.interval()
+
+    @debounce_ms.setter
+    def debounce_ms(self, value: int) -> None:
+        self._timer.setInterval(value)
+
+    def schedule(self) -> None:
+        """Request an analysis once edits stop arriving for ``debounce_ms``."""
+        self.generation += 1
+        self._timer.start()
+
+    def run_now(self) -> None:
+        """Request an analysis without waiting for the debounce delay."""
+        self.generation += 1
+        self._timer.stop()
+        self._start()
+
+    def cancel(self) -> None:
+        """Drop the pending and running analyses, if any."""
+        self.generation += 1
+        self._timer.stop()
+
+    def _start(self) -> None:
+        """Hand the current dirty lines to a worker."""
+        task = _AnalysisTask(self.generation, self.document_lexer, self.document_lexer.dirty_entries())
+        task.signals.finished.connect(self._on_finished)
+        # Keep the task (and its signals object) alive until it reports back
+        task.setAutoDelete(False)
+        self._tasks[task.signals] = task
+        self.thread_pool.start(task)
+
+    def _on_finished(self, generation: int) -> None:
+        """Commit a worker's lines unless a newer request superseded them."""
+        self._tasks.pop(self.sender(), None)
+        if generation != self.generation:
+            return
+
+        self.analyzed.emit(self.commit())
+
+
+class _TaskSignals(QObject):
+    """Signals emitted by a background task back to the UI thread."""
+
+    # Generation, result, and the exception raised instead, if any
+    finished = pyqtSignal(int, object, object)
+
+
+class _Task(QRunnable):
+    """Calls a function on a thread pool and reports its result or exception."""
+
+    def __init__(self, generation: int, function: Callable[..., Any], args: tuple[Any, ...]):
+        super().__init__()
+        self.generation = generation
+        self.function = function
+        self.args = args
+        self.signals = _TaskSignals()
+
+    def run(self) -> None:
+        result = error = None
+        try:
+            result = self.function(*self.args)
+        except Exception as e:
+            # An exception must not escape into the thread pool; the traceback
+            # is dropped so it doesn't keep the worker's frames alive
+            traceback.print_exc()
+            error = e.with_traceback(None)
+        try:
+            self.signals.finished.emit(self.generation, result, error)
+        except RuntimeError:
+            # The application quit while the function ran
+            pass
+
+
+class BackgroundRunner(QObject):
+    """Runs functions off the UI thread, reporting only the latest result.
+
+    Every ``run`` supersedes the previous ones, so a result is only
+    reported if nothing was run after it: with ``finished``, or with
+    ``failed`` if the function raised. Functions must only read data the
+    UI thread does not change, such as a ``DocumentLexer`` snapshot.
+    """
+
+    finished = pyqtSignal(object)
+    # The exception the latest function raised
+    failed = pyqtSignal(object)
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self.generation = 0
+        self.thread_pool = QThreadPool.globalInstance()
+        self._tasks: dict[QObject, _Task] = {}
+
+    @property
+    def busy(self) -> bool:
+        """Whether the latest function is still running."""
+        return any(task.generation == self.generation for task in self._tasks.values())
+
+    def run(self, function: Callable[..., Any], *args: Any) -> None:
+        """Call a function on a worker and report its result with ``finished``."""
+        self.generation += 1
+        task = _Task(self.generation, function, args)
+        task.signals.finished.connect(self._on_finished)
+        # Keep the task (and its signals object) alive until it reports back
+        task.setAutoDelete(False)
+        self._tasks[task.signals] = task
+        self.thread_pool.start(task)
+
+    def cancel(self) -> None:
+        """Drop the result of the running function, if any."""
+        self.generation += 1
+
+    def _on_finished(self, generation: int, result: object, error: Exception | None) -> None:
+        """Report a worker's result or exception unless a newer run superseded it."""
+        self._tasks.pop(self.sender(), None)
+        if generation != self.generation:
+            return
+        if error is not None:
+            self.failed.emit(error)
+        else:
+            self.finished.emit(result)
+
+
+class TokenIndexer(BackgroundRunner):
+    """Builds token indexes off the UI thread, reporting only the latest one.
+
+    Every ``rebuild`` supersedes the previous ones, so an index is only
+    reported with ``finished`` if the document was not committed again while
+    it was built.
+    """
+
+    def __init__(self, document_lexer: DocumentLexer, parent: QObject | None = None):
+        super().__init__(parent)
+        self.document_lexer = document_lexer
+
+    def rebuild(self) -> None:
+        """Index the committed state of the document on a worker."""
+        # Committed lines are replaced rather than changed, so they are safe
+        # to read from the worker
+        self.run(TokenIndex, self.document_lexer.iter_entries())
@@ -0,0 +1,121 @@
+"""Filter bar for the token table.
+
+This module contains the TokenFilterBar class that turns the user's type,
+value and line-range criteria into a TokenFilter for the token table.
+"""
+
+from __future__ import annotations
+
+import re
+
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import QCheckBox, QComboBox, QHBoxLayout, QLabel, QLineEdit, QSpinBox, QWidget
+
+import sys
+from pathlib import Path
+# Add the src directory to the Python path so we can import from core
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path))
+
+from core.token_index import TokenFilter
+from core.tokens import TOKEN_TYPES
+
+
+class TokenFilterBar(QWidget):
+    """Row of controls that filter the token table by type, value and lines.
+
+    The value box matches a prefix of each token, or a regular expression
+    when "Regex" is checked; both ignore case. A line bound of zero leaves
+    that end of the range open. Every change emits ``filter_changed`` with
+    the new filter, or None when nothing is filtered.
+    """
+
+    # The new TokenFilter, or None to show every token
+    filter_changed = pyqtSignal(object)
+
+    # Highest line number the range boxes accept
+    MAX_LINE = 99_999_999
+
+    def __init__(self, parent: QWidget | None = None):
+        super().__init__(parent)
+
+        self.type_box = QComboBox()
+        self.type_box.addItem("Todos los tipos", None)
+        for type_id, name in enumerate(TOKEN_TYPES):
+            self.type_box.addItem(name, type_id)
+
+        self.value_box = QLineEdit()
+        self.value_box.setPlaceholderText("Filtrar por valor...")
+        self.value_box.setClearButtonEnabled(True)
+        self.regex_box = QCheckBox("Regex")
+
+        # Zero shows as a dash and leaves that end of the range open
+        self.first_line_box = self._line_box()
+        self.last_line_box = self._line_box()
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.type_box)
+        layout.addWidget(self.value_box, 1)
+        layout.addWidget(self.regex_box)
+        layout.addWidget(QLabel("Líneas"))
+        layout.addWidget(self.first_line_box)
+        layout.addWidget(QLabel("a"))
+        layout.addWidget(self.last_line_box)
+
+        self.type_box.currentIndexChanged.connect(self._emit_filter)
+        self.value_box.textChanged.connect(self._emit_filter)
+        self.regex_box.toggled.connect(self._emit_filter)
+        self.first_line_box.valueChanged.connect(self._emit_filter)
+        self.last_line_box.valueChanged.connect(self._emit_filter)
+
+    def _line_box(self) -> QSpinBox:
+        """Create a line bound box where zero means unbounded."""
+        box = QSpinBox()
+        box.setRange(0, self.MAX_LINE)
+        box.setSpecialValueText("—")
+        return box
+
+    def token_filter(self) -> TokenFilter | None:
+        """Return the filter the controls describe.
+
+        Returns:
+            The filter, or None when it keeps every token
+
+        Raises:
+            re.error: If the value is not a valid regular expression
+        """
+        type_id = self.type_box.currentData()
+        value = self.value_box.text()
+        pattern = None
+        if self.regex_box.isChecked() and value:
+            pattern = re.compile(value, re.IGNORECASE)
+            value = ""
+
+        token_filter = TokenFilter(
+            types=frozenset({type_id}) if type_id is not None else None,
+            prefix=value,
+            pattern=pattern,
+            first_line=self.first_line_box.value() or None,
+            last_line=self.last_line_box.value() or None,
+        )
+        return None if token_filter.is_empty else token_filter
+
+    def set_error(self, message: str | None) -> None:
+        """Flag the value box with an error message, or clear the flag with None."""
+        if message is None:
+            self.value_box.setStyleSheet("")
+            self.value_box.setToolTip("")
+            return
+        self.value_box.setStyleSheet("border: 1px solid #f38ba8;")  # red from Catppuccin
+        self.value_box.setToolTip(message)
+
+    def _emit_filter(self) -> None:
+        """Emit the current filter, or flag the value box if its pattern is invalid."""
+        try:
+            token_filter = self.token_filter()
+        except re.error as e:
+            self.set_error(f"Expresión regular no válida: {e}")
+            return
+        self.set_error(None)
+        self.filter_changed.emit(token_filter)
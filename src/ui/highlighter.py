@@ -0,0 +1,118 @@
+"""Syntax highlighting for the assembler source editor.
+
+This module contains the AsmHighlighter class that colours the editor with
+the lexer's token types, using the same palette as the results table.
+"""
+
+from __future__ import annotations
+
+from PyQt6.QtCore import QPoint, QTimer
+from PyQt6.QtGui import QColor, QSyntaxHighlighter, QTextBlock, QTextCharFormat
+from PyQt6.QtWidgets import QPlainTextEdit
+
+import sys
+from pathlib import Path
+# Add the src directory to the Python path so we can import from core
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path))
+
+from core.lexer import Lexer
+from core.tokens import TOKEN_TYPES
+from ui.token_model import TOKEN_COLORS
+
+
+class AsmHighlighter(QSyntaxHighlighter):
+    """Highlighter that lexes one block at a time and skips off-screen blocks.
+
+    Tokens never span line breaks, so every block is highlighted on its own
+    and always ends in the same state. Qt therefore stops after the blocks an
+    edit touched instead of carrying on to the end of the document.
+
+    Blocks outside the viewport are left plain and marked ``PENDING``; they
+    are highlighted when scrolled into view. Loading a huge file only costs
+    a state check per block, and typing never lexes more than the edited
+    lines.
+
+    While ``suspended`` is set, every block is marked pending without even
+    looking it up, which keeps bulk inserts such as chunked file loading
+    cheap; ``highlight_visible`` catches up once it is cleared.
+    """
+
+    HIGHLIGHTED = 0
+    PENDING = 1
+
+    # Blocks above and below the viewport highlighted ahead of scrolling
+    MARGIN_BLOCKS = 50
+
+    def __init__(self, editor: QPlainTextEdit):
+        super().__init__(editor.document())
+        self.editor = editor
+        self.lexer = Lexer("")
+        self.suspended = False
+        self._formats: list[QTextCharFormat | None] = []
+        for name in TOKEN_TYPES:
+            if name in TOKEN_COLORS:
+                text_format = QTextCharFormat()
+                text_format.setForeground(QColor(TOKEN_COLORS[name]))
+                self._formats.append(text_format)
+            else:
+                self._formats.append(None)
+
+        # Block numbers in view, extended by the margin; refreshed on scroll
+        self._visible = (0, self.MARGIN_BLOCKS * 2)
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(0)
+        self._refresh_timer.timeout.connect(self.highlight_visible)
+
+        scroll_bar = editor.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self._refresh_timer.start)
+        scroll_bar.rangeChanged.connect(self._refresh_timer.start)
+        editor.document().contentsChange.connect(self._refresh_timer.start)
+
+    def _update_visible(self) -> None:
+        """Recompute the range of blocks to highlight from the viewport."""
+        viewport = self.editor.viewport()
+        first = self.editor.cursorForPosition(QPoint(0, 0)).blockNumber()
+        last = self.editor.cursorForPosition(QPoint(0, viewport.height())).blockNumber()
+        self._visible = (max(first - self.MARGIN_BLOCKS, 0), last + self.MARGIN_BLOCKS)
+
+    def highlight_visible(self) -> None:
+        """Highlight the pending blocks that are in or near the viewport."""
+        if self.suspended:
+            return
+        self._update_visible()
+        first, last = self._visible
+        block = self.document().findBlockByNumber(first)
+        while block.isValid() and block.blockNumber() <= last:
+            if block.userState() != self.HIGHLIGHTED:
+                self.rehighlightBlock(block)
+            block = block.next()
+
+    def highlightBlock(self, text: str | None) -> None:
+        if self.suspended:
+            self.setCurrentBlockState(self.PENDING)
+            return
+        block: QTextBlock = self.currentBlock()
+        first, last = self._visible
+        if not first <= block.blockNumber() <= last:
+            self.setCurrentBlockState(self.PENDING)
+            return
+
+        self.setCurrentBlockState(self.HIGHLIGHTED)
+        if not text:
+            return
+        spans = self.lexer.tokenize_line(text)
+        # Qt positions count UTF-16 code units, Python positions code points
+        offsets = None
+        if not text.isascii() and any(ord(char) > 0xFFFF for char in text):
+            offsets = [0]
+            for char in text:
+                offsets.append(offsets[-1] + (2 if ord(char) > 0xFFFF else 1))
+        for start, end, type_id in spans:
+            text_format = self._formats[type_id]
+            if text_format is None:
+                continue
+            if offsets is not None:
+                start, end = offsets[start], offsets[end]
+            self.setFormat(start, end - start, text_format)
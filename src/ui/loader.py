@@ -0,0 +1,174 @@
+"""Chunked loading of large files into the editor.
+
+This module contains the ChunkedFileLoader class that reads a file on a
+worker thread and hands it to the UI thread a few lines at a time, so the
+window keeps painting and taking input while a huge file loads, and the
+CollectorPause class that keeps the garbage collector out of the way while
+it does.
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import queue
+import threading
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+
+class CollectorPause:
+    """Keeps Python's cyclic garbage collector off while any pause is held.
+
+    A full collection walks every tracked object, and a large file adds
+    millions of them, so collections while one loads stall the UI for
+    seconds each. Pauses of several tabs nest, and the collector's previous
+    state is restored when the last one is released.
+
+    The objects allocated during a pause are then collected in one full
+    pass; left to the collector, they would be walked once per generation
+    as they are promoted.
+    """
+
+    _held = 0
+    _was_enabled = True
+
+    def __init__(self):
+        self.active = False
+
+    def acquire(self) -> None:
+        """Turn the collector off, unless this pause already did."""
+        if self.active:
+            return
+        self.active = True
+        if CollectorPause._held == 0:
+            CollectorPause._was_enabled = gc.isenabled()
+            gc.disable()
+        CollectorPause._held += 1
+
+    def release(self) -> None:
+        """Give the collector back once no pause is held; safe to call twice."""
+        if not self.active:
+            return
+        self.active = False
+        CollectorPause._held -= 1
+        if CollectorPause._held == 0 and CollectorPause._was_enabled:
+            gc.collect()
+            gc.enable()
+
+
+class ChunkedFileLoader(QObject):
+    """Reads a text file on a worker thread and emits it in line-aligned chunks.
+
+    The worker fills a small bounded queue and wakes the UI thread after
+    every chunk. There a zero-interval timer takes one chunk per tick, so
+    every chunk is followed by a pass through the event loop, and stops as
+    soon as the queue is empty rather than polling it. The queue bound keeps
+    the worker from reading far ahead of what the editor has inserted.
+    """
+
+    # A chunk of text, always ending at a line break except for the last one
+    chunk_ready = pyqtSignal(str)
+    # Percentage of the file's bytes handed over so far
+    progress = pyqtSignal(int)
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+    # Emitted from the worker after queueing an item; delivered on the UI thread
+    _queued = pyqtSignal()
+
+    # Characters read per chunk; small enough for the editor to insert in a frame or two
+    CHUNK_CHARS = 128 * 1024
+
+    # Chunks read ahead of the editor
+    QUEUE_CHUNKS = 16
+
+    def __init__(self, path: str | os.PathLike[str], encoding: str = 'utf-8', parent: QObject | None = None):
+        super().__init__(parent)
+        self.path = path
+        self.encoding = encoding
+        self._queue: queue.Queue[tuple[str, int] | BaseException | None] = queue.Queue(self.QUEUE_CHUNKS)
+        self._cancelled = threading.Event()
+        # A worker left blocked on a full queue would never exit otherwise
+        self.destroyed.connect(self._cancelled.set)
+        self._size = 0
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._drain)
+        self._queued.connect(self._wake)
+
+    def start(self) -> None:
+        """Start reading the file."""
+        try:
+            self._size = os.path.getsize(self.path)
+        except OSError as e:
+            self.failed.emit(str(e))
+            return
+        threading.Thread(target=self._read, name="chunked-file-loader", daemon=True).start()
+
+    def cancel(self) -> None:
+        """Stop reading; no more signals are emitted."""
+        self._cancelled.set()
+        self._timer.stop()
+
+    def _put(self, item: tuple[str, int] | BaseException | None) -> bool:
+        """Queue an item for the UI thread, giving up if the load is cancelled."""
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            try:
+                self._queued.emit()
+            except RuntimeError:
+                # The loader was deleted along with its tab
+                return False
+            return True
+        return False
+
+    def _read(self) -> None:
+        """Read the file in text mode, which also normalizes line breaks."""
+        try:
+            with open(self.path, 'r', encoding=self.encoding) as file:
+                carry = ""
+                while True:
+                    text = file.read(self.CHUNK_CHARS)
+                    if not text:
+                        break
+                    # Hold back the partial last line, so the editor only gets whole lines
+                    text = carry + text
+                    cut = text.rfind('\n') + 1
+                    carry = text[cut:]
+                    if cut and not self._put((text[:cut], file.buffer.tell())):
+                        return
+                if carry and not self._put((carry, self._size)):
+                    return
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(None)
+
+    def _wake(self) -> None:
+        """Resume draining once the worker has queued an item."""
+        if not self._cancelled.is_set() and not self._timer.isActive():
+            self._timer.start()
+
+    def _drain(self) -> None:
+        """Hand one chunk to the UI thread, or finish."""
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            # The worker wakes the timer again with its next item
+            self._timer.stop()
+            return
+        if item is None:
+            self._timer.stop()
+            self.progress.emit(100)
+            self.finished.emit()
+        elif isinstance(item, BaseException):
+            self._timer.stop()
+            self.failed.emit(str(item))
+        else:
+            text, position = item
+            self.chunk_ready.emit(text)
+            self.progress.emit(min(100, position * 100 // self._size) if self._size else 100)
@@ -1,267 +1,483 @@
 """Main window implementation for the assembler lexer analyzer.
 
 This module contains the MainWindow class that extends IngotApp to provide
-a graphical user interface for the assembler lexer analyzer.
+a graphical user interface for the assembler lexer analyzer. Every
+workspace tab is an AsmLexerView holding one document and its own token
+state.
 """
 
 from __future__ import annotations
 
+import re
+import weakref
 from pathlib import Path
-
-from PyQt6.QtWidgets import QFileDialog, QHeaderView, QSplitter, QTableWidget, QTableWidgetItem, QTextEdit, QVBoxLayout
-from PyQt6.QtCore import Qt
+from typing import TYPE_CHECKING
+
+from PyQt6.QtWidgets import (
+    QAbstractItemView, QFileDialog, QHeaderView, QInputDialog, QPlainTextEdit, QProgressBar, QScrollArea, QSplitter,
+    QTableView, QTextEdit, QVBoxLayout, QWidget,
+)
+from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QTextCharFormat, QTextCursor
 from ingot.app import IngotApp
 from ingot.views.base import BaseView
-from ingot.theming.manager import ThemeManager
 
 import sys
-from pathlib import Path
 # Add the src directory to the Python path so we can import from core
 src_path = Path(__file__).parent.parent
 sys.path.insert(0, str(src_path))
 
-from core.lexer import Lexer, Token
+from core.cache import TokenCache
+from core.incremental import DocumentLexer, RowChange
+from ui.analysis import AnalysisScheduler, BackgroundRunner, TokenIndexer
+from ui.filter_bar import TokenFilterBar
+from ui.highlighter import AsmHighlighter
+from ui.loader import ChunkedFileLoader, CollectorPause
+from ui.theme import THEME_PATH, compiled_theme
+from ui.token_model import TokenTableModel
+
+if TYPE_CHECKING:
+    from core.symbols import SymbolDefinition, SymbolIndex, SymbolReference
+    from core.token_index import TokenFilter, TokenIndex
+
+# A symbol name as the symbol index reads it, including local ``.labels``
+_SYMBOL_PATTERN = re.compile(r"[A-Za-z_.?@][\w.?@$#~]*")
+
+
+def _extract_symbols(
+    document: DocumentLexer, path: str
+) -> tuple[list[SymbolDefinition], list[SymbolReference], list[str]]:
+    """Find the symbols and include targets of a document snapshot; runs on a worker thread."""
+    # Imported on first use so they stay off the startup path
+    from core.includes import document_includes
+    from core.symbols import extract_symbols
+
+    return (*extract_symbols(document, path), document_includes(document))
 
-# Import sass for SCSS compilation
-try:
-    import sass
-except ImportError:
-    sass = None
+
+def _index_project(root: Path, documents: dict[Path, list[str]], token_cache: TokenCache | None) -> SymbolIndex:
+    """Update the saved symbol index of a directory; runs on a worker thread."""
+    from core.symbols import index_project
+
+    return index_project(root, documents, token_cache)
 
 
 class AsmLexerView(BaseView):
-    """Custom view for the assembler lexer analyzer application."""
-    
+    """One document of the workspace: its editor, token table and token state.
+
+    A view opened for a file reads it only when first shown, and its token
+    state can be dropped while hidden with ``evict``; ``activate`` rebuilds
+    it, from the token cache when the file is unchanged.
+
+    Files of ``CHUNKED_LOAD_BYTES`` or more are read on a worker thread and
+    inserted a chunk at a time, with a progress bar, and analyzed once
+    complete; smaller ones load at once through the token cache.
+
+    The filter bar above the table narrows it through a TokenIndex, built on
+    a worker after each analysis while a filter is set, so a change to the
+    filter only costs the size of its result.
+
+    The symbols and include targets of a file's tab are extracted from its
+    committed tokens on a worker after each analysis, and reported with
+    ``symbols_changed``.
+    """
+
+    # Delay between the last edit and the background analysis it triggers
+    ANALYSIS_DEBOUNCE_MS = 150
+
+    # Files at least this large are loaded in chunks off the UI thread
+    CHUNKED_LOAD_BYTES = 1024 * 1024
+
+    # Messages for the window's status bar
+    status_message = pyqtSignal(str)
+
+    # The tab's symbols were extracted again, and are in ``symbols`` and ``includes``
+    symbols_changed = pyqtSignal()
+
     def __init__(self):
         super().__init__()
-        
+
         # Create horizontal splitter for main layout
         central_splitter = QSplitter(Qt.Orientation.Horizontal)
 
         # Panel izquierdo para el código fuente
-        self.source_code_view = QTextEdit()
+        # A plain-text editor lays out only what it shows, which large files need
+        self.source_code_view = QPlainTextEdit()
         self.source_code_view.setPlaceholderText("Abre un archivo .asm para empezar...")
+        self.source_code_view.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        # Colour tokens in the editor with the same palette as the table
+        self.highlighter = AsmHighlighter(self.source_code_view)
 
         # Panel derecho para los resultados (una tabla es mejor que texto plano)
-        self.results_view = QTableWidget()
-        self.results_view.setColumnCount(3)
-        self.results_view.setHorizontalHeaderLabels(["#", "Elemento", "Tipo"])
+        # The view is backed by a virtual model, so only visible rows are rendered
+        self.results_model = TokenTableModel()
+        self.results_view = QTableView()
+        self.results_view.setModel(self.results_model)
+        self.results_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.results_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         # Make the "Elemento" column stretch to fill available space
         header = self.results_view.horizontalHeader()
         if header is not None:
             header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        # Fixed row heights keep Qt from measuring every row of large tables
+        vertical_header = self.results_view.verticalHeader()
+        if vertical_header is not None:
+            vertical_header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+            vertical_header.setVisible(False)
+
+        # Filter bar over the token table
+        self.filter_bar = TokenFilterBar()
+        results_panel = QWidget()
+        results_layout = QVBoxLayout(results_panel)
+        results_layout.setContentsMargins(0, 0, 0, 0)
+        results_layout.addWidget(self.filter_bar)
+        results_layout.addWidget(self.results_view)
 
         # Add panels to the splitter
         central_splitter.addWidget(self.source_code_view)
-        central_splitter.addWidget(self.results_view)
+        central_splitter.addWidget(results_panel)
 
         # Add the splitter to the main layout
         self.layout().addWidget(central_splitter)
 
-
-class MainWindow(IngotApp):
-    """Main window for the assembler lexer analyzer application."""
-
-    def __init__(self):
-        """Initialize the main window with UI elements and menu."""
-        # Define the view configuration
-        view_config = {
-            "title": "Analizador Léxico - Ensamblador",
-            "view_factory": AsmLexerView  # Provide our custom view factory
-        }
-        
-        # Initialize the parent IngotApp with view_config
-        super().__init__(view_config=view_config)
-        
-        # Set the window title
-        self.setWindowTitle("Analizador Léxico - Ensamblador")
-        
-        # Access the UI components from the view in the current tab
-        # For custom views like ours, the tab widget IS the view itself
-        current_tab = self.workspace.currentWidget()  # This might be our AsmLexerView directly
-        if current_tab:
-            # Check if current_tab has the UI components directly (it should be our AsmLexerView)
-            if hasattr(current_tab, 'source_code_view'):
-                self.source_code_view = current_tab.source_code_view
-                self.results_view = current_tab.results_view
-            else:
-                # If the current tab doesn't have the components, try accessing via .widget() method
-                # in case it is a container (like QScrollArea)
-                try:
-                    view_widget = current_tab.widget()
-                    if hasattr(view_widget, 'source_code_view'):
-                        self.source_code_view = view_widget.source_code_view
-                        self.results_view = view_widget.results_view
-                    else:
-                        # Fallback: create placeholder attributes
-                        self.source_code_view = None
-                        self.results_view = None
-                except AttributeError:
-                    # If current_tab doesn't have a .widget() method, it's our view directly
-                    self.source_code_view = None
-                    self.results_view = None
-        else:
-            # Fallback: create placeholder attributes
-            self.source_code_view = None
-            self.results_view = None
-
-        # Define menu structure and actions
-        self._setup_menu()
-        
-        # Create central widget layout
-        self._setup_central_widget()
-
-        # Initialize UI components
-        self.source_code_view: QTextEdit | None = None
-        self.results_view: QTableWidget | None = None
-
-        # Connect textChanged signal for real-time analysis
-        self._connect_text_changed_signal()
-        
-        # Connect cursorPositionChanged signal for code-to-table synchronization
-        self._connect_cursor_position_signal()
-        
-        # Connect itemSelectionChanged signal for table-to-code synchronization
-        self._connect_table_selection_signal()
-        
-        # Apply Catppuccin theme
-        self._apply_catppuccin_theme()
-        
-        # Initialize with empty analysis
-        self.analyze_code()
-
-    def _connect_zoom_signals(self):
-        """
-        Override to avoid zoom signal connection for text-based view.
-        Our text-based AsmLexerView doesn't have zoom functionality.
+        # Progress of a chunked load, hidden otherwise
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, 100)
+        self.load_progress.setVisible(False)
+        self.layout().addWidget(self.load_progress)
+
+        # File shown in this tab; None for an untitled document
+        self.path: Path | None = None
+        # Whether the file is still to be read, which happens on first show
+        self.pending_load = False
+        # Whether the token state was dropped while the tab was hidden
+        self.evicted = False
+        # Reader of the file while it is loaded in chunks
+        self.loader: ChunkedFileLoader | None = None
+        # Held from the start of a chunked load until its symbols are extracted
+        self.collector_pause = CollectorPause()
+        self.destroyed.connect(self.collector_pause.release)
+
+        # Per-line token cache of the editor contents, re-lexed incrementally
+        self.document_lexer = DocumentLexer()
+        self.results_model.set_tokens(self.document_lexer)
+
+        # Lex dirty lines on a worker thread, coalescing bursts of edits
+        self.analysis_scheduler = AnalysisScheduler(
+            self.document_lexer, self.ANALYSIS_DEBOUNCE_MS, self,
+            commit=lambda: self.results_model.commit(self.document_lexer),
+        )
+        self.analysis_scheduler.analyzed.connect(self._on_analysis_finished)
+
+        # Search index of the token table, only built while a filter is set
+        self.token_filter: TokenFilter | None = None
+        self.token_index: TokenIndex | None = None
+        self.token_indexer = TokenIndexer(self.document_lexer, self)
+        self.token_indexer.finished.connect(self._on_indexed)
+        self.token_indexer.failed.connect(self._on_index_failed)
+        self.filter_bar.filter_changed.connect(self._on_filter_changed)
+
+        # Definitions and references of the editor contents, as of the last analysis
+        self.symbols: tuple[list[SymbolDefinition], list[SymbolReference]] | None = None
+        self.includes: list[str] | None = None
+        self.symbol_extractor = BackgroundRunner(self)
+        self.symbol_extractor.finished.connect(self._on_symbols_extracted)
+        self.symbol_extractor.failed.connect(self._on_symbols_failed)
+
+        # Incremental analysis, and code/table synchronization both ways
+        self.source_code_view.document().contentsChange.connect(self._on_contents_change)
+        self.source_code_view.cursorPositionChanged.connect(self._sync_code_to_table)
+        self.results_view.selectionModel().selectionChanged.connect(self._sync_table_to_code)
+
+    @property
+    def is_blank(self) -> bool:
+        """Whether the tab shows no file and no text, so a file can be opened in it."""
+        return self.path is None and self.source_code_view.document().isEmpty()
+
+    def set_path(self, path: Path) -> None:
+        """Show a file in this tab; it is read the next time the tab is activated."""
+        self.path = path
+        self.pending_load = True
+
+    def activate(self, token_cache: TokenCache | None) -> bool:
+        """Bring the tab's contents and token state up to date as it is shown.
+
+        Args:
+            token_cache: On-disk token cache for reading files
+
+        Returns:
+            Whether the file was read just now
         """
-        # Don't connect zoom signals for this type of application
-        pass
-
-    def _connect_text_changed_signal(self) -> None:
-        """Connect the textChanged signal for real-time analysis."""
-        if self.source_code_view:
-            self.source_code_view.textChanged.connect(self.analyze_code)
-
-    def _connect_cursor_position_signal(self) -> None:
-        """Connect the cursorPositionChanged signal for code-to-table synchronization."""
-        if self.source_code_view:
-            self.source_code_view.cursorPositionChanged.connect(self._sync_code_to_table)
+        if self.pending_load:
+            self.pending_load = False
+            return self._load(token_cache)
+        if self.evicted:
+            self._rebuild(token_cache)
+        return False
+
+    @property
+    def is_large(self) -> bool:
+        """Whether the tab's file is loaded in chunks rather than at once."""
+        try:
+            return self.path is not None and self.path.stat().st_size >= self.CHUNKED_LOAD_BYTES
+        except OSError:
+            return False
 
-    def _connect_table_selection_signal(self) -> None:
-        """Connect the itemSelectionChanged signal for table-to-code synchronization."""
-        current_tab = self.workspace.currentWidget()
-        if not current_tab:
+    def evict(self) -> None:
+        """Drop the token state of a hidden tab; the editor keeps its text."""
+        if self.pending_load or self.evicted or self.loader is not None:
             return
-
-        results_view = None
-        if hasattr(current_tab, 'results_view'):
-            results_view = current_tab.results_view
-        else:
+        self.evicted = True
+        # Work in flight would commit, or extract symbols from, the emptied
+        # document, and wipe the file from the project's symbol index
+        self.analysis_scheduler.cancel()
+        self.symbol_extractor.cancel()
+        self.collector_pause.release()
+        self.token_index = None
+        self.token_indexer.cancel()
+        self.results_model.set_tokens(())
+        self.document_lexer.reset("")
+        self.document_lexer.relex()
+
+    def _load(self, token_cache: TokenCache | None) -> bool:
+        """Read the tab's file into the editor and analyze it."""
+        if self.is_large:
+            self._load_in_chunks()
+            return True
+        try:
+            # Unchanged files get their tokens from the cache without lexing
+            if token_cache is not None:
+                stream, _ = token_cache.lex_file(self.path)
+                content = stream.source
+            else:
+                stream = None
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    content = file.read()
+        except Exception as e:
+            self.status_message.emit(f"Error al leer el archivo: {str(e)}")
+            return False
+
+        self.source_code_view.setPlainText(content)
+        self.source_code_view.document().setModified(False)
+
+        # setPlainText triggers contentsChange, which marks every line dirty;
+        # cached tokens fill them in so the worker has nothing left to lex
+        if stream is not None:
+            self.document_lexer.load_stream(stream)
+        self.analysis_scheduler.run_now()
+        self.status_message.emit(f"Archivo cargado: {self.path.name}")
+        return True
+
+    def _load_in_chunks(self) -> None:
+        """Start reading the tab's file on a worker, inserting it as chunks arrive."""
+        self.collector_pause.acquire()
+        # Assigned first, so no edit from here on schedules an analysis
+        self.loader = ChunkedFileLoader(self.path, parent=self)
+        self.analysis_scheduler.cancel()
+        document = self.source_code_view.document()
+        self.source_code_view.clear()
+        # Edits would interleave with the chunks, and undo history of the
+        # whole file would double its memory
+        self.source_code_view.setReadOnly(True)
+        document.setUndoRedoEnabled(False)
+        self.highlighter.suspended = True
+        self.load_progress.setValue(0)
+        self.load_progress.setVisible(True)
+        self.status_message.emit(f"Cargando: {self.path.name}...")
+
+        self.loader.chunk_ready.connect(self._insert_chunk)
+        self.loader.progress.connect(self.load_progress.setValue)
+        self.loader.finished.connect(self._on_load_finished)
+        self.loader.failed.connect(self._on_load_failed)
+        self.loader.start()
+
+    def _insert_chunk(self, text: str) -> None:
+        """Append a chunk of the file being loaded."""
+        cursor = QTextCursor(self.source_code_view.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+
+    def _end_chunked_load(self) -> None:
+        """Give the editor back to the user after a chunked load."""
+        self.loader.deleteLater()
+        self.loader = None
+        document = self.source_code_view.document()
+        document.setUndoRedoEnabled(True)
+        document.setModified(False)
+        self.source_code_view.setReadOnly(False)
+        self.load_progress.setVisible(False)
+        self.highlighter.suspended = False
+        self.highlighter.highlight_visible()
+
+    def _on_load_finished(self) -> None:
+        """Analyze the file once all of it is in the editor."""
+        self._end_chunked_load()
+        self.analysis_scheduler.run_now()
+        self.status_message.emit(f"Archivo cargado: {self.path.name}")
+
+    def _on_load_failed(self, message: str) -> None:
+        """Report a chunked load that could not finish."""
+        self._end_chunked_load()
+        self.collector_pause.release()
+        self.status_message.emit(f"Error al leer el archivo: {message}")
+
+    def _rebuild(self, token_cache: TokenCache | None) -> None:
+        """Re-analyze the editor contents after an eviction."""
+        self.evicted = False
+        self.document_lexer.reset(self.source_code_view.toPlainText())
+        # Lines that still match the saved file come straight from the cache;
+        # large files are lexed on the worker rather than read back here
+        unmodified = not self.source_code_view.document().isModified()
+        if token_cache is not None and self.path is not None and unmodified and not self.is_large:
             try:
-                view_widget = current_tab.widget()
-                if view_widget and hasattr(view_widget, 'results_view'):
-                    results_view = view_widget.results_view
-            except AttributeError:
+                self.document_lexer.load_stream(token_cache.lex_file(self.path)[0])
+            except (OSError, UnicodeDecodeError):
                 pass
+        self.results_model.set_tokens(self.document_lexer)
+        self.analysis_scheduler.run_now()
+
+    def analyze(self) -> None:
+        """Re-lex the whole document on the worker, skipping the debounce delay."""
+        source_code = self.source_code_view.toPlainText()
+        # An empty editor has nothing to analyze until text arrives
+        if not source_code and not len(self.document_lexer):
+            return
 
-        if results_view:
-            results_view.itemSelectionChanged.connect(self._sync_table_to_code)
+        self.document_lexer.reset(source_code)
+        self.analysis_scheduler.run_now()
 
-    def _apply_catppuccin_theme(self) -> None:
-        """Apply the Catppuccin theme using the existing ThemeManager."""
-        if sass is None:
-            # If sass is not available, try loading the existing theme through the manager
-            try:
-                # Try to apply a built-in theme as fallback
-                if hasattr(self, 'theme_manager'):
-                    self.theme_manager.apply_default_theme()
-            except Exception:
-                pass
+    def go_to(self, line: int, column: int = 0) -> None:
+        """Move the editor cursor to a 1-based line and 0-based column."""
+        block = self.source_code_view.document().findBlockByNumber(line - 1)
+        if not block.isValid():
             return
-            
-        try:
-            # For now, we'll apply the theme by loading the SCSS content directly
-            # The ThemeManager in qt-ingot works with predefined themes, so we'll set the stylesheet directly
-            theme_path = Path(__file__).parent.parent.parent / "resources" / "themes" / "catppuccin-mocha.scss"
-            if theme_path.exists():
-                with open(theme_path, 'r') as f:
-                    theme_content = f.read()
-                
-                # Use sass to compile SCSS to CSS
-                compiled_css = sass.compile(string=theme_content)
-                self.setStyleSheet(compiled_css)
-            else:
-                print(f"Theme file not found: {theme_path}")
-        except Exception as e:
-            print(f"Error applying theme: {str(e)}")
-            # Fallback to default theme if custom theme fails
-            if hasattr(self, 'theme_manager'):
-                try:
-                    self.theme_manager.apply_default_theme()
-                except:
-                    pass
+        cursor = self.source_code_view.textCursor()
+        cursor.setPosition(block.position() + min(column, block.length() - 1))
+        self.source_code_view.setTextCursor(cursor)
+        self.source_code_view.ensureCursorVisible()
+        self._highlight_current_line()
 
-    def _sync_table_to_code(self) -> None:
-        """Synchronize from results table to code editor based on table selection."""
-        if not self.source_code_view or not hasattr(self, 'current_tokens'):
+    def _on_contents_change(self, position: int, chars_removed: int, chars_added: int) -> None:
+        """Splice the blocks touched by an edit and schedule their analysis."""
+        # An evicted tab re-reads the whole editor when it is shown again
+        if self.evicted:
             return
 
-        current_tab = self.workspace.currentWidget()
-        if not current_tab:
-            return
+        document = self.source_code_view.document()
+        block = document.findBlock(position)
+        last_block = document.findBlock(position + chars_added)
+        if not last_block.isValid():
+            last_block = document.lastBlock()
+
+        # Blocks before the edit and after the last touched block are unchanged,
+        # so the old block range is derived from the change in block count
+        first_line = block.blockNumber()
+        added_lines = last_block.blockNumber() - first_line + 1
+        removed_lines = added_lines - (document.blockCount() - self.document_lexer.line_count)
+
+        texts = []
+        revisions = []
+        for _ in range(added_lines):
+            texts.append(block.text())
+            revisions.append(block.revision())
+            block = block.next()
+
+        self.document_lexer.replace_lines(first_line, removed_lines, texts, revisions)
+        # A chunked load is analyzed once, when complete
+        if self.loader is None:
+            self.analysis_scheduler.schedule()
+
+    def _on_analysis_finished(self, change: RowChange) -> None:
+        """Follow up on the rows changed by a finished background analysis."""
+        self.status_message.emit(f"Análisis completado: {len(self.document_lexer)} tokens encontrados")
+
+        # The filtered rows of the changed lines come back once re-indexed
+        self.token_index = None
+        if self.token_filter is not None:
+            self.token_indexer.rebuild()
+        else:
+            self.token_indexer.cancel()
 
-        results_view = None
-        if hasattr(current_tab, 'results_view'):
-            results_view = current_tab.results_view
+        # The symbols come from the committed tokens, so nothing is lexed again.
+        # A chunked load is over once they are extracted, as that allocates
+        # millions of objects the collector would otherwise walk repeatedly
+        if self.path is not None:
+            self.symbol_extractor.run(_extract_symbols, self.document_lexer.snapshot(), str(self.path))
         else:
-            try:
-                view_widget = current_tab.widget()
-                if view_widget and hasattr(view_widget, 'results_view'):
-                    results_view = view_widget.results_view
-            except AttributeError:
-                pass
+            self.collector_pause.release()
+
+        # Highlight the current line in the source code editor
+        self._highlight_current_line()
 
-        if not results_view:
+    def _on_symbols_extracted(
+        self, result: tuple[list[SymbolDefinition], list[SymbolReference], list[str]]
+    ) -> None:
+        """Keep the symbols and include targets extracted from the latest analysis."""
+        try:
+            definitions, references, self.includes = result
+            self.symbols = (definitions, references)
+            self.symbols_changed.emit()
+        finally:
+            self.collector_pause.release()
+
+    def _on_symbols_failed(self, error: Exception) -> None:
+        """Report symbols that could not be extracted, ending a chunked load all the same."""
+        try:
+            self.status_message.emit(f"Error al extraer los símbolos: {error}")
+        finally:
+            self.collector_pause.release()
+
+    def _on_filter_changed(self, token_filter: TokenFilter | None) -> None:
+        """Filter the token table, indexing the tokens first if needed."""
+        self.token_filter = token_filter
+        self._apply_filter()
+
+    def _on_indexed(self, token_index: TokenIndex) -> None:
+        """Filter the token table with a freshly built index."""
+        self.token_index = token_index
+        self._apply_filter()
+
+    def _on_index_failed(self, error: Exception) -> None:
+        """Report a token index that could not be built; the next filter change tries again."""
+        message = f"Error al indexar los tokens: {error}"
+        self.filter_bar.set_error(message)
+        self.status_message.emit(message)
+
+    def _apply_filter(self) -> None:
+        """Show the rows of the token table that pass the current filter."""
+        if self.token_filter is None:
+            if self.results_model.row_filter is not None:
+                self.results_model.set_row_filter(None)
+            return
+        if self.token_index is None:
+            if not self.token_indexer.busy:
+                self.token_indexer.rebuild()
+                self.status_message.emit("Indexando tokens...")
             return
 
+        rows = self.token_index.select(self.token_filter)
+        self.results_model.set_row_filter(rows)
+        self.status_message.emit(f"Filtro: {len(rows)} de {len(self.token_index)} tokens")
+
+    def _sync_table_to_code(self) -> None:
+        """Synchronize from results table to code editor based on table selection."""
         # Get currently selected row
-        selected_items = results_view.selectedItems()
-        if not selected_items:
+        selected_rows = self.results_view.selectionModel().selectedRows()
+        if not selected_rows:
             return
 
-        # Get the row of the first selected item
-        selected_row = selected_items[0].row()
-
-        # Get the corresponding token
-        if selected_row < len(self.current_tokens):
-            token = self.current_tokens[selected_row]
-            target_line = token.line
-
-            # Move cursor to the target line in the source code editor
-            cursor = self.source_code_view.textCursor()
-            cursor.movePosition(cursor.MoveOperation.Start)  # Move to beginning
-            cursor.movePosition(
-                cursor.MoveOperation.Down,
-                cursor.MoveMode.MoveAnchor,
-                target_line - 1  # Lines are 1-indexed, positions are 0-indexed
-            )
-            self.source_code_view.setTextCursor(cursor)
-            
-            # Optionally scroll to make the line visible
-            self.source_code_view.ensureCursorVisible()
-            
-            # Highlight the line
-            self._highlight_current_line()
+        # Get the token row of the first selected item
+        selected_row = self.results_model.source_row(selected_rows[0].row())
+
+        # Jump straight to the block of the corresponding token
+        if selected_row < len(self.document_lexer):
+            target_line = self.document_lexer.line(selected_row)
+            if self.source_code_view.textCursor().blockNumber() == target_line - 1:
+                return
+            self.go_to(target_line)
 
     def _highlight_current_line(self) -> None:
         """Highlight the current line in the source code editor."""
-        if not self.source_code_view:
-            return
-
-        from PyQt6.QtGui import QTextCharFormat, QColor
-        from PyQt6.QtCore import Qt
-
         # Create extra selection for line highlight
         extra_selections = []
 
@@ -279,7 +495,7 @@ class MainWindow(IngotApp):
         cursor.movePosition(cursor.MoveOperation.EndOfBlock, cursor.MoveMode.KeepAnchor)
 
         # Create extra selection
-        highlight_selection = self.source_code_view.ExtraSelection()
+        highlight_selection = QTextEdit.ExtraSelection()
         highlight_selection.format = selection
         highlight_selection.cursor = cursor
         extra_selections.append(highlight_selection)
@@ -289,48 +505,145 @@ class MainWindow(IngotApp):
 
     def _sync_code_to_table(self) -> None:
         """Synchronize from code editor to results table based on cursor position."""
-        if not self.source_code_view or not hasattr(self, 'current_tokens'):
-            return
-
         # Get current cursor position
         cursor = self.source_code_view.textCursor()
         current_line = cursor.blockNumber() + 1  # Block numbers are 0-indexed, so add 1
 
-        # Find the first token in the current line
-        current_tab = self.workspace.currentWidget()
-        if not current_tab:
-            return
+        # Keep the selection if it already points at a token on this line
+        selected_rows = self.results_view.selectionModel().selectedRows()
+        if selected_rows:
+            selected_row = self.results_model.source_row(selected_rows[0].row())
+            if selected_row < len(self.document_lexer) and self.document_lexer.line(selected_row) == current_line:
+                self._highlight_current_line()
+                return
+
+        # Look up the first token in the current line through the line index,
+        # then the first one the table shows
+        row = self.document_lexer.first_row_for_line(current_line)
+        if row is not None:
+            row = self.results_model.table_row(row)
+        if row is not None and self.document_lexer.line(self.results_model.source_row(row)) == current_line:
+            self.results_view.selectRow(row)
+
+            # Scroll to the first column of the row
+            self.results_view.scrollTo(self.results_model.index(row, 0))
 
-        results_view = None
-        if hasattr(current_tab, 'results_view'):
-            results_view = current_tab.results_view
-        else:
-            try:
-                view_widget = current_tab.widget()
-                if view_widget and hasattr(view_widget, 'results_view'):
-                    results_view = view_widget.results_view
-            except AttributeError:
-                pass
+        # Highlight the current line in the source code editor
+        self._highlight_current_line()
+
+
+class MainWindow(IngotApp):
+    """Main window for the assembler lexer analyzer application."""
+
+    # Whether opened files are looked up in the on-disk token cache
+    USE_TOKEN_CACHE = True
+
+    # Tabs that keep their token state; less recently shown tabs are evicted
+    MAX_ANALYZED_TABS = 8
+
+    def __init__(self):
+        """Initialize the main window with UI elements and menu."""
+        # Define the view configuration
+        view_config = {
+            "title": "Analizador Léxico - Ensamblador",
+            "view_factory": AsmLexerView  # Provide our custom view factory
+        }
+
+        # Initialize the parent IngotApp with view_config
+        super().__init__(view_config=view_config)
+
+        # Set the window title
+        self.setWindowTitle("Analizador Léxico - Ensamblador")
+
+        # On-disk token cache used when opening files
+        self.token_cache = TokenCache() if self.USE_TOKEN_CACHE else None
+
+        # Definitions and references of the open files' directory, saved
+        # between sessions, with the open files' own from their editors
+        self.symbol_index: SymbolIndex | None = None
+        self.symbol_root: Path | None = None
+        # Include targets of the open files the index was last updated with
+        self._symbol_documents: dict[Path, list[str]] = {}
+        self.symbol_indexer = BackgroundRunner(self)
+        self.symbol_indexer.finished.connect(self._on_symbols_indexed)
+        self.symbol_indexer.failed.connect(lambda error: self._show_message(f"Error al indexar los símbolos: {error}"))
 
-        if not results_view:
+        # Tabs with token state, most recently shown first
+        self._analyzed_views: list[AsmLexerView] = []
+        self._connected_views: weakref.WeakSet[AsmLexerView] = weakref.WeakSet()
+
+        # Define menu structure and actions
+        self._setup_menu()
+
+        # Create central widget layout
+        self._setup_central_widget()
+
+        # Tabs are analyzed when shown, starting with the one open now
+        self.workspace.currentChanged.connect(self._on_tab_changed)
+        self._on_tab_changed(self.workspace.currentIndex())
+
+        # Apply Catppuccin theme
+        self._apply_catppuccin_theme()
+
+    def _connect_zoom_signals(self):
+        """
+        Override to avoid zoom signal connection for text-based view.
+        Our text-based AsmLexerView doesn't have zoom functionality.
+        """
+        # Don't connect zoom signals for this type of application
+        pass
+
+    @staticmethod
+    def _as_view(widget: QWidget | None) -> AsmLexerView | None:
+        """Return the AsmLexerView of a workspace tab, looking inside scroll areas."""
+        if isinstance(widget, QScrollArea):
+            widget = widget.widget()
+        return widget if isinstance(widget, AsmLexerView) else None
+
+    def current_view(self) -> AsmLexerView | None:
+        """Return the view of the current tab."""
+        return self._as_view(self.workspace.currentWidget())
+
+    def _views(self) -> list[AsmLexerView]:
+        """Return the views of every tab."""
+        views = (self._as_view(self.workspace.widget(index)) for index in range(self.workspace.count()))
+        return [view for view in views if view is not None]
+
+    def _on_tab_changed(self, index: int) -> None:
+        """Analyze the tab being shown and evict the least recently shown ones."""
+        view = self._as_view(self.workspace.widget(index))
+        if view is None:
             return
+        if view not in self._connected_views:
+            view.status_message.connect(
+                lambda message, view=view: self._show_message(message) if view is self.current_view() else None
+            )
+            view.symbols_changed.connect(lambda view=view: self._store_view_symbols(view))
+            self._connected_views.add(view)
 
-        # Look for the first token in the current line in the table
-        for row in range(results_view.rowCount()):
-            if row < len(self.current_tokens):
-                token = self.current_tokens[row]
-                if token.line == current_line:
-                    # Found the row corresponding to the current line
-                    results_view.selectRow(row)
-                    
-                    # Get the item to scroll to
-                    item = results_view.item(row, 0)  # Use first column item
-                    if item:
-                        results_view.scrollToItem(item)
-                    break
-        
-        # Highlight the current line in the source code editor
-        self._highlight_current_line()
+        view.activate(self.token_cache)
+
+        # Closed tabs drop out of the list along with the evicted ones
+        open_views = self._views()
+        self._analyzed_views = [view] + [v for v in self._analyzed_views if v is not view and v in open_views]
+        for stale in self._analyzed_views[self.MAX_ANALYZED_TABS:]:
+            stale.evict()
+        del self._analyzed_views[self.MAX_ANALYZED_TABS:]
+
+    def _apply_catppuccin_theme(self) -> None:
+        """Apply the Catppuccin theme, compiled once and then read from the theme cache."""
+        try:
+            self.setStyleSheet(compiled_theme(THEME_PATH))
+        except Exception as e:
+            # sass is only needed when the theme is not cached yet
+            if not isinstance(e, ImportError):
+                print(f"Error applying theme: {str(e)}")
+            # Fallback to default theme if custom theme fails
+            if hasattr(self, 'theme_manager'):
+                try:
+                    self.theme_manager.apply_default_theme()
+                except Exception:
+                    pass
 
     def _setup_menu(self) -> None:
         """Setup the menu bar with required actions."""
@@ -340,7 +653,10 @@ class MainWindow(IngotApp):
                 {"id": "file.exit", "name": "Salir", "shortcut": "Escape", "function": self.close}
             ],
             "Análisis": [
-                {"id": "analysis.run", "name": "Analizar Código", "shortcut": "F5", "function": self.analyze_code}
+                {"id": "analysis.run", "name": "Analizar Código", "shortcut": "F5", "function": self.analyze_code},
+                {"id": "analysis.definition", "name": "Ir a la Definición", "shortcut": "F12", "function": self.go_to_definition},
+                {"id": "analysis.references", "name": "Buscar Referencias", "shortcut": "Shift+F12", "function": self.find_references},
+                {"id": "analysis.filter", "name": "Filtrar Tokens", "shortcut": "Ctrl+F", "function": self.focus_token_filter}
             ]
         }
         self.set_menu(menu_config)
@@ -352,242 +668,153 @@ class MainWindow(IngotApp):
         pass
 
     def open_file_dialog(self) -> None:
-        """Open a file dialog to select an .asm file and display its content."""
+        """Open a file dialog to select .asm files, each shown in its own tab."""
         # Define the starting directory as the examples folder in the project
         examples_path = Path(__file__).parent.parent.parent / "examples"
         if not examples_path.exists():
             examples_path = Path.cwd() / "examples"
-        
-        file_path, _ = QFileDialog.getOpenFileName(
+
+        file_paths, _ = QFileDialog.getOpenFileNames(
             self,
-            "Seleccionar archivo .asm",
+            "Seleccionar archivos .asm",
             str(examples_path),
-            "Archivos de ensamblador (*.asm *.s *.nasm)"
+            "Archivos de ensamblador (*.asm *.s *.nasm *.inc)"
         )
-        
-        if file_path:
-            try:
-                # Read the file content and display it
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    content = file.read()
-                
-                # Update the source code view - get the view from the current tab
-                current_tab = self.workspace.currentWidget()
-                if current_tab:
-                    # Check if current_tab is our AsmLexerView directly
-                    if hasattr(current_tab, 'source_code_view'):
-                        current_tab.source_code_view.setPlainText(content)
-                    else:
-                        # If current_tab is a container widget, try to get its widget
-                        try:
-                            view_widget = current_tab.widget()
-                            if view_widget and hasattr(view_widget, 'source_code_view') and view_widget.source_code_view:
-                                view_widget.source_code_view.setPlainText(content)
-                        except AttributeError:
-                            # It's not a container that supports .widget()
-                            pass
-                
-                # Automatically analyze the loaded content to populate the table
-                self.analyze_code()
-                
-                # Update status bar with the loaded file name
-                file_name = Path(file_path).name
-                if hasattr(self, 'status_bar') and self.status_bar:
-                    try:
-                        # Use the proper method for the status bar
-                        self.status_bar.showMessage(f"Archivo cargado: {file_name}")
-                    except AttributeError:
-                        # qt-ingot StatusBar doesn't have showMessage, so just print to console
-                        print(f"Archivo cargado: {file_name}")
-                    
-            except Exception as e:
-                if hasattr(self, 'status_bar') and self.status_bar:
-                    try:
-                        # Use the proper method for the status bar
-                        self.status_bar.showMessage(f"Error al leer el archivo: {str(e)}")
-                    except AttributeError:
-                        # qt-ingot StatusBar doesn't have showMessage, so just print to console
-                        print(f"Error al leer el archivo: {str(e)}")
 
-    def analyze_code(self) -> None:
-        """Analyze the loaded code using the lexer and display results."""
-        # Get the current tab to access the UI elements
-        current_tab = self.workspace.currentWidget()
-        if not current_tab:
-            return
+        # Only the first file is shown, and read; the rest wait in their tabs
+        for index, file_path in enumerate(file_paths):
+            self.open_file(Path(file_path), show=index == 0)
 
-        # Get the source code from the editor
-        source_code_view = None
-        if hasattr(current_tab, 'source_code_view'):
-            source_code_view = current_tab.source_code_view
-        else:
-            try:
-                view_widget = current_tab.widget()
-                if view_widget and hasattr(view_widget, 'source_code_view'):
-                    source_code_view = view_widget.source_code_view
-            except AttributeError:
-                pass
+    def open_file(self, path: Path, show: bool = True) -> AsmLexerView:
+        """Open a file in a tab, reusing its tab if it is already open.
 
-        if not source_code_view:
-            return
+        Args:
+            path: The file
+            show: Make its tab the current one, which reads and analyzes it
 
-        source_code = source_code_view.toPlainText()
-        
-        # Create lexer instance and analyze the code
-        lexer = Lexer(source_code)
-        tokens = lexer.analyze()
-        
-        # Store the tokens for synchronization purposes
-        self.current_tokens = tokens
-        
-        # Populate the results table
-        self._populate_results_table(tokens)
-        
-        if hasattr(self, 'status_bar') and self.status_bar:
-            try:
-                self.status_bar.showMessage(f"Análisis completado: {len(tokens)} tokens encontrados")
-            except AttributeError:
-                print(f"Análisis completado: {len(tokens)} tokens encontrados")
-        
-        # Highlight the current line in the source code editor
-        self._highlight_current_line()
+        Returns:
+            The view of the file's tab
+        """
+        path = path.resolve()
+        view = next((view for view in self._views() if view.path == path), None)
+        if view is None:
+            current = self.current_view()
+            if current is not None and current.is_blank:
+                view = current
+                self.workspace.setTabText(self.workspace.currentIndex(), path.name)
+            else:
+                view = AsmLexerView()
+                self.workspace.addTab(view, path.name)
+            self.workspace.setTabToolTip(self.workspace.indexOf(view), str(path))
+            view.set_path(path)
+        if show:
+            if view is self.current_view():
+                self._on_tab_changed(self.workspace.currentIndex())
+            else:
+                self.workspace.setCurrentWidget(view)
+        return view
 
-    def _populate_results_table(self, tokens: list[Token]) -> None:
-        """Populate the results table with the analyzed tokens."""
-        # Get the current tab to access the UI elements
-        current_tab = self.workspace.currentWidget()
-        if not current_tab:
-            return
+    def _index_symbols(self, root: Path) -> None:
+        """Bring the symbol index of a directory up to date on a worker.
 
-        results_view = None
-        if hasattr(current_tab, 'results_view'):
-            results_view = current_tab.results_view
-        else:
-            try:
-                view_widget = current_tab.widget()
-                if view_widget and hasattr(view_widget, 'results_view'):
-                    results_view = view_widget.results_view
-            except AttributeError:
-                pass
+        Only the files the open files of the directory include are read,
+        and the saved index is reused, so only files edited since the last
+        session are read again.
+        """
+        self.symbol_root = root
+        self._symbol_documents = {
+            view.path: view.includes for view in self._views()
+            if view.path is not None and view.path.parent == root and view.includes is not None
+        }
+        self.symbol_indexer.run(_index_project, root, self._symbol_documents, self.token_cache)
 
-        if not results_view:
-            return
+    def _on_symbols_indexed(self, index: SymbolIndex) -> None:
+        """Use a freshly updated index, with the symbols of the open editors."""
+        for view in self._views():
+            if view.symbols is not None:
+                index.update_symbols(view.path, *view.symbols)
+        self.symbol_index = index
 
-        # Clear existing rows
-        results_view.setRowCount(0)
-        
-        # Define colors for different token types (Catppuccin colors)
-        token_colors = {
-            "INSTRUCCIÓN": "#cba6f7",      # mauve
-            "REGISTRO": "#fab387",          # peach
-            "TIPO_DATO": "#89dceb",         # sky
-            "CONSTANTE_HEX": "#a6e3a1",     # green
-            "CONSTANTE_BIN": "#a6e3a1",     # green
-            "CONSTANTE_DEC": "#a6e3a1",     # green
-            "CONSTANTE_STR": "#a6e3a1",     # green
-            "PSEUDOINSTRUCCIÓN": "#89b4fa", # blue
-            "SÍMBOLO": "#f38ba8",           # red
-            "SEPARADOR": "#f5c2e7",         # pink
-            "OPERADOR_COMPUESTO": "#f9e2af" # yellow
-        }
-        
-        # Add tokens to the table
-        for row, token in enumerate(tokens):
-            results_view.setRowCount(row + 1)
-            
-            # Column 0: Token number
-            num_item = QTableWidgetItem(str(row + 1))
-            num_item.setFlags(num_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            results_view.setItem(row, 0, num_item)
-            
-            # Column 1: Token value
-            value_item = QTableWidgetItem(token.value)
-            value_item.setFlags(value_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            results_view.setItem(row, 1, value_item)
-            
-            # Column 2: Token type
-            type_item = QTableWidgetItem(token.type)
-            type_item.setFlags(type_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            
-            # Set color based on token type
-            if token.type in token_colors:
-                from PyQt6.QtGui import QColor
-                color = QColor(token_colors[token.type])
-                type_item.setForeground(color)
-            
-            results_view.setItem(row, 2, type_item)
-    
-    def _add_default_table_data(self) -> None:
-        """Add some default data to the table for testing purposes."""
-        current_tab = self.workspace.currentWidget()
-        if not current_tab:
-            return
+    def _store_view_symbols(self, view: AsmLexerView) -> None:
+        """Index the symbols of a tab's editor contents, which may not be saved yet.
 
-        results_view = None
-        if hasattr(current_tab, 'results_view'):
-            results_view = current_tab.results_view
-        else:
+        The project index is updated again when the tab belongs to another
+        directory or its includes changed.
+        """
+        if self.symbol_index is not None:
+            self.symbol_index.update_symbols(view.path, *view.symbols)
+        if view.path.parent != self.symbol_root or self._symbol_documents.get(view.path) != view.includes:
+            self._index_symbols(view.path.parent)
+
+    def _symbol_at_cursor(self) -> str | None:
+        """Return the indexed name of the symbol under the cursor of the current tab."""
+        view = self.current_view()
+        if view is None or view.path is None:
+            return None
+        if self.symbol_index is None:
+            self._show_message("Indexando símbolos...")
+            return None
+        cursor = view.source_code_view.textCursor()
+        column = cursor.positionInBlock()
+        line = cursor.blockNumber() + 1
+        for match in _SYMBOL_PATTERN.finditer(cursor.block().text()):
+            if match.start() <= column <= match.end():
+                return self.symbol_index.qualify(view.path, line, match.group())
+        return None
+
+    def _jump_to(self, path: str, line: int, column: int) -> None:
+        """Move the cursor to a position, showing its file's tab."""
+        self.open_file(Path(path)).go_to(line, column)
+
+    def _show_message(self, message: str) -> None:
+        """Show a message in the status bar."""
+        if hasattr(self, 'status_bar') and self.status_bar:
             try:
-                view_widget = current_tab.widget()
-                if view_widget and hasattr(view_widget, 'results_view'):
-                    results_view = view_widget.results_view
+                self.status_bar.showMessage(message)
             except AttributeError:
-                pass
+                # qt-ingot StatusBar doesn't have showMessage, so just print to console
+                print(message)
 
-        if not results_view:
+    def go_to_definition(self) -> None:
+        """Jump to where the symbol under the cursor is defined."""
+        name = self._symbol_at_cursor()
+        if name is None:
+            return
+        definitions = self.symbol_index.definitions(name)
+        if not definitions:
+            self._show_message(f"Sin definición para: {name}")
             return
+        # Prefer a definition in the current file, as each program carries its own copy
+        current_path = self.current_view().path
+        definition = next((d for d in definitions if Path(d.path) == current_path), definitions[0])
+        self._jump_to(definition.path, definition.line, definition.column)
+
+    def find_references(self) -> None:
+        """List the uses of the symbol under the cursor and jump to the chosen one."""
+        name = self._symbol_at_cursor()
+        if name is None:
+            return
+        references = self.symbol_index.references(name)
+        if not references:
+            self._show_message(f"Sin referencias para: {name}")
+            return
+        labels = [f"{Path(r.path).name}:{r.line}:{r.column + 1}" for r in references]
+        choice, accepted = QInputDialog.getItem(
+            self, "Referencias", f"{len(references)} referencias a {name}", labels, 0, False
+        )
+        if accepted:
+            reference = references[labels.index(choice)]
+            self._jump_to(reference.path, reference.line, reference.column)
 
-        # Clear any existing rows
-        results_view.setRowCount(0)
-        
-        # Add some default sample data 
-        sample_tokens = [
-            (1, "MOV", "INSTRUCCIÓN"),
-            (1, "AX", "REGISTRO"), 
-            (1, ",", "SEPARADOR"),
-            (1, "@DATA", "SÍMBOLO"),
-            (2, "LEA", "INSTRUCCIÓN"),
-            (2, "DX", "REGISTRO"),
-            (2, ",", "SEPARADOR"),
-            (2, "msg", "SÍMBOLO"),
-        ]
-        
-        # Define colors for different token types (Catppuccin colors)
-        token_colors = {
-            "INSTRUCCIÓN": "#cba6f7",      # mauve
-            "REGISTRO": "#fab387",          # peach
-            "TIPO_DATO": "#89dceb",         # sky
-            "CONSTANTE_HEX": "#a6e3a1",     # green
-            "CONSTANTE_BIN": "#a6e3a1",     # green
-            "CONSTANTE_DEC": "#a6e3a1",     # green
-            "CONSTANTE_STR": "#a6e3a1",     # green
-            "PSEUDOINSTRUCCIÓN": "#89b4fa", # blue
-            "SÍMBOLO": "#f38ba8",           # red
-            "SEPARADOR": "#f5c2e7",         # pink
-            "OPERADOR_COMPUESTO": "#f9e2af" # yellow
-        }
-        
-        for row, (line_num, value, token_type) in enumerate(sample_tokens):
-            results_view.setRowCount(row + 1)
-            
-            # Column 0: Token number
-            num_item = QTableWidgetItem(str(row + 1))
-            num_item.setFlags(num_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            results_view.setItem(row, 0, num_item)
-            
-            # Column 1: Token value
-            value_item = QTableWidgetItem(value)
-            value_item.setFlags(value_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            results_view.setItem(row, 1, value_item)
-            
-            # Column 2: Token type
-            type_item = QTableWidgetItem(token_type)
-            type_item.setFlags(type_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            
-            # Set color based on token type
-            if token_type in token_colors:
-                from PyQt6.QtGui import QColor
-                color = QColor(token_colors[token_type])
-                type_item.setForeground(color)
-            
-            results_view.setItem(row, 2, type_item)
\ No newline at end of file
+    def focus_token_filter(self) -> None:
+        """Move the focus to the value box of the current tab's filter bar."""
+        view = self.current_view()
+        if view is not None:
+            view.filter_bar.value_box.setFocus()
+            view.filter_bar.value_box.selectAll()
+
+    def analyze_code(self) -> None:
+        """Analyze the code of the current tab using the lexer and display results."""
+        view = self.current_view()
+        if view is not None:
+            view.analyze()
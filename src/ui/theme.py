@@ -0,0 +1,73 @@
+"""Compiled stylesheet cache for the application theme.
+
+Compiling SCSS takes longer than the rest of the window setup, and the
+theme rarely changes, so the compiled CSS is kept on disk next to the
+token cache. Entries are named after a hash of the SCSS source, so touching
+the file keeps its entry and editing it compiles a new one; ``sass`` is only
+imported when no entry matches.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import sys
+# Add the src directory to the Python path so we can import from core
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path))
+
+from core.cache import default_cache_dir
+
+# The theme applied to the main window
+THEME_PATH = Path(__file__).parent.parent.parent / "resources" / "themes" / "catppuccin-mocha.scss"
+
+
+def theme_cache_dir() -> Path:
+    """Return the directory of compiled themes, next to the token cache."""
+    return default_cache_dir().parent / "themes"
+
+
+def compiled_theme(scss_path: str | os.PathLike[str] = THEME_PATH, cache_dir: str | os.PathLike[str] | None = None) -> str:
+    """Return the CSS of an SCSS theme, compiling it only on a cache miss.
+
+    Args:
+        scss_path: The SCSS source of the theme
+        cache_dir: Where compiled themes are kept; defaults to ``theme_cache_dir()``
+
+    Returns:
+        The compiled stylesheet
+
+    Raises:
+        OSError: If the theme cannot be read
+        ImportError: If the theme must be compiled and ``sass`` is not installed
+    """
+    scss_path = Path(scss_path)
+    source = scss_path.read_bytes()
+    key = hashlib.sha256(source).hexdigest()[:32]
+    cache_dir = Path(cache_dir) if cache_dir is not None else theme_cache_dir()
+    cached = cache_dir / f"{scss_path.stem}-{key}.css"
+    try:
+        return cached.read_text(encoding="utf-8")
+    except OSError:
+        pass
+
+    import sass
+
+    css = sass.compile(string=source.decode("utf-8"))
+    # A cache that cannot be written only costs the next launch a compile
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(css)
+            os.replace(temp_path, cached)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    except OSError:
+        pass
+    return css
@@ -0,0 +1,201 @@
+"""Table model for the tokens produced by the assembler lexer.
+
+This module contains the TokenTableModel class that exposes a token sequence
+to a QTableView without creating any per-row widgets or items.
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any, Protocol
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt6.QtGui import QBrush, QColor
+
+import sys
+from pathlib import Path
+# Add the src directory to the Python path so we can import from core
+src_path = Path(__file__).parent.parent
+sys.path.insert(0, str(src_path))
+
+from core.tokens import TOKEN_TYPES
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from core.incremental import DocumentLexer, RowChange
+
+# Define colors for different token types (Catppuccin colors)
+TOKEN_COLORS = {
+    "INSTRUCCIÓN": "#cba6f7",      # mauve
+    "REGISTRO": "#fab387",          # peach
+    "TIPO_DATO": "#89dceb",         # sky
+    "CONSTANTE_HEX": "#a6e3a1",     # green
+    "CONSTANTE_BIN": "#a6e3a1",     # green
+    "CONSTANTE_DEC": "#a6e3a1",     # green
+    "CONSTANTE_STR": "#a6e3a1",     # green
+    "PSEUDOINSTRUCCIÓN": "#89b4fa", # blue
+    "SÍMBOLO": "#f38ba8",           # red
+    "SEPARADOR": "#f5c2e7",         # pink
+    "OPERADOR_COMPUESTO": "#f9e2af" # yellow
+}
+
+
+class TokenRows(Protocol):
+    """Row accessors shared by TokenStream and DocumentLexer."""
+
+    def __len__(self) -> int: ...
+    def value(self, index: int) -> str: ...
+    def type_id(self, index: int) -> int: ...
+    def line(self, index: int) -> int: ...
+
+
+class TokenTableModel(QAbstractTableModel):
+    """Virtual table model that reads rows straight from a token sequence.
+
+    Qt only asks for the rows that are visible, so filling the table costs
+    the same for ten tokens as for a million. Foreground brushes are built
+    once per token type and shared by every row.
+
+    A row filter, a sorted sequence of token rows, narrows the table to
+    those rows; the "#" column keeps showing each token's number in the
+    whole sequence.
+    """
+
+    HEADERS = ("#", "Elemento", "Tipo")
+
+    def __init__(self, tokens: TokenRows | None = None, parent=None):
+        super().__init__(parent)
+        self._tokens: TokenRows = tokens if tokens is not None else ()
+        self._rows: Sequence[int] | None = None
+        self._brushes = [
+            QBrush(QColor(TOKEN_COLORS[name])) if name in TOKEN_COLORS else None
+            for name in TOKEN_TYPES
+        ]
+
+    @property
+    def tokens(self) -> TokenRows:
+        """The token sequence displayed by the model."""
+        return self._tokens
+
+    @property
+    def row_filter(self) -> Sequence[int] | None:
+        """The token rows displayed, or None when every row is."""
+        return self._rows
+
+    def set_tokens(self, tokens: TokenRows) -> None:
+        """Display a new token sequence, dropping the row filter."""
+        self.beginResetModel()
+        self._tokens = tokens
+        self._rows = None
+        self.endResetModel()
+
+    def set_row_filter(self, rows: Sequence[int] | None) -> None:
+        """Display only some rows of the token sequence.
+
+        Args:
+            rows: Token rows to display, in ascending order; None displays all
+        """
+        self.beginResetModel()
+        self._rows = rows
+        self.endResetModel()
+
+    def source_row(self, row: int) -> int:
+        """Return the token row displayed at a row of the table."""
+        return self._rows[row] if self._rows is not None else row
+
+    def table_row(self, source_row: int) -> int | None:
+        """Return the first table row displaying a token row at or after ``source_row``."""
+        if self._rows is None:
+            return source_row if source_row < len(self._tokens) else None
+        row = bisect_left(self._rows, source_row)
+        return row if row < len(self._rows) else None
+
+    def commit(self, document: DocumentLexer) -> RowChange:
+        """Commit a document's analysis, telling views about the rows it replaces.
+
+        Views must see the old row count until a change is announced and the
+        new one after, so the commit happens between the two. The "#" column
+        numbers rows, so when the count changes every row from the edit on
+        shows another token: those rows are reported as changed, and rows are
+        inserted or removed at the end of the table, where numbers don't move.
+        A filtered table is reset, as it is filtered again once re-indexed.
+
+        Args:
+            document: The lexed document; usually the one the model displays
+
+        Returns:
+            The range of rows the commit replaced
+        """
+        change = document.pending_change()
+        if self._tokens is not document:
+            document.commit()
+            return change
+        if self._rows is not None:
+            self.beginResetModel()
+            document.commit()
+            self._shift_row_filter(change)
+            self.endResetModel()
+            return change
+
+        first, removed, added = change
+        old_count = len(document)
+        new_count = old_count - removed + added
+        if new_count < old_count:
+            self.beginRemoveRows(QModelIndex(), new_count, old_count - 1)
+        elif new_count > old_count:
+            self.beginInsertRows(QModelIndex(), old_count, new_count - 1)
+
+        document.commit()
+
+        if new_count < old_count:
+            self.endRemoveRows()
+        elif new_count > old_count:
+            self.endInsertRows()
+        last = first + added if new_count == old_count else min(old_count, new_count)
+        if last > first:
+            self.dataChanged.emit(self.index(first, 0), self.index(last - 1, len(self.HEADERS) - 1))
+        return change
+
+    def _shift_row_filter(self, change: RowChange) -> None:
+        """Keep a row filter pointing at the same tokens after a change.
+
+        Filtered rows in the replaced range are dropped, since their tokens
+        are gone; the caller filters the new rows once it has re-indexed them.
+        """
+        rows = self._rows
+        first = bisect_left(rows, change.first)
+        last = bisect_left(rows, change.first + change.removed)
+        shift = change.added - change.removed
+        self._rows = array('I', rows[:first])
+        self._rows.extend(row + shift for row in rows[last:])
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._rows) if self._rows is not None else len(self._tokens)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        row = self.source_row(index.row())
+        column = index.column()
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return str(row + 1)
+            if column == 1:
+                return self._tokens.value(row)
+            return TOKEN_TYPES[self._tokens.type_id(row)]
+        if role == Qt.ItemDataRole.ForegroundRole and column == 2:
+            return self._brushes[self._tokens.type_id(row)]
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
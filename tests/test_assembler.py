@@ -0,0 +1,105 @@
+"""Tests for the in-process 8086 assembler."""
+
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.core.assembler import Assembler, AssemblerError, assemble
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples" / "x86-16-nasm"
+
+
+@pytest.mark.parametrize(("source", "encoding"), [
+    ("mov ah, 0x0E", "b40e"),
+    ("mov al, [si]", "8a04"),
+    ("mov ax, [0x80]", "a18000"),
+    ("mov [di], si", "8935"),
+    ("mov si, [bp]", "8b7600"),
+    ("mov word [bx+2], 300", "c747022c01"),
+    ("mov ds, ax", "8ed8"),
+    ("mov al, [es:di]", "268a05"),
+    ("cmp al, 'A'", "3c41"),
+    ("cmp ax, 0", "83f800"),
+    ("cmp ax, 1000", "3de803"),
+    ("cmp byte [si+1], 'x'", "807c0178"),
+    ("sub al, 'a' - 10", "2c57"),
+    ("add di, 300", "81c72c01"),
+    ("xor cx, cx", "31c9"),
+    ("div byte [0x130]", "f6363001"),
+    ("inc si", "46"),
+    ("dec byte [di]", "fe0d"),
+    ("push es", "06"),
+    ("shl ax, 4", "c1e004"),
+    ("shr bl, cl", "d2eb"),
+    ("lea si, [bx+di+4]", "8d7104"),
+    ("rep movsb", "f3a4"),
+    ("int 0x21", "cd21"),
+    ("ret", "c3"),
+])
+def test_instruction_encodings(source: str, encoding: str) -> None:
+    """Test that instructions get the same encoding as NASM."""
+    assert assemble(source).hex() == encoding
+
+
+def test_layout_of_sections_labels_and_jumps() -> None:
+    """Test section placement, local labels, jump widening and $-based expressions."""
+    source = (
+        "org 0x100\n"
+        "section .data\n"
+        "msg db 'hi', 0\n"
+        "len equ $ - msg\n"
+        "section .bss\n"
+        "buf resb 16\n"
+        "section .text\n"
+        "start:\n"
+        "    jmp .skip\n"
+        "    times 200 nop\n"
+        ".skip:\n"
+        "    je start\n"
+        "    mov cx, len\n"
+        "    mov di, buf\n"
+        "    loop .skip\n"
+    )
+    program = Assembler().assemble(source)
+    
+    # Both jumps span the 200 nops, so they need their near forms
+    assert program.image[:3] == bytes.fromhex("e9c800")
+    assert program.image[203:] == bytes.fromhex("0f8431ff" "b90300" "bfdc01" "e2f4" "00" "686900")
+    # .data follows .text on a 4-byte boundary; .bss comes after and is not written out
+    assert program.symbols == {"start": 0x100, "start.skip": 0x1CB, "msg": 0x1D8, "len": 3, "buf": 0x1DC}
+    assert len(program.image) == 0xDB
+
+
+def test_examples_assemble() -> None:
+    """Test that every NASM example assembles, including macros and includes."""
+    assembler = Assembler()
+    paths = [path for path in sorted(EXAMPLES_DIR.rglob("*.asm")) if "masm" not in path.name]
+    programs = {path.name: assembler.assemble_file(path) for path in paths}
+    
+    assert len(programs) > 20
+    assert programs["00-skeleton.asm"].image == bytes.fromhex("b44ccd21")
+    # The included library's .text comes before the code of the program_begin macro
+    hello = programs["01-hello-macros.asm"]
+    assert hello.symbols["PrintString"] == 0x100 and hello.symbols["_start"] == 0x110
+    assert hello.image[0x10:0x1A] == bytes.fromhex("be1c01" "e8eaff" "b44ccd21")
+    
+    with pytest.raises(AssemblerError) as error:
+        assembler.assemble_file(EXAMPLES_DIR / "comp" / "conversor-masm.asm")
+    assert error.value.line == 14 and "unknown instruction" in error.value.message
+
+
+@pytest.mark.parametrize(("source", "message"), [
+    ("mov ax, bl", "<source>:1: mismatch in operand sizes"),
+    ("nop\nmov [si], 1", "<source>:2: operation size not specified"),
+    ("mov ax, missing", "<source>:1: symbol 'missing' is not defined"),
+    ("loop far_away\ntimes 200 nop\nfar_away:", "<source>:1: short jump out of range (200 bytes)"),
+    ("x: nop\nx: nop", "<source>:2: symbol 'x' is already defined"),
+])
+def test_errors_report_their_line(source: str, message: str) -> None:
+    """Test that assembly errors point at the offending line."""
+    with pytest.raises(AssemblerError, match=message.replace("(", r"\(").replace(")", r"\)")):
+        assemble(source)
@@ -0,0 +1,74 @@
+"""Tests for batch lexing of many assembly files."""
+
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.core.batch import collect_files, lex_file, lex_files, summarize
+from src.core.lexer import Lexer
+from src.core.tokens import TokenStream
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples" / "x86-16-nasm"
+
+
+def test_collect_files_from_directories_and_globs() -> None:
+    """Test that directories and glob patterns expand to unique files."""
+    files = collect_files([str(EXAMPLES_DIR / "04-mod"), str(EXAMPLES_DIR / "04-mod" / "*.asm")])
+    
+    names = [path.name for path in files]
+    assert files == sorted(set(files))
+    assert "00-basic-include.asm" in names
+    assert "io.inc" in names
+
+
+def test_lex_file_counts_tokens_per_type(tmp_path: Path) -> None:
+    """Test that a lexed file reports its token counts."""
+    path = tmp_path / "prog.asm"
+    path.write_text("MOV AX, BX\nmsg DB 'Hi'\n", encoding="utf-8")
+    
+    result = lex_file(path)
+    
+    assert result.error is None
+    assert result.token_count == len(Lexer(path.read_text()).analyze_stream())
+    assert result.type_counts == {"SÍMBOLO": 2, "REGISTRO": 2, "SEPARADOR": 1,
+                                  "PSEUDOINSTRUCCIÓN": 1, "CONSTANTE_STR": 1}
+
+
+def test_lex_files_reports_failures(tmp_path: Path) -> None:
+    """Test that unreadable files are reported instead of aborting the batch."""
+    good = tmp_path / "good.asm"
+    good.write_text("HLT", encoding="utf-8")
+    bad = tmp_path / "bad.asm"
+    bad.write_bytes(b"\xc1\xff")
+    missing = tmp_path / "missing.asm"
+    
+    results = list(lex_files([good, bad, missing], workers=2))
+    totals, failures = summarize(results)
+    
+    assert len(results) == 3
+    assert failures == 2
+    assert totals == {"INSTRUCCIÓN": 1}
+
+
+def test_lex_file_reports_unexpected_errors(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that any error while lexing a file becomes that file's failure."""
+    good = tmp_path / "good.asm"
+    good.write_text("HLT", encoding="utf-8")
+    deep = tmp_path / "deep.asm"
+    deep.write_text("NOP", encoding="utf-8")
+    analyze_stream = Lexer.analyze_stream
+    
+    def fail_on_nop(self: Lexer) -> TokenStream:
+        if "NOP" in self.source_code:
+            raise RecursionError("maximum recursion depth exceeded")
+        return analyze_stream(self)
+    
+    monkeypatch.setattr(Lexer, "analyze_stream", fail_on_nop)
+    results = {Path(result.path).name: result for result in lex_files([good, deep], workers=1)}
+    
+    assert results["good.asm"].error is None
+    assert results["deep.asm"].error == "RecursionError: maximum recursion depth exceeded"
@@ -0,0 +1,43 @@
+"""Tests for the synthetic source generator and import budget used by the benchmarks."""
+
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.bench_imports import FORBIDDEN_MODULES, IMPORT_BUDGET_MS, measure
+from benchmarks.generate import format_size, generate_source, parse_size
+from src.core.lexer import Lexer
+
+
+def test_generated_sources_are_seeded_and_sized() -> None:
+    """Test that the generator is deterministic and stays within the size."""
+    source = generate_source(parse_size("16K"), seed=1)
+    
+    assert source == generate_source(16 * 1024, seed=1)
+    assert source != generate_source(16 * 1024, seed=2)
+    assert 15 * 1024 < len(source.encode("utf-8")) <= 16 * 1024
+    assert source.endswith("\n")
+    
+    types = {row.type for row in Lexer(source).analyze_stream().rows()}
+    assert {"INSTRUCCIÓN", "REGISTRO", "CONSTANTE_HEX", "CONSTANTE_STR", "PSEUDOINSTRUCCIÓN"} <= types
+
+
+def test_size_parsing_round_trips() -> None:
+    """Test the K/M/G size suffixes."""
+    assert parse_size("512") == 512
+    assert parse_size("64K") == 64 * 1024
+    assert parse_size("1.5mb") == 3 * 512 * 1024
+    assert [format_size(parse_size(size)) for size in ("1K", "100M", "2G", "1000")] == ["1K", "100M", "2G", "1000"]
+
+
+def test_cli_imports_stay_within_budget() -> None:
+    """Test that piping the CLI's output imports neither pydantic, rich nor unused commands, within the budget."""
+    total, imports = measure()
+    modules = {entry.module.split(".")[0] for entry in imports}
+    
+    assert "src" in modules
+    assert not modules & set(FORBIDDEN_MODULES)
+    assert not {"src.core.batch", "src.core.emulator"} & {entry.module for entry in imports}
+    assert total < IMPORT_BUDGET_MS
@@ -0,0 +1,77 @@
+"""Tests for the on-disk token cache."""
+
+import os
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.core import lexer
+from src.core.cache import TokenCache
+from src.core.lexer import Lexer
+
+SOURCE = "msg DB 'Hi', 10\r\n\r\nMOV AX, [BX] ; load\r\n"
+
+
+def test_cache_hit_matches_lexer(tmp_path: Path) -> None:
+    """Test that a cached stream has the same tokens as a fresh analysis."""
+    path = tmp_path / "prog.asm"
+    path.write_bytes(SOURCE.encode("utf-8"))
+    cache = TokenCache(tmp_path / "cache")
+    
+    fresh, cached = cache.lex_file(path)
+    assert not cached
+    hit, cached = cache.lex_file(path)
+    assert cached
+    
+    expected = Lexer(path.read_text(encoding="utf-8")).analyze_stream()
+    assert list(fresh.rows()) == list(hit.rows()) == list(expected.rows())
+    assert hit.first_row_for_line(3) == expected.first_row_for_line(3)
+
+
+def test_cache_misses_on_lexer_change_and_corruption(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that entries are ignored when the lexer changes or the entry is damaged."""
+    data = SOURCE.encode("utf-8")
+    cache = TokenCache(tmp_path)
+    cache.lex_bytes(data)
+    
+    entry = next(tmp_path.rglob("*.tok"))
+    entry.write_bytes(entry.read_bytes()[:-1])
+    assert not cache.lex_bytes(data)[1]
+    assert cache.lex_bytes(data)[1]
+    
+    monkeypatch.setattr(lexer, "LEXER_VERSION", lexer.LEXER_VERSION + 1)
+    assert not TokenCache(tmp_path).lex_bytes(data)[1]
+
+
+def test_cache_keys_include_the_encoding(tmp_path: Path) -> None:
+    """Test that the same bytes decoded with another encoding do not share an entry."""
+    data = "msg db 'é'\nMOV AX, 1\n".encode("utf-8")
+    cache = TokenCache(tmp_path)
+    
+    assert cache.key(data, "utf8") == cache.key(data, "UTF-8") != cache.key(data, "latin-1")
+    assert not cache.lex_bytes(data, "utf-8")[1]
+    stream, cached = cache.lex_bytes(data, "latin-1")
+    assert not cached
+    assert list(stream.rows()) == list(Lexer(data.decode("latin-1")).analyze_stream().rows())
+    assert cache.lex_bytes(data, "latin-1")[1] and cache.lex_bytes(data, "utf8")[1]
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    """Test that the oldest entries are evicted once the cache is full."""
+    cache = TokenCache(tmp_path)
+    sources = [f"MOV AX, {i}\n".encode("utf-8") for i in range(3)]
+    for age, data in enumerate(sources):
+        cache.lex_bytes(data)
+        entry = cache._path(cache.key(data))
+        os.utime(entry, (age, age))
+    
+    entry_size = cache._path(cache.key(sources[0])).stat().st_size
+    cache.max_bytes = 2 * entry_size
+    
+    assert cache.prune() == 1
+    assert not cache._path(cache.key(sources[0])).exists()
+    assert cache.lex_bytes(sources[2])[1]
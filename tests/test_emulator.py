@@ -0,0 +1,67 @@
+"""Tests for the in-process 8086 emulator."""
+
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.core.assembler import Assembler, assemble
+from src.core.emulator import Emulator, EmulatorError, RunResult, run_com
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples" / "x86-16-nasm"
+
+
+@pytest.mark.parametrize(("example", "args", "stdin", "output"), [
+    ("00-core/01-hello-bios.asm", "", b"", b"Hola, BIOS!\r\n"),
+    ("00-core/04-echo-string.asm", "", b"hello\n", b"Input: hello\r\nhello\r\n"),
+    ("02-alu/03-multiplication.asm", "", b"", b"4 * 4 = 16\r\n"),
+    ("03-cli/03-parse-i16.asm", "-1234", b"", b"Parsed: -1234\r\n"),
+    ("03-cli/06-parse-args-array.asm", "one two", b"", b"argv[0]: one\r\nargv[1]: two\r\r\n"),
+    ("comp/conversor-nasm.asm", "", b"", b"Grados:    45\r\nRadianes:  0.7854\r\nGradianes: 50.0\r\n"),
+])
+def test_examples_run(example: str, args: str, stdin: bytes, output: bytes) -> None:
+    """Test that examples print what they print under DOS, reading the command tail and stdin."""
+    image = Assembler().assemble_file(EXAMPLES_DIR / example).image
+    result, written = run_com(image, args, stdin)
+    
+    assert result.status in ("exit", "halt")
+    assert written == output
+
+
+def test_budget_stops_and_resumes() -> None:
+    """Test that a run stops when its budget runs out and can be resumed."""
+    emulator = Emulator(assemble("org 0x100\nmov cx, 500\nspin: loop spin\nmov ax, 0x4C07\nint 0x21"))
+    
+    assert emulator.run(100) == RunResult("budget", None, 100)
+    assert emulator.run(None) == RunResult("exit", 7, 503)
+
+
+def test_code_writes_drop_decoded_instructions() -> None:
+    """Test that self-modifying code runs the new instruction, not the cached one."""
+    source = (
+        "org 0x100\n"
+        "mov cx, 2\n"
+        "again:\n"
+        "patch: mov al, 1\n"
+        "mov byte [patch + 1], 9\n"
+        "loop again\n"
+        "mov ah, 0x4C\n"
+        "int 0x21\n"
+    )
+    result, _ = run_com(assemble(source))
+    
+    assert result.exit_code == 9
+
+
+@pytest.mark.parametrize(("source", "message"), [
+    ("xor bl, bl\ndiv bl", "divide error at 0700:0102"),
+    ("int 0x13", "unsupported interrupt 13h at 0700:0100"),
+    ("mov ah, 0x3D\nint 0x21", "unsupported DOS function 3Dh at 0700:0102"),
+])
+def test_errors_report_their_address(source: str, message: str) -> None:
+    """Test that faults point at the instruction that caused them."""
+    with pytest.raises(EmulatorError, match=message):
+        run_com(assemble("org 0x100\n" + source))
@@ -0,0 +1,46 @@
+"""Tests for the machine-readable token output formats."""
+
+import csv
+import io
+import json
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.core.formats import read_binary, write_tokens
+from src.core.lexer import Lexer
+
+SOURCE = "msg DB 'tab\there, \"quoted\"', 10\nMOV AX, [BX+SI]\n"
+
+
+def test_binary_round_trip() -> None:
+    """Test that tokens read back from the binary format are unchanged."""
+    rows = list(Lexer(SOURCE).analyze_stream().rows())
+    out = io.BytesIO()
+    
+    assert write_tokens(rows, out, "binary") == len(rows)
+    assert list(read_binary(out.getvalue())) == rows
+    
+    with pytest.raises(ValueError):
+        list(read_binary(out.getvalue()[:-1]))
+
+
+def test_text_formats_keep_values_intact() -> None:
+    """Test that jsonl, csv and tsv output parses back to the same tokens."""
+    rows = list(Lexer(SOURCE).analyze_stream().rows())
+    
+    out = io.BytesIO()
+    write_tokens(rows, out, "jsonl")
+    records = [json.loads(line) for line in out.getvalue().decode("utf-8").splitlines()]
+    assert [(r["value"], r["type"], r["line"], r["column"]) for r in records] == rows
+    
+    for fmt, delimiter in (("csv", ","), ("tsv", "\t")):
+        out = io.BytesIO()
+        write_tokens(rows, out, fmt)
+        header, *records = csv.reader(io.StringIO(out.getvalue().decode("utf-8")), delimiter=delimiter)
+        assert header == ["index", "value", "type", "line", "column"]
+        assert [(v, t, int(l), int(c)) for _, v, t, l, c in records] == rows
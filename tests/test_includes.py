@@ -0,0 +1,77 @@
+"""Tests for %include resolution and the include graph."""
+
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.core.cache import TokenCache
+from src.core.includes import IncludeCycleError, IncludeResolver, document_includes, find_includes
+from src.core.incremental import DocumentLexer
+from src.core.lexer import Lexer
+
+
+def _project(tmp_path: Path, programs: int) -> list[Path]:
+    """Create programs that all include the same library."""
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "lib" / "io.inc").write_text('%include "std.inc"\nPrintString:\n    ret\n', encoding="utf-8")
+    (tmp_path / "lib" / "std.inc").write_text("CR EQU 0Dh\n", encoding="utf-8")
+    paths = []
+    for i in range(programs):
+        path = tmp_path / f"prog{i}.asm"
+        path.write_text(f'    mov ax, {i}\n%include "lib/io.inc"\n    call PrintString\n', encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def test_find_includes_only_matches_directives() -> None:
+    """Test that only %include followed by a string on the same line is a directive."""
+    source = '%INCLUDE "a.inc"\nmy_include db 1\n%include\n"b.inc"\n  %include \'c.inc\' ; note\n'
+    directives = find_includes(Lexer(source).analyze_stream())
+    
+    assert [(d.line, d.target) for d in directives] == [(1, "a.inc"), (5, "c.inc")]
+    assert document_includes(DocumentLexer(source)) == ["a.inc", "c.inc"]
+
+
+def test_shared_library_is_lexed_once(tmp_path: Path) -> None:
+    """Test that a library included by many programs is lexed once and spliced everywhere."""
+    programs = _project(tmp_path, 50)
+    resolver = IncludeResolver()
+    
+    graph = resolver.graph(programs)
+    expanded = [[token.row.value for token in resolver.expand(path)] for path in programs]
+    
+    assert resolver.lex_count == 52
+    assert expanded[7] == ["mov", "ax", ",", "7", "CR", "EQU", "0Dh", "PrintString", ":", "ret", "call", "PrintString"]
+    assert graph.dependents((tmp_path / "lib" / "std.inc").resolve()) == {
+        (tmp_path / "lib" / "io.inc").resolve(), *(path.resolve() for path in programs)
+    }
+    assert not graph.cycles and not graph.missing
+    
+    # A second resolver sharing an on-disk cache does not lex anything
+    cache = TokenCache(tmp_path / "cache")
+    IncludeResolver(cache=cache).graph(programs)
+    warm = IncludeResolver(cache=cache)
+    warm.graph(programs)
+    assert warm.lex_count == 0
+
+
+def test_include_cycles_and_missing_files(tmp_path: Path) -> None:
+    """Test that cycles are reported and refused, and missing files are kept as directives."""
+    (tmp_path / "a.asm").write_text('%include "b.inc"\nnop\n', encoding="utf-8")
+    (tmp_path / "b.inc").write_text('%include "a.asm"\n%include "gone.inc"\n', encoding="utf-8")
+    resolver = IncludeResolver()
+    
+    graph = resolver.graph([tmp_path / "a.asm"])
+    assert graph.cycles == [[(tmp_path / name).resolve() for name in ("a.asm", "b.inc", "a.asm")]]
+    assert graph.missing == {(tmp_path / "b.inc").resolve(): ["gone.inc"]}
+    
+    with pytest.raises(IncludeCycleError):
+        list(resolver.expand(tmp_path / "a.asm"))
+    
+    (tmp_path / "b.inc").write_text('%include "gone.inc"\n', encoding="utf-8")
+    values = [token.row.value for token in resolver.expand(tmp_path / "a.asm")]
+    assert values == ["%include", '"gone.inc"', "nop"]
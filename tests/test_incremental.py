@@ -0,0 +1,170 @@
+"""Tests for the incremental, line-based document lexer."""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.incremental import DocumentLexer, RowChange
+from src.core.lexer import Lexer
+
+SAMPLE_LINES = [
+    "org 0x100",
+    "section .data",
+    "    msg db 'Hello, World!', 0x0D, 0x0A, '$' ; greeting",
+    "",
+    "_start:",
+    "    mov ah, 09h",
+    "    MOV DX, [BX+SI]",
+    "; just a comment",
+    "    int 21h",
+]
+
+
+def _full_rows(source: str) -> list[tuple]:
+    """Helper function to lex a whole source with the batch lexer."""
+    return list(Lexer(source).analyze_stream().rows())
+
+
+def test_initial_document_matches_lexer() -> None:
+    """Test that a fresh document yields the same rows as the lexer."""
+    source = "\n".join(SAMPLE_LINES)
+    
+    document = DocumentLexer(source)
+    
+    assert list(document.rows()) == _full_rows(source)
+    assert len(document) == len(_full_rows(source))
+    assert document[5].value == "db"
+    assert document.line(5) == 3
+
+
+def test_edit_reports_changed_rows() -> None:
+    """Test that an edit only reports the rows of the edited line."""
+    document = DocumentLexer("\n".join(SAMPLE_LINES))
+    first_row = document.first_row(5)
+    
+    document.replace_lines(5, 1, ["    mov ah, 09h, bl"])
+    change = document.relex()
+    
+    assert change == RowChange(first_row, 4, 6)
+    assert document.value(first_row + 5) == "bl"
+
+
+def test_rows_stay_stable_until_commit() -> None:
+    """Test that uncommitted edits do not leak into row accessors."""
+    document = DocumentLexer("a b\nc")
+    
+    document.replace_lines(1, 1, ["c d e", "f"])
+    
+    assert len(document) == 3
+    assert document.value(2) == "c"
+    assert document.line_count == 3
+    document.relex()
+    assert [row.value for row in document.rows()] == ["a", "b", "c", "d", "e", "f"]
+
+
+@pytest.mark.parametrize("block_lines", [DocumentLexer.BLOCK_LINES, 2])
+def test_random_edits_match_full_relex(block_lines: int, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that random splices stay equal to lexing the whole text."""
+    # Tiny blocks make every edit split and merge blocks
+    monkeypatch.setattr(DocumentLexer, "BLOCK_LINES", block_lines)
+    rng = random.Random(8086)
+    lines = list(SAMPLE_LINES)
+    document = DocumentLexer("\n".join(lines))
+    expected_rows = _full_rows("\n".join(lines))
+    
+    for step in range(200):
+        first = rng.randrange(len(lines))
+        removed = rng.randint(0, min(3, len(lines) - first))
+        texts = rng.sample(SAMPLE_LINES, rng.randint(0 if removed < len(lines) else 1, 3))
+        lines[first:first + removed] = texts
+        document.replace_lines(first, removed, texts)
+        if step % 3:
+            continue
+        
+        change = document.relex()
+        new_rows = _full_rows("\n".join(lines))
+        assert list(document.rows()) == new_rows
+        assert [(document.value(row), document.line(row)) for row in range(len(document))] == [
+            (row.value, row.line) for row in new_rows
+        ]
+        
+        # Applying the reported change to the old rows must give the new rows
+        # (line numbers aside, which shift after the edited range)
+        spliced = [row.value for row in expected_rows]
+        spliced[change.first:change.first + change.removed] = [
+            row.value for row in new_rows[change.first:change.first + change.added]
+        ]
+        assert spliced == [row.value for row in new_rows]
+        expected_rows = new_rows
+
+
+def test_snapshot_keeps_the_committed_state(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that edits and commits leave an earlier snapshot untouched."""
+    monkeypatch.setattr(DocumentLexer, "BLOCK_LINES", 2)
+    document = DocumentLexer("\n".join(SAMPLE_LINES))
+    expected = list(document.rows())
+    
+    snapshot = document.snapshot()
+    document.replace_lines(1, 3, ["mov ax, bx"])
+    document.replace_lines(6, 0, ["nop", "nop"])
+    document.relex()
+    
+    assert list(snapshot.rows()) == expected
+    assert [entry.text for entry in snapshot.iter_entries()] == SAMPLE_LINES
+    assert list(document.rows()) != expected
+
+
+def test_edit_latency_stays_flat_as_the_document_grows() -> None:
+    """Test that a one-line edit costs about the same in small and large documents."""
+    def edit_time(line_count: int) -> float:
+        document = DocumentLexer("\n".join(["    mov ax, [bx+si] ; copy"] * line_count))
+        middle = line_count // 2
+        timings = []
+        for step in range(20):
+            start = time.perf_counter()
+            document.replace_lines(middle, 1, [f"    mov bx, {step}"])
+            document.relex()
+            document.value(document.first_row(middle))
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+    
+    small, large = edit_time(5_000), edit_time(200_000)
+    
+    # 40 times the lines; an edit that walked every line would take about 40 times as long
+    assert large < small * 8
+
+
+def test_line_index_lookups() -> None:
+    """Test the line to first-row index and the row to line mapping."""
+    source = "\n".join(SAMPLE_LINES)
+    document = DocumentLexer(source)
+    stream = Lexer(source).analyze_stream()
+    
+    for line in range(0, len(SAMPLE_LINES) + 2):
+        assert document.first_row_for_line(line) == stream.first_row_for_line(line)
+    assert document.first_row_for_line(4) is None  # blank line
+    assert document.first_row_for_line(8) is None  # comment-only line
+    
+    row = document.first_row_for_line(7)
+    assert document.value(row) == "MOV"
+    assert all(document.line(r) == stream.line(r) for r in range(len(stream)))
+
+
+def test_load_stream_fills_matching_lines() -> None:
+    """Test that lines matching an already lexed source skip lexing."""
+    source = "\n".join(SAMPLE_LINES)
+    document = DocumentLexer()
+    document.replace_lines(0, document.line_count, [*SAMPLE_LINES[:-1], "changed LINE"])
+    
+    filled = document.load_stream(Lexer(source).analyze_stream())
+    assert filled == len(SAMPLE_LINES) - 1
+    assert [entry.text for entry in document.dirty_entries()] == ["changed LINE"]
+    
+    document.relex()
+    assert list(document.rows()) == _full_rows("\n".join([*SAMPLE_LINES[:-1], "changed LINE"]))
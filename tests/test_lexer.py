@@ -1,12 +1,16 @@
 """Tests for the 8086 assembly lexer."""
 
 import sys
+import tempfile
 from pathlib import Path
 
 # Add the src directory to the path so we can import from core
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.core.lexer import Lexer, Token
+from src.core.tokens import TokenRow, TokenStream
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
 
 
 def _analyze_tokens(source_code: str) -> list[Token]:
@@ -138,6 +142,98 @@ def test_bracket_expressions() -> None:
     _assert_token(tokens, 5, "]", "SEPARADOR")
 
 
+def test_pseudo_instructions_inside_words() -> None:
+    """Test that pseudoinstructions are split out of longer words."""
+    source_code = "msgDB x.DATA SEGMENT"
+    
+    tokens = _analyze_tokens(source_code)
+    
+    assert len(tokens) == 4  # msg, DB, x, .DATA SEGMENT
+    _assert_token(tokens, 0, "msg", "SÍMBOLO")
+    _assert_token(tokens, 1, "DB", "PSEUDOINSTRUCCIÓN")
+    _assert_token(tokens, 2, "x", "SÍMBOLO")
+    _assert_token(tokens, 3, ".DATA SEGMENT", "PSEUDOINSTRUCCIÓN")
+
+
+def test_unterminated_string() -> None:
+    """Test that an unterminated string swallows the rest of the line."""
+    source_code = "DB 'Hello, World"
+    
+    tokens = _analyze_tokens(source_code)
+    
+    assert len(tokens) == 2  # DB, 'Hello, World
+    _assert_token(tokens, 0, "DB", "PSEUDOINSTRUCCIÓN")
+    _assert_token(tokens, 1, "'Hello, World", "SÍMBOLO")
+
+
+def test_regex_engine_matches_legacy() -> None:
+    """Test that the regex engine reproduces the legacy tokenizer on the examples."""
+    sources = sorted(EXAMPLES_DIR.rglob("*.asm")) + sorted(EXAMPLES_DIR.rglob("*.inc"))
+    assert sources
+    
+    for path in sources:
+        lexer = Lexer(path.read_text(encoding="utf-8", errors="replace"))
+        expected = [(t.value, t.type) for t in lexer._tokenize_legacy()]
+        actual = [(t.value, t.type) for t in lexer.analyze()]
+        assert actual == expected, path
+
+
+def test_original_source_positions() -> None:
+    """Test that lines and columns refer to the original source."""
+    source_code = """; header comment
+
+    MOV AX, BX ; trailing comment
+\tmsg DB 'Hi'"""
+    
+    stream = Lexer(source_code).analyze_stream()
+    rows = list(stream.rows())
+    
+    assert rows[0] == TokenRow("MOV", "SÍMBOLO", 3, 4)
+    assert rows[3] == TokenRow("BX", "REGISTRO", 3, 12)
+    assert rows[4] == TokenRow("msg", "SÍMBOLO", 4, 1)
+    assert rows[6] == TokenRow("'Hi'", "CONSTANTE_STR", 4, 8)
+    for index in range(len(stream)):
+        assert source_code[stream.starts[index]:stream.ends[index]] == stream.value(index)
+
+
+def test_token_stream_sequence_api() -> None:
+    """Test that a token stream behaves like the old list of tokens."""
+    source_code = "MOV AX, 0ABCDh\nDB 'x'"
+    
+    lexer = Lexer(source_code)
+    stream = lexer.analyze_stream()
+    
+    assert isinstance(stream, TokenStream)
+    assert len(stream) == 6
+    assert stream[3] == Token(value="0ABCDh", type="CONSTANTE_HEX", line=1)
+    assert stream[-1] == Token(value="'x'", type="CONSTANTE_STR", line=2)
+    assert stream[1:3] == list(stream)[1:3]
+    assert list(stream) == Lexer(source_code).analyze()
+
+
+def test_iter_file_matches_analyze(tmp_path: Path) -> None:
+    """Test that streaming a file yields the same tokens as analyzing it."""
+    source_code = "; header\n\nMOV AX, [BX]\r\nmsg DB 'Hi', 10\nDB 'open"
+    path = tmp_path / "prog.asm"
+    path.write_bytes(source_code.encode("utf-8"))
+    
+    assert list(Lexer.iter_file(path)) == Lexer(source_code.replace("\r\n", "\n")).analyze()
+    
+    empty = tmp_path / "empty.asm"
+    empty.write_bytes(b"")
+    assert list(Lexer.iter_file_rows(empty)) == []
+
+
+def test_classification_cache_counts_repeated_words() -> None:
+    """Test that repeated words are classified once and served from the cache."""
+    Lexer.clear_classify_cache()
+    
+    tokens = Lexer("CMP AX, 0Fh\nCMP AX, 0Fh\ncmp ax, 0fh\n").analyze()
+    info = Lexer.classify_cache_info()
+    assert (info.misses, info.hits) == (6, 3)
+    assert [token.type for token in tokens] == ["INSTRUCCIÓN", "REGISTRO", "SEPARADOR", "CONSTANTE_HEX"] * 3
+
+
 if __name__ == "__main__":
     test_basic_tokenization()
     test_register_recognition()
@@ -147,4 +243,12 @@ if __name__ == "__main__":
     test_instruction_recognition()
     test_string_constants()
     test_bracket_expressions()
+    test_pseudo_instructions_inside_words()
+    test_unterminated_string()
+    test_regex_engine_matches_legacy()
+    test_original_source_positions()
+    test_token_stream_sequence_api()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_iter_file_matches_analyze(Path(tmp_dir))
+    test_classification_cache_counts_repeated_words()
     print("All tests passed!")
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""Tests for the language server."""
+
+import io
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.core.lsp import LEGEND_TYPES, Document, LanguageServer, read_message, serve, write_message
+
+URI = "file:///prog.asm"
+
+
+def _change(line: int, character: int, end_line: int, end_character: int, text: str) -> dict:
+    """Build an incremental content change."""
+    return {
+        "range": {"start": {"line": line, "character": character}, "end": {"line": end_line, "character": end_character}},
+        "text": text,
+    }
+
+
+def test_serve_answers_framed_requests() -> None:
+    """Test a session over byte streams, from initialize to exit."""
+    requests = io.BytesIO()
+    for message in [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {"capabilities": {}}},
+        {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+        {"jsonrpc": "2.0", "method": "textDocument/didOpen",
+         "params": {"textDocument": {"uri": URI, "languageId": "asm", "version": 1, "text": "msg DB 'hi'\n  MOV AX, 4C00h"}}},
+        {"jsonrpc": "2.0", "id": 2, "method": "textDocument/semanticTokens/full", "params": {"textDocument": {"uri": URI}}},
+        {"jsonrpc": "2.0", "id": 3, "method": "textDocument/hover", "params": {}},
+        {"jsonrpc": "2.0", "id": 4, "method": "shutdown"},
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]:
+        write_message(requests, message)
+    requests.seek(0)
+    responses = io.BytesIO()
+    
+    assert serve(requests, responses) == 0
+    responses.seek(0)
+    initialize, tokens, hover, shutdown = (read_message(responses) for _ in range(4))
+    assert initialize["result"]["capabilities"]["textDocumentSync"]["change"] == 2
+    assert initialize["result"]["capabilities"]["semanticTokensProvider"]["full"] == {"delta": True}
+    # msg, DB, 'hi' on line 0; MOV, AX, ',', 4C00h on line 1
+    data = tokens["result"]["data"]
+    assert [data[i:i + 3] for i in range(0, len(data), 5)] == [
+        [0, 0, 3], [0, 4, 2], [0, 3, 4], [1, 2, 3], [0, 4, 2], [0, 2, 1], [0, 2, 5],
+    ]
+    assert LEGEND_TYPES[data[2 * 5 + 3]] == "string" and LEGEND_TYPES[data[6 * 5 + 3]] == "number"
+    assert hover["error"]["code"] == -32601
+    assert shutdown == {"jsonrpc": "2.0", "id": 4, "result": None}
+
+
+def test_deltas_track_incremental_changes() -> None:
+    """Test that edits only touch the changed range and deltas rebuild the new tokens."""
+    source = "\n".join(f"L{i}: MOV AX, {i}" for i in range(200))
+    server = LanguageServer()
+    server.handle({"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}})
+    server.handle({"method": "textDocument/didOpen", "params": {"textDocument": {"uri": URI, "text": source}}})
+    held = server.handle({"id": 2, "method": "textDocument/semanticTokens/full", "params": {"textDocument": {"uri": URI}}})
+    held = held["result"]
+    
+    server.handle({"method": "textDocument/didChange", "params": {
+        "textDocument": {"uri": URI, "version": 2},
+        "contentChanges": [_change(100, 9, 100, 11, "BX"), _change(150, 0, 152, 0, "NEW:\n"), _change(10, 4, 10, 4, " ")],
+    }})
+    delta = server.handle({"id": 3, "method": "textDocument/semanticTokens/full/delta", "params": {
+        "textDocument": {"uri": URI}, "previousResultId": held["resultId"],
+    }})["result"]
+    
+    # One edit from line 10 (six tokens per line) to line 152, not the whole document
+    (edit,) = delta["edits"]
+    assert edit["start"] == 10 * 6 * 5
+    assert edit["start"] + edit["deleteCount"] < len(held["data"])
+    data = held["data"]
+    data[edit["start"]:edit["start"] + edit["deleteCount"]] = edit["data"]
+    document = server.documents[URI]
+    assert data == Document(URI, "\n".join(entry.text for entry in document.lexer.iter_entries()), 2, True).data
+    assert document.version == 2
+
+
+@pytest.mark.parametrize(("encodings", "character", "width"), [
+    ([], 4, 4),
+    (["utf-32"], 3, 3),
+])
+def test_positions_follow_the_negotiated_encoding(encodings: list[str], character: int, width: int) -> None:
+    """Test that UTF-16 positions count astral characters twice and UTF-32 positions once."""
+    server = LanguageServer()
+    server.handle({"id": 1, "method": "initialize", "params": {"capabilities": {"general": {"positionEncodings": encodings}}}})
+    server.handle({"method": "textDocument/didOpen", "params": {"textDocument": {"uri": URI, "text": "'𝄞' AX"}}})
+    server.handle({"method": "textDocument/didChange", "params": {
+        "textDocument": {"uri": URI}, "contentChanges": [_change(0, character, 0, character, " BX,")],
+    }})
+    
+    document = server.documents[URI]
+    assert document.lexer.entry(0).text == "'𝄞' BX, AX"
+    # The string is 4 UTF-16 units or 3 code points wide
+    tokens = document.full()["data"]
+    assert tokens[:3] == [0, 0, width] and tokens[5:8] == [0, width + 1, 2]
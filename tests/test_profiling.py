@@ -0,0 +1,56 @@
+"""Tests for the lexer's profiling hooks."""
+
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.lexer import Lexer
+from src.core.profiling import LexerStats, trace_speedscope
+
+SOURCE = "msg DB 'Hi', 0Dh\nMOV AX, [BX] ; load\n\nADD AX, 1010b\n"
+
+
+def test_profiled_lexer_records_phases() -> None:
+    """Test that profiling records every phase without changing the tokens."""
+    assert Lexer(SOURCE).stats is None
+    
+    lexer = Lexer(SOURCE, profile=True)
+    assert lexer.analyze() == Lexer(SOURCE).analyze()
+    
+    stats = lexer.stats
+    assert [row.name for row in stats.rows()] == [
+        "lines", "scan", "scan/classify", "stream", "tokens",
+    ]
+    assert stats.phases["lines"].calls == 5
+    assert stats.phases["stream"].calls == stats.phases["tokens"].calls == len(lexer.tokens)
+    assert stats.phases["scan/classify"].calls == 8
+    assert stats.counters["classify cache hits"] + stats.counters["classify cache misses"] == 8
+    assert stats.self_seconds("scan") <= stats.phases["scan"].seconds
+    # The shadowed methods are restored after the run
+    assert "_word_type_id" not in vars(lexer)
+
+
+def test_stats_nesting_and_speedscope_events() -> None:
+    """Test self times of nested phases and the nesting of traced events."""
+    stats = LexerStats()
+    stats.add("scan/classify", 0.25, 3)
+    stats.add("scan", 1.0)
+    stats.add("stream", 0.5)
+    assert [row.name for row in stats.rows()] == ["scan", "scan/classify", "stream"]
+    assert stats.self_seconds("scan") == 0.75
+    assert stats.total_seconds == 1.5
+    
+    tokens, document = trace_speedscope(Lexer(SOURCE).analyze_stream)
+    assert len(tokens) == len(Lexer(SOURCE).analyze_stream())
+    
+    names = [frame["name"] for frame in document["shared"]["frames"]]
+    open_frames = []
+    for event in document["profiles"][0]["events"]:
+        if event["type"] == "O":
+            open_frames.append(event["frame"])
+        else:
+            assert open_frames.pop() == event["frame"]
+    assert not open_frames
+    assert "Lexer._scan" in names
@@ -0,0 +1,122 @@
+"""Tests for the project symbol index."""
+
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.core.incremental import DocumentLexer
+from src.core.lexer import Lexer
+from src.core.symbols import SymbolIndex, default_index_path, extract_symbols, index_project
+
+SOURCE = """\
+%macro exit 1
+    mov ax, 0x4C00 + %1
+    int 0x21
+%endmacro
+LIMIT equ 10
+section .data
+msg db "hi$"
+section .text
+Print:
+.loop:
+    mov dx, msg
+    cmp cx, LIMIT
+    jne short .loop
+    ret
+Main:
+.loop:
+    call Print
+    jmp .loop
+    exit 0
+"""
+
+
+def test_extract_symbols_tells_definitions_from_uses() -> None:
+    """Test labels, data, constants and macros, with local labels scoped to their parent."""
+    definitions, references = extract_symbols(Lexer(SOURCE).analyze_stream(), "prog.asm")
+    
+    assert [(d.name, d.kind, d.line) for d in definitions] == [
+        ("exit", "macro", 1), ("LIMIT", "equ", 5), ("msg", "data", 7),
+        ("Print", "label", 9), ("Print.loop", "label", 10), ("Main", "label", 15), ("Main.loop", "label", 16),
+    ]
+    # Registers, mnemonics, section names and ``short`` are not references
+    assert [(r.name, r.line) for r in references] == [
+        ("msg", 11), ("LIMIT", 12), ("Print.loop", 13), ("Print", 17), ("Main.loop", 18), ("exit", 19),
+    ]
+
+
+def test_index_updates_only_changed_files(tmp_path: Path) -> None:
+    """Test lookups across files, re-indexing on change, and removal."""
+    (tmp_path / "lib.inc").write_text("Print:\n    ret\n", encoding="utf-8")
+    (tmp_path / "main.asm").write_text("call Print\ncall Print\n", encoding="utf-8")
+    index = SymbolIndex()
+    
+    assert index.update(tmp_path.glob("*")) == 2
+    assert [(Path(d.path).name, d.line) for d in index.definitions("Print")] == [("lib.inc", 1)]
+    assert [(Path(r.path).name, r.line) for r in index.references("Print")] == [("main.asm", 1), ("main.asm", 2)]
+    assert index.update(tmp_path.glob("*")) == 0
+    
+    (tmp_path / "lib.inc").write_text("\nPrintLine:\n    ret\n", encoding="utf-8")
+    (tmp_path / "main.asm").unlink()
+    assert index.update([tmp_path / "lib.inc", tmp_path / "main.asm"]) == 2
+    assert index.definitions("Print") == [] and index.references("Print") == []
+    assert [d.line for d in index.definitions("PrintLine")] == [2]
+    assert len(index) == 1
+
+
+def test_saved_index_skips_unchanged_files(tmp_path: Path) -> None:
+    """Test that a loaded index answers lookups and re-reads only edited files."""
+    source = tmp_path / "prog.asm"
+    source.write_text(SOURCE, encoding="utf-8")
+    index = SymbolIndex()
+    index.update([source])
+    index.save(tmp_path / "index.json")
+    
+    loaded = SymbolIndex.load(tmp_path / "index.json")
+    assert loaded.files == index.files
+    assert loaded.qualify(source, 18, ".loop") == "Main.loop"
+    assert [d.line for d in loaded.definitions(loaded.qualify(source, 13, ".loop"))] == [10]
+    assert loaded.update([source]) == 0
+    assert loaded.update_source(source, SOURCE.replace("Main", "Start")) is True
+    assert loaded.definitions("Main") == [] and len(loaded.definitions("Start.loop")) == 1
+    assert len(SymbolIndex.load(tmp_path / "missing.json")) == 0
+
+
+def test_document_symbols_match_the_file_and_replace_it(tmp_path: Path) -> None:
+    """Test that symbols of an editor's committed tokens match a lexed file and are re-read on update."""
+    source = tmp_path / "prog.asm"
+    source.write_text(SOURCE, encoding="utf-8")
+    document = DocumentLexer(SOURCE)
+    assert extract_symbols(document, str(source)) == extract_symbols(Lexer(SOURCE).analyze_stream(), str(source))
+    
+    index = SymbolIndex()
+    index.update([source])
+    index.update_symbols(source, *extract_symbols(DocumentLexer(SOURCE.replace("Main", "Start")), str(source)))
+    assert index.definitions("Main") == [] and index.qualify(source, 18, ".loop") == "Start.loop"
+    # Stored without a hash, so the saved file is read again
+    assert index.update([source]) == 1
+    assert len(index.definitions("Main.loop")) == 1
+
+
+def test_index_project_follows_includes_only(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a project index covers what the open files include, not the whole directory."""
+    monkeypatch.setenv("SOME_ASM_CACHE_DIR", str(tmp_path / "cache" / "tokens"))
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "lib" / "io.inc").write_text("Print:\n    ret\n", encoding="utf-8")
+    (tmp_path / "main.asm").write_text('%include "lib/io.inc"\ncall Print\n', encoding="utf-8")
+    (tmp_path / "other.asm").write_text("Other:\n    ret\n", encoding="utf-8")
+    
+    # Open files get their symbols from the editor, so only what they include is read
+    index = index_project(tmp_path, {tmp_path / "main.asm": ["lib/io.inc", "missing.inc"]})
+    assert sorted(Path(path).name for path in index.files) == ["io.inc"]
+    assert [Path(d.path).name for d in index.definitions("Print")] == ["io.inc"]
+    assert default_index_path(tmp_path).is_file()
+    
+    # The saved index is reused, and files it knows are dropped once deleted
+    (tmp_path / "lib" / "io.inc").unlink()
+    index = index_project(tmp_path, {tmp_path / "other.asm": []})
+    assert len(index) == 0
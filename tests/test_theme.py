@@ -0,0 +1,74 @@
+"""Tests for the compiled theme cache."""
+
+import os
+import sys
+import types
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.ui import theme
+from src.ui.theme import compiled_theme
+
+SCSS = "$base: #1e1e2e;\nQWidget { background: $base; }\n"
+
+
+def _fake_sass(calls: list[str]) -> types.ModuleType:
+    """Helper function to create a sass module that records what it compiles."""
+    module = types.ModuleType("sass")
+    
+    def compile(string: str) -> str:
+        calls.append(string)
+        return string.replace("$base", "#1e1e2e")
+    
+    module.compile = compile
+    return module
+
+
+def test_theme_compiles_only_when_its_content_changes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the compiled theme is reused until the SCSS changes, even if the file is touched."""
+    calls: list[str] = []
+    monkeypatch.setitem(sys.modules, "sass", _fake_sass(calls))
+    scss = tmp_path / "theme.scss"
+    scss.write_text(SCSS, encoding="utf-8")
+    
+    css = compiled_theme(scss, tmp_path / "cache")
+    assert compiled_theme(scss, tmp_path / "cache") == css
+    os.utime(scss, ns=(0, 0))
+    assert compiled_theme(scss, tmp_path / "cache") == css
+    assert len(calls) == 1
+    
+    scss.write_text(SCSS.replace("QWidget", "QLabel"), encoding="utf-8")
+    assert "QLabel" in compiled_theme(scss, tmp_path / "cache")
+    assert len(calls) == 2
+
+
+def test_cached_theme_does_not_need_sass(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a cached theme loads without sass, and an uncached one reports it missing."""
+    scss = tmp_path / "theme.scss"
+    scss.write_text(SCSS, encoding="utf-8")
+    monkeypatch.setitem(sys.modules, "sass", _fake_sass([]))
+    css = compiled_theme(scss, tmp_path / "cache")
+    
+    monkeypatch.setitem(sys.modules, "sass", None)
+    assert compiled_theme(scss, tmp_path / "cache") == css
+    scss.write_text(SCSS + "QLabel { color: red; }\n", encoding="utf-8")
+    with pytest.raises(ImportError):
+        compiled_theme(scss, tmp_path / "cache")
+
+
+def test_failed_cache_write_leaves_no_temporary_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a theme is still returned when its entry cannot be written, without leftovers."""
+    monkeypatch.setitem(sys.modules, "sass", _fake_sass([]))
+    scss = tmp_path / "theme.scss"
+    scss.write_text(SCSS, encoding="utf-8")
+    
+    def fail(*args: object) -> None:
+        raise OSError("disk full")
+    
+    monkeypatch.setattr(theme.os, "replace", fail)
+    assert "#1e1e2e" in compiled_theme(scss, tmp_path / "cache")
+    assert list((tmp_path / "cache").iterdir()) == []
@@ -0,0 +1,80 @@
+"""Tests for the indexed search over token rows."""
+
+import re
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.incremental import DocumentLexer
+from src.core.token_index import TokenFilter, TokenIndex
+from src.core.tokens import TOKEN_TYPES
+
+SAMPLE_SOURCE = "\n".join([
+    "org 0x100",
+    "    MOV AX, 0x4C00",
+    "    mov bx, 10",
+    "; no tokens here",
+    "    int 21h",
+    "    movsb",
+])
+
+
+def _scan(document: DocumentLexer, token_filter: TokenFilter) -> list[int]:
+    """Helper function to filter every row of a document one by one."""
+    rows = []
+    for row, token in enumerate(document.rows()):
+        value = token.value.casefold()
+        if token_filter.types is not None and TOKEN_TYPES.index(token.type) not in token_filter.types:
+            continue
+        if not value.startswith(token_filter.prefix.casefold()):
+            continue
+        if token_filter.pattern is not None and not token_filter.pattern.search(value):
+            continue
+        if token_filter.first_line is not None and token.line < token_filter.first_line:
+            continue
+        if token_filter.last_line is not None and token.line > token_filter.last_line:
+            continue
+        rows.append(row)
+    return rows
+
+
+def test_select_matches_a_full_scan() -> None:
+    """Test that every kind of filter selects the same rows as scanning them."""
+    document = DocumentLexer(SAMPLE_SOURCE)
+    index = TokenIndex.from_document(document)
+    register = TOKEN_TYPES.index("REGISTRO")
+    constants = frozenset({TOKEN_TYPES.index("CONSTANTE_HEX"), TOKEN_TYPES.index("CONSTANTE_DEC")})
+    
+    filters = [
+        TokenFilter(),
+        TokenFilter(types=frozenset({register})),
+        TokenFilter(types=constants),
+        TokenFilter(prefix="MoV"),
+        TokenFilter(prefix="mov", first_line=3),
+        TokenFilter(pattern=re.compile(r"^0x")),
+        TokenFilter(types=constants, pattern=re.compile(r"\d$"), last_line=2),
+        TokenFilter(first_line=2, last_line=4),
+        TokenFilter(first_line=9),
+    ]
+    
+    assert len(index) == len(document)
+    for token_filter in filters:
+        assert list(index.select(token_filter)) == _scan(document, token_filter), token_filter
+
+
+def test_prefix_selects_a_range_of_values() -> None:
+    """Test that a prefix selects the values that start with it, ignoring case."""
+    index = TokenIndex.from_document(DocumentLexer(SAMPLE_SOURCE))
+    
+    assert index.matching_values("MOV") == ["mov", "movsb"]
+    assert index.matching_values("mov", re.compile(r"b$")) == ["movsb"]
+    assert index.matching_values("zzz") == []
+
+
+def test_filter_is_empty_only_without_criteria() -> None:
+    """Test that a filter keeps every token only when nothing is set."""
+    assert TokenFilter().is_empty
+    assert not TokenFilter(prefix="a").is_empty
+    assert not TokenFilter(last_line=3).is_empty
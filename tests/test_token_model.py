@@ -0,0 +1,62 @@
+"""Tests for the token table model."""
+
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+QtCore = pytest.importorskip("PyQt6.QtCore")
+QtTest = pytest.importorskip("PyQt6.QtTest")
+
+from src.core.incremental import DocumentLexer
+from src.ui.token_model import TokenTableModel
+
+SOURCE = "mov ax, 1\nmov bx, 2\nint 21h\n"
+
+
+def _lex(document: DocumentLexer) -> None:
+    """Helper function to lex the dirty lines, as the analysis worker does."""
+    for entry in document.dirty_entries():
+        entry.spans = document.lexer.tokenize_line(entry.text)
+
+
+def _text(document: DocumentLexer) -> str:
+    """Helper function to join the committed lines of a document."""
+    return "\n".join(entry.text for entry in document.iter_entries())
+
+
+@pytest.mark.parametrize("texts", [
+    ["mov ax, [bx+si+4] ; grows", "add ax, bx"],
+    ["nop"],
+    ["mov cx, 3"],
+    [],
+])
+def test_commit_keeps_the_model_contract(texts: list[str]) -> None:
+    """Test that QAbstractItemModelTester finds no fault in the changes announced around commits."""
+    messages = []
+    previous = QtCore.qInstallMessageHandler(lambda mode, context, message: messages.append(message))
+    try:
+        document = DocumentLexer(SOURCE)
+        model = TokenTableModel(document)
+        tester = QtTest.QAbstractItemModelTester(
+            model, QtTest.QAbstractItemModelTester.FailureReportingMode.Warning
+        )
+        
+        document.replace_lines(1, 1, texts)
+        _lex(document)
+        change = model.commit(document)
+        
+        assert model.rowCount() == len(document) == len(DocumentLexer(_text(document)))
+        assert change.first == 4
+        model.set_row_filter([0, 1, len(document) - 1])
+        document.replace_lines(0, 1, ["mov ax, 1", "push ax"])
+        _lex(document)
+        model.commit(document)
+        assert [model.source_row(row) for row in range(model.rowCount())] == [len(document) - 1]
+        del tester
+    finally:
+        QtCore.qInstallMessageHandler(previous)
+    assert messages == []
@@ -0,0 +1,85 @@
+"""Tests for change detection and incremental watch passes."""
+
+import os
+import sys
+from pathlib import Path
+
+# Add the src directory to the path so we can import from core
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from src.core.watch import InotifyWatcher, PollingWatcher, WatchSession
+
+
+def _touch(path: Path, text: str) -> None:
+    """Write a file and move its modification time forward, as coarse clocks may not."""
+    path.write_text(text, encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_polling_watcher_reports_created_modified_and_deleted_files(tmp_path: Path) -> None:
+    """Test that polling finds every kind of change, and ignores other file types."""
+    (tmp_path / "a.asm").write_text("nop\n", encoding="utf-8")
+    (tmp_path / "b.asm").write_text("nop\n", encoding="utf-8")
+    watcher = PollingWatcher(tmp_path, interval=0.01)
+    
+    assert watcher.changes(timeout=0) == set()
+    _touch(tmp_path / "a.asm", "ret\n")
+    (tmp_path / "b.asm").unlink()
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "c.inc").write_text("ret\n", encoding="utf-8")
+    (tmp_path / "notes.txt").write_text("ignored\n", encoding="utf-8")
+    
+    root = tmp_path.resolve()
+    assert watcher.changes(timeout=1) == {root / "a.asm", root / "b.asm", root / "sub" / "c.inc"}
+    assert watcher.files() == [root / "a.asm", root / "sub" / "c.inc"]
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+def test_inotify_watcher_follows_new_directories(tmp_path: Path) -> None:
+    """Test that inotify reports writes, including in directories created after it started."""
+    watcher = InotifyWatcher(tmp_path)
+    try:
+        (tmp_path / "lib").mkdir()
+        assert watcher.changes(timeout=1) == set()
+        
+        (tmp_path / "lib" / "io.inc").write_text("ret\n", encoding="utf-8")
+        (tmp_path / "main.asm").write_text("nop\n", encoding="utf-8")
+        root = tmp_path.resolve()
+        assert watcher.changes(timeout=1) == {root / "lib" / "io.inc", root / "main.asm"}
+        
+        (root / "main.asm").unlink()
+        assert watcher.changes(timeout=1) == {root / "main.asm"}
+        assert watcher.files() == [root / "lib" / "io.inc"]
+    finally:
+        watcher.close()
+
+
+def test_session_only_redoes_changed_files_and_their_dependents(tmp_path: Path) -> None:
+    """Test that a pass re-lexes only changed files and re-runs the programs including them."""
+    (tmp_path / "lib.inc").write_text("Print:\n    mov ah, 0x02\n    int 0x21\n    ret\n", encoding="utf-8")
+    (tmp_path / "a.asm").write_text(
+        'org 0x100\nmov dl, "a"\ncall Print\nret\n%include "lib.inc"\n', encoding="utf-8"
+    )
+    (tmp_path / "b.asm").write_text("org 0x100\nmov ax, 0x4C05\nint 0x21\n", encoding="utf-8")
+    session = WatchSession(run=True)
+    
+    first = session.update(tmp_path.glob("*"))
+    assert [Path(result.lex.path).name for result in first.results] == ["a.asm", "b.asm", "lib.inc"]
+    assert first.results[0].run.output == b"a"
+    assert first.results[1].run.exit_code == 5
+    assert session.resolver.lex_count == 3
+    
+    _touch(tmp_path / "lib.inc", "Print:\n    mov ah, 0x02\n    int 0x21\n    int 0x21\n    ret\n")
+    second = session.update([tmp_path / "lib.inc"])
+    assert [Path(result.lex.path).name for result in second.results] == ["a.asm", "lib.inc"]
+    assert second.results[0].run.output == b"aa"
+    assert session.resolver.lex_count == 4
+    
+    (tmp_path / "b.asm").unlink()
+    third = session.update([tmp_path / "b.asm"])
+    assert third.results == [] and third.removed == [(tmp_path / "b.asm").resolve()]
+    # Only the current contents of the remaining files are kept
+    assert len(session.resolver._streams) == 2